@@ -1,16 +1,21 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flasgger import Swagger
 import os
+from utils.boot import BootTimer
 
 # Initialize extensions
 jwt = JWTManager()
 
 def create_app():
     """Application factory"""
+    boot = BootTimer()
     app = Flask(__name__)
     
+    # orjson-backed jsonify()/request.json with native datetime/Decimal encoding
+    from utils.json_provider import init_json_provider
+    init_json_provider(app)
+    
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), "safedrive.db")}')
@@ -23,71 +28,84 @@ def create_app():
         'pool_timeout': 30,
         'connect_args': {'check_same_thread': False} if 'sqlite' in os.environ.get('DATABASE_URL', '') else {}
     }
+    # Pool checkout timing for /admin/diagnostics/db
+    from utils.db_stats import configure_engine_options
+    configure_engine_options(app.config['SQLALCHEMY_ENGINE_OPTIONS'], app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
+    # Bodies above this are rejected with 413 from Content-Length, before
+    # they are read; sized for JSON. Upload views set their own limit with
+    # @upload_limit (utils/uploads.py)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 1024 * 1024))
+    
+    # Trust X-Forwarded-For from this many proxies so request.remote_addr
+    # (used for login rate limiting) is the real client address
+    proxy_count = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    if proxy_count:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count)
     
     # Initialize extensions
-    from models import db
+    with boot.phase('models'):
+        from models import db
     db.init_app(app)
+    from utils.db_stats import init_db_stats
+    init_db_stats(app, db)
     jwt.init_app(app)
     CORS(app, 
          resources={r"/api/*": {"origins": "*"}},
          allow_headers=["Content-Type", "Authorization"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
     
-    # Initialize Swagger
-    swagger_config = {
-        "headers": [],
-        "specs": [
-            {
-                "endpoint": 'apispec',
-                "route": '/apispec.json',
-                "rule_filter": lambda rule: True,
-                "model_filter": lambda tag: True,
-            }
-        ],
-        "static_url_path": "/flasgger_static",
-        "swagger_ui": True,
-        "specs_route": "/docs/"
-    }
+    # Document uploads stream to disk with hashing (request.stream_files_to)
+    from utils.uploads import init_uploads
+    init_uploads(app)
     
-    swagger_template = {
-        "swagger": "2.0",
-        "info": {
-            "title": "SafeDrive API",
-            "description": "Complete REST API for SafeDrive ride-sharing platform",
-            "version": "1.0.0",
-            "contact": {
-                "name": "SafeDrive Team",
-                "email": "support@safedrive.com"
-            }
-        },
-        "host": "safedrive-backend-d579.onrender.com",
-        "basePath": "/api/v1",
-        "schemes": ["https", "http"],
-        "securityDefinitions": {
-            "Bearer": {
-                "type": "apiKey",
-                "name": "Authorization",
-                "in": "header",
-                "description": "JWT Authorization header using the Bearer scheme. Example: 'Authorization: Bearer {token}'"
-            }
-        },
-        "security": [
-            {
-                "Bearer": []
-            }
-        ]
-    }
+    # Admin-triggered cProfile + SQL capture (X-Profile: 1 or ?__profile=1)
+    from utils.profiling import init_profiling
+    init_profiling(app)
+    
+    # Per-route histograms served at /metrics (registered before compression
+    # so its after_request hook sees the final response)
+    from utils.metrics import init_metrics
+    init_metrics(app)
     
-    Swagger(app, config=swagger_config, template=swagger_template)
+    # Negotiated gzip/br/zstd compression for large JSON responses
+    from utils.compression import init_compression
+    init_compression(app)
     
-    # Database setup with proper error handling
-    with app.app_context():
+    # @query_budget checks (QUERY_BUDGET_MODE=log|strict|off); registered
+    # last so it runs first, before any other after_request hook
+    from utils.query_budget import init_query_budget
+    init_query_budget(app)
+    
+    # API docs: /apispec.json serves the spec pre-built by build_spec.py.
+    # The flasgger-backed Swagger UI is opt-in and not imported otherwise.
+    with boot.phase('docs'):
+        if os.environ.get('ENABLE_SWAGGER_UI', 'false').lower() == 'true':
+            from swagger_docs import init_swagger
+            init_swagger(app)
+        else:
+            from utils.openapi import spec_response
+            app.add_url_rule('/apispec.json', 'apispec', spec_response)
+    
+    # Database setup. FAST_BOOT replaces create_all() (one catalog query
+    # per table) with a single schema-version lookup; see models/schema.py
+    with boot.phase('schema'), app.app_context():
         try:
-            db.create_all()
-            # Test database connection
-            db.session.execute('SELECT 1')
-            db.session.commit()
+            if os.environ.get('FAST_BOOT', 'false').lower() == 'true':
+                from models.schema import ensure_schema
+                ensure_schema()
+            else:
+                from sqlalchemy import text
+                from services.trip_search import ensure_trip_search
+                from models.schema import ensure_columns, ensure_indexes
+                db.create_all()
+                ensure_columns()
+                ensure_indexes()
+                ensure_trip_search()
+                # Test database connection
+                db.session.execute(text('SELECT 1'))
+                db.session.commit()
         except Exception as e:
             print(f"Database setup error: {e}")
             try:
@@ -96,14 +114,16 @@ def create_app():
                 pass
     
     # Register blueprints
-    from routes.auth import auth_bp
-    from routes.users import users_bp
-    from routes.trips import trips_bp
-    from routes.drivers import drivers_bp
-    from routes.payments import payments_bp
-    from routes.admin import admin_bp
-    from routes.notifications import notifications_bp
-    from routes.ratings import ratings_bp
+    with boot.phase('routes'):
+        from routes.auth import auth_bp
+        from routes.users import users_bp
+        from routes.trips import trips_bp
+        from routes.drivers import drivers_bp
+        from routes.payments import payments_bp
+        from routes.admin import admin_bp
+        from routes.notifications import notifications_bp
+        from routes.ratings import ratings_bp
+        from routes.migrate import migrate_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(users_bp, url_prefix='/api/v1/users')
@@ -115,7 +135,6 @@ def create_app():
     app.register_blueprint(ratings_bp, url_prefix='/api/v1/ratings')
     
     # Migration endpoint
-    from routes.migrate import migrate_bp
     app.register_blueprint(migrate_bp, url_prefix='/api/v1/migrate')
     
     # Health check endpoint
@@ -192,6 +211,16 @@ def create_app():
             }
         }), 404
     
+    @app.errorhandler(413)
+    def payload_too_large(error):
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'PAYLOAD_TOO_LARGE',
+                'message': 'Request body is too large'
+            }
+        }), 413
+    
     @app.errorhandler(500)
     def internal_error(error):
         try:
@@ -237,6 +266,11 @@ def create_app():
             }
         }), 401
     
+    # Phase timings for bench_startup.py; printed when BOOT_PROFILE=true
+    app.extensions['boot_timings'] = boot.as_dict()
+    if os.environ.get('BOOT_PROFILE', 'false').lower() == 'true':
+        boot.report()
+    
     return app
 
 # Create app instance for Gunicorn
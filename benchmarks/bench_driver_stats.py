@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Driver stats contention benchmark
+
+--threads threads each record --trips completed trips for the same
+driver, updating drivers.total_trips / total_earnings either the old way
+(load the Driver, += in Python, commit) or with
+Driver.record_completed_trip() (UPDATE ... SET total_trips =
+total_trips + 1). Reports completions per second, failed transactions,
+and lost updates: successful completions missing from the final totals.
+
+Uses a temporary SQLite database unless --database-url is given; run it
+against PostgreSQL to see row-lock contention as production has it.
+
+Usage:
+    python benchmarks/bench_driver_stats.py [--threads 8] [--trips 200] [--database-url URL]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FARE = Decimal('559.40')
+USER_ID = 'u_bench_stats'
+
+def read_modify_write(db, Driver):
+    driver = Driver.query.filter_by(user_id=USER_ID).first()
+    driver.total_trips += 1
+    driver.total_earnings += FARE
+
+def atomic_update(db, Driver):
+    Driver.record_completed_trip(USER_ID, FARE)
+
+def run(app, mode, threads, trips):
+    from models import db, Driver
+
+    with app.app_context():
+        db.session.query(Driver).filter_by(user_id=USER_ID).update({'total_trips': 0, 'total_earnings': 0})
+        db.session.commit()
+
+    completed = [0] * threads
+    errors = [0] * threads
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        with app.app_context():
+            barrier.wait()
+            for _ in range(trips):
+                try:
+                    mode(db, Driver)
+                    db.session.commit()
+                    completed[index] += 1
+                except Exception:
+                    db.session.rollback()
+                    errors[index] += 1
+            db.session.remove()
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        driver = Driver.query.filter_by(user_id=USER_ID).first()
+        final_trips, final_earnings = driver.total_trips, Decimal(str(driver.total_earnings))
+    done = sum(completed)
+    lost = done - final_trips
+    drift = done * FARE - final_earnings
+    print(f'{mode.__name__:<20}{done / elapsed:>12.0f}{done:>8}{sum(errors):>8}{lost:>8}{drift:>16,.2f}')
+    return lost
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent driver stat updates')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--trips', type=int, default=200, help='Completions per thread')
+    parser.add_argument('--database-url', help='Defaults to a temporary SQLite database')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(tempfile.mkdtemp(), "stats.db")}'
+    # Only the driver row is measured; skip per-statement bookkeeping
+    os.environ['DB_STATS_ENABLED'] = 'false'
+
+    from app import create_app
+    from models import db, User, Driver
+    app = create_app()
+    with app.app_context():
+        Driver.query.filter_by(user_id=USER_ID).delete()
+        User.query.filter_by(id=USER_ID).delete()
+        db.session.add(User(id=USER_ID, email='stats@bench.test', password_hash='-',
+                            name='Stats Driver', phone='+254799999990', role='driver'))
+        db.session.add(Driver(user_id=USER_ID, total_trips=0, total_earnings=0))
+        db.session.commit()
+        dialect = db.engine.dialect.name
+
+    print(f'{args.threads} threads x {args.trips} completions for one driver ({dialect})')
+    print(f'{"mode":<20}{"trips/s":>12}{"ok":>8}{"errors":>8}{"lost":>8}{"earnings drift":>16}')
+    run(app, read_modify_write, args.threads, args.trips)
+    lost = run(app, atomic_update, args.threads, args.trips)
+
+    with app.app_context():
+        Driver.query.filter_by(user_id=USER_ID).delete()
+        User.query.filter_by(id=USER_ID).delete()
+        db.session.commit()
+    if lost:
+        sys.exit('Atomic updates lost increments')
+
+if __name__ == '__main__':
+    main()
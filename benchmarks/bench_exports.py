@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Trip export benchmark
+
+Seeds a temporary SQLite database with --trips trips spread over 30 days
+and exports the month to CSV with services/exports.py (Core rows,
+streamed a batch at a time) and with the ORM approach it replaces
+(query.all() + to_dict() + csv.DictWriter), reporting time, rows/s and
+peak traced memory for each. Then times GET /api/v1/admin/trips from one
+thread, idle and while another thread streams the month from
+GET /api/v1/admin/exports/trips, as gthread workers would.
+
+Usage:
+    python benchmarks/bench_exports.py [--trips 300000] [--batch-size 500] [--probes 200]
+"""
+
+import argparse
+import csv
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+START = datetime(2024, 5, 1)
+DAYS = 30
+
+def seed(db, User, Trip, count, batch=20000):
+    db.session.execute(User.__table__.insert(), [
+        {'id': 'u_export_admin', 'email': 'admin@export.test', 'password_hash': '-', 'name': 'Export Admin',
+         'phone': '+254700000001', 'role': 'admin'},
+        {'id': 'u_export', 'email': 'passenger@export.test', 'password_hash': '-', 'name': 'Export Passenger',
+         'phone': '+254700000002', 'role': 'passenger'},
+    ])
+    step = DAYS * 86400 / count
+    for offset in range(0, count, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, count)):
+            created = START + timedelta(seconds=i * step)
+            rows.append({'id': f't_x{i}', 'passenger_id': 'u_export', 'driver_id': None,
+                         'pickup_lat': -1.2921, 'pickup_lng': 36.8219, 'pickup_address': f'{i % 400} Kenyatta Avenue, CBD',
+                         'dropoff_lat': -1.2632, 'dropoff_lng': 36.8036, 'dropoff_address': 'Westlands, Sarit Centre',
+                         'status': 'completed', 'fare': 450 + i % 700, 'distance': 7.2, 'duration': 14,
+                         'payment_status': 'paid', 'created_at': created, 'completed_at': created})
+        db.session.execute(Trip.__table__.insert(), rows)
+        db.session.commit()
+
+def measure(fn):
+    """(seconds, bytes written) untraced, then peak traced memory"""
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+def probe(client, headers, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get('/api/v1/admin/trips', headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark streaming trip exports')
+    parser.add_argument('--trips', type=int, default=300000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--probes', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "exports.db")}'
+    os.environ.setdefault('DB_STATS_ENABLED', 'false')
+    os.environ.setdefault('QUERY_BUDGET_MODE', 'off')
+    from app import create_app
+    from models import db, User, Trip
+    from services import exports
+    from flask_jwt_extended import create_access_token
+
+    app = create_app()
+    end = START + timedelta(days=DAYS)
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db, User, Trip, args.trips)
+        print(f'Seeded {args.trips} trips over {DAYS} days in {time.perf_counter() - start:.1f}s')
+
+        def streamed():
+            return sum(len(chunk) for chunk in exports.iter_csv('trips', START, end, args.batch_size))
+
+        def orm():
+            buffer = io.StringIO()
+            trips = Trip.query.filter(Trip.created_at >= START, Trip.created_at < end).order_by(Trip.created_at).all()
+            rows = [trip.to_dict() for trip in trips]
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+            db.session.expunge_all()
+            return len(buffer.getvalue())
+
+        print(f'\n{"export":<10}{"seconds":>9}{"rows/s":>10}{"MB out":>8}{"peak MB":>9}')
+        for label, fn in (('streamed', streamed), ('orm', orm)):
+            elapsed, size, peak = measure(fn)
+            print(f'{label:<10}{elapsed:>9.2f}{args.trips / elapsed:>10.0f}{size / 2**20:>8.1f}{peak / 2**20:>9.1f}')
+
+        headers = {'Authorization': f'Bearer {create_access_token(identity="u_export_admin")}'}
+
+    client = app.test_client()
+    idle = probe(client, headers, args.probes)
+
+    done = threading.Event()
+    def export():
+        response = app.test_client().get(
+            f'/api/v1/admin/exports/trips?start={START:%Y-%m-%d}&end={end:%Y-%m-%d}', headers=headers, buffered=False
+        )
+        for _ in response.response:
+            if done.is_set():
+                break
+        response.close()
+        done.set()
+
+    thread = threading.Thread(target=export)
+    thread.start()
+    busy = probe(client, headers, args.probes)
+    finished = done.is_set()
+    done.set()
+    thread.join()
+
+    print(f'\nGET /admin/trips   p50 {idle[0]:.1f}ms p95 {idle[1]:.1f}ms idle, '
+          f'p50 {busy[0]:.1f}ms p95 {busy[1]:.1f}ms during an export'
+          f'{"" if not finished else " (export finished before the probes)"}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+JSON provider throughput benchmark
+
+Measures GET /api/v1/trips requests per second with Flask's stdlib json
+provider (FallbackJSONProvider) and with OrjsonProvider, using the Flask
+test client against a throwaway SQLite database.
+
+Usage:
+    python benchmarks/bench_json_provider.py [--trips 500] [--limit 100] [--requests 300]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON providers on GET /trips')
+    parser.add_argument('--trips', type=int, default=500, help='Trips owned by the passenger')
+    parser.add_argument('--limit', type=int, default=100, help='Page size requested')
+    parser.add_argument('--requests', type=int, default=300, help='Requests per provider')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench_json.db")}'
+
+    from app import create_app
+    from flask_jwt_extended import create_access_token
+    from models import db, User, Trip
+    from utils.json_provider import FallbackJSONProvider, OrjsonProvider
+
+    app = create_app()
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(User.__table__.insert(), [{
+            'id': 'u_benchpass', 'email': 'bench@example.com', 'password_hash': 'x',
+            'name': 'Bench Passenger', 'phone': '+254700000001', 'role': 'passenger', 'created_at': now
+        }])
+        db.session.execute(Trip.__table__.insert(), [{
+            'id': f't_bench{i:07d}', 'passenger_id': 'u_benchpass', 'driver_id': None,
+            'pickup_lat': -1.2921, 'pickup_lng': 36.8219, 'pickup_address': 'Nairobi CBD',
+            'dropoff_lat': -1.3032, 'dropoff_lng': 36.8856, 'dropoff_address': 'Westlands',
+            'status': 'completed', 'fare': 559.4, 'distance': 7.19, 'duration': 14,
+            'payment_status': 'paid', 'rating': 5, 'feedback': 'Smooth ride',
+            'created_at': now - timedelta(minutes=i), 'accepted_at': now, 'started_at': now,
+            'completed_at': now
+        } for i in range(args.trips)])
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity="u_benchpass")}'}
+
+    client = app.test_client()
+    url = f'/api/v1/trips?limit={args.limit}'
+    bodies = {}
+
+    print(f'GET {url} x {args.requests}')
+    for name, provider in (('stdlib json', FallbackJSONProvider), ('orjson', OrjsonProvider)):
+        app.json = provider(app)
+        client.get(url, headers=headers)  # warm up
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            response = client.get(url, headers=headers)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.data
+        bodies[name] = response.get_json()
+        print(f'{name:<12} {args.requests / elapsed:8.1f} req/s  ({elapsed / args.requests * 1000:.2f} ms/req, '
+              f'{len(response.data):,} bytes)')
+
+    assert bodies['stdlib json'] == bodies['orjson'], 'providers produced different payloads'
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+List serialization benchmark
+
+Compares the old list-endpoint path (ORM hydration + eager loads +
+to_dict() per row) with the column-projection serializers in
+utils/serializers.py, and checks both produce identical output.
+
+Usage:
+    python benchmarks/bench_list_serialization.py [-n 5000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def seed(db, User, Trip, Payment, Notification, count):
+    """Insert `count` rows per table with Core bulk inserts"""
+    now = datetime.utcnow()
+    users = [{
+        'id': f'u_bench{i:07d}', 'email': f'bench{i}@example.com', 'password_hash': 'x',
+        'name': f'Bench User {i}', 'phone': f'+2547{i:08d}',
+        'role': 'driver' if i % 2 else 'passenger', 'created_at': now - timedelta(minutes=i)
+    } for i in range(count)]
+    trips = [{
+        'id': f't_bench{i:07d}', 'passenger_id': f'u_bench{(i * 2) % count:07d}',
+        'driver_id': f'u_bench{(i * 2 + 1) % count:07d}',
+        'pickup_lat': -1.29 + random.random() / 10, 'pickup_lng': 36.82 + random.random() / 10,
+        'pickup_address': 'Nairobi CBD', 'dropoff_lat': -1.30, 'dropoff_lng': 36.88,
+        'dropoff_address': 'Westlands', 'status': 'completed', 'fare': 559.4, 'distance': 7.19,
+        'duration': 14, 'payment_status': 'paid', 'rating': 5, 'feedback': 'Great ride',
+        'created_at': now - timedelta(minutes=i), 'accepted_at': now, 'started_at': now,
+        'completed_at': now
+    } for i in range(count)]
+    payments = [{
+        'id': f'pay_bench{i:07d}', 'trip_id': f't_bench{i:07d}', 'amount': 559.4,
+        'phone': '+254712345678', 'checkout_request_id': f'ws_CO_{i}',
+        'mpesa_receipt_number': f'RCPT{i}', 'status': 'paid', 'created_at': now - timedelta(minutes=i)
+    } for i in range(count)]
+    notifications = [{
+        'id': f'notif_bench{i:07d}', 'user_id': 'u_bench0000000', 'title': 'Trip completed',
+        'message': 'Your trip has been completed', 'type': 'system', 'trip_id': f't_bench{i:07d}',
+        'is_read': bool(i % 3), 'is_sent': True, 'created_at': now - timedelta(minutes=i),
+        'read_at': now if i % 3 else None
+    } for i in range(count)]
+    for model, rows in ((User, users), (Trip, trips), (Payment, payments), (Notification, notifications)):
+        db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+def measure(fn, repeat):
+    """Best-of-N wall time and the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark list endpoint serialization')
+    parser.add_argument('-n', '--rows', type=int, default=5000, help='Rows per table')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions (best is reported)')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench_list.db")}'
+
+    from app import create_app
+    from models import db, User, Trip, Payment, Notification
+    from utils.serializers import serialize_trips, serialize_users, serialize_payments, serialize_notifications
+
+    app = create_app()
+    with app.app_context():
+        seed(db, User, Trip, Payment, Notification, args.rows)
+
+        cases = [
+            ('trips',
+             lambda: [t.to_dict() for t in Trip.query.options(
+                 db.joinedload(Trip.passenger), db.joinedload(Trip.driver)
+             ).order_by(Trip.created_at.desc()).all()],
+             lambda: serialize_trips(Trip.query.order_by(Trip.created_at.desc()))),
+            ('users',
+             lambda: [u.to_dict() for u in User.query.order_by(User.created_at.desc()).all()],
+             lambda: serialize_users(User.query.order_by(User.created_at.desc()))),
+            ('payments',
+             lambda: [p.to_dict() for p in Payment.query.order_by(Payment.created_at.desc()).all()],
+             lambda: serialize_payments(Payment.query.order_by(Payment.created_at.desc()))),
+            ('notifications',
+             lambda: [n.to_dict() for n in Notification.query.order_by(Notification.created_at.desc()).all()],
+             lambda: serialize_notifications(Notification.query.order_by(Notification.created_at.desc()))),
+        ]
+
+        print(f'{"endpoint":<15}{"ORM rows/s":>14}{"projection rows/s":>20}{"speedup":>10}')
+        for name, orm_path, projection_path in cases:
+            orm_time, orm_rows = measure(lambda: (db.session.expunge_all(), orm_path())[1], args.repeat)
+            projection_time, projection_rows = measure(projection_path, args.repeat)
+            assert orm_rows == projection_rows, f'{name}: projection output differs from to_dict()'
+            print(f'{name:<15}{len(orm_rows) / orm_time:>14,.0f}'
+                  f'{len(projection_rows) / projection_time:>20,.0f}'
+                  f'{orm_time / projection_time:>9.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for per-row hot code
+
+Times the functions that run once per row or per request: model
+serialization (Trip.to_dict, Driver.to_dict with the user cache warm and
+cold), haversine distance, fare math, M-Pesa phone formatting and the
+auth validators. Fixtures are fixed values in a throwaway SQLite file,
+so no database server is needed.
+
+Each case is timed with timeit (auto-ranged loop count) and reported in
+nanoseconds per call, best of --repeat rounds. Rounds visit every case in
+turn, so a noisy neighbour slows all cases rather than one. A fixed pure
+Python calibration loop is timed alongside, and cases are compared with
+benchmarks/micro_baseline.json relative to it, which cancels most of the
+difference between machines and CPU frequency states. Any case slower
+than the baseline by more than --threshold is flagged and the exit code
+is 1. Refresh the baseline with --save-baseline after intended changes.
+
+Interpreter versions differ far more than the calibration loop can
+correct for, so the baseline records the Python version. It is only
+compared against a run on the same major.minor version; otherwise the
+results are printed without comparison and the exit code is 2. Record it
+on the deploy runtime (runtime.txt).
+
+Usage:
+    python benchmarks/bench_micro.py [--repeat 7] [--threshold 0.25] [--save-baseline] [-k name]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro_baseline.json')
+
+FIXED_TIME = datetime(2024, 1, 15, 8, 30, 0)
+
+PHONES = ['+254712345678', '0712345678', '254712345678', '712345678', ' 0112345678 ', '+25471234', 'not-a-phone']
+EMAILS = ['jane.doe@example.com', 'driver+42@safedrive.co.ke', 'missing-at.example.com', 'x@y', 'a' * 40 + '@b.com']
+ROUTES = [
+    (-1.2921, 36.8219, -1.2632, 36.8036),   # CBD -> Westlands
+    (-1.2921, 36.8219, -1.3192, 36.9278),   # CBD -> JKIA
+    (-1.2864, 36.8172, -1.2864, 36.8172),   # zero length
+    (-4.0435, 39.6682, -1.2921, 36.8219),   # Mombasa -> Nairobi
+]
+
+def seed(db, User, Driver):
+    """One passenger and one driver with fixed ids and values"""
+    passenger = User(id='u_microbench1', email='rider@example.com', password_hash='x',
+                     name='Micro Rider', phone='+254712345678', role='passenger', created_at=FIXED_TIME)
+    driver_user = User(id='u_microbench2', email='driver@example.com', password_hash='x',
+                       name='Micro Driver', phone='+254798765432', role='driver', created_at=FIXED_TIME)
+    driver = Driver(id='d_microbench1', user_id=driver_user.id, vehicle_make='Toyota',
+                    vehicle_model='Fielder', vehicle_year=2016, vehicle_plate='KDA 123A',
+                    vehicle_color='White', document_id_card='uploads/id.jpg',
+                    document_license='uploads/license.jpg', rating=4.8, total_trips=120,
+                    total_earnings=54000.0, status='approved', is_online=True, created_at=FIXED_TIME)
+    db.session.add_all([passenger, driver_user, driver])
+    db.session.commit()
+    return driver
+
+def make_trip(Trip):
+    """Transient, fully populated trip; to_dict() never touches the database"""
+    return Trip(id='t_microbench1', passenger_id='u_microbench1', driver_id='u_microbench2',
+                pickup_lat=-1.2921, pickup_lng=36.8219, pickup_address='Kenyatta Avenue, Nairobi CBD',
+                dropoff_lat=-1.2632, dropoff_lng=36.8036, dropoff_address='Sarit Centre, Westlands',
+                status='completed', fare=559.4, distance=7.19, duration=14, payment_status='paid',
+                rating=5, feedback='Great ride', created_at=FIXED_TIME, accepted_at=FIXED_TIME,
+                started_at=FIXED_TIME, completed_at=FIXED_TIME, updated_at=FIXED_TIME)
+
+def build_cases(db, driver, trip):
+    from routes.auth import validate_email, validate_phone
+    from routes.trips import calculate_distance
+    from utils.cache import user_cache
+    from utils.helpers import calculate_fare, format_mpesa_phone
+
+    def driver_to_dict_cold():
+        # Cache miss plus lazy load of driver.user: one SELECT on users
+        user_cache.invalidate(driver.user_id)
+        db.session.expire(driver, ['user'])
+        return driver.to_dict()
+
+    driver.to_dict()  # warm the user cache for the cached case
+
+    # Batched cases run over a fixed input list; they are reported per call
+    return [
+        ('trip_to_dict', 1, trip.to_dict),
+        ('driver_to_dict_cached', 1, driver.to_dict),
+        ('driver_to_dict_cold', 1, driver_to_dict_cold),
+        ('calculate_distance', len(ROUTES), lambda: [calculate_distance(*route) for route in ROUTES]),
+        ('calculate_fare', 4, lambda: (calculate_fare(0.4), calculate_fare(3.14),
+                                       calculate_fare(7.19), calculate_fare(482.6))),
+        ('format_mpesa_phone', len(PHONES), lambda: [format_mpesa_phone(phone) for phone in PHONES]),
+        ('validate_email', len(EMAILS), lambda: [validate_email(email) for email in EMAILS]),
+        ('validate_phone', len(PHONES), lambda: [validate_phone(phone) for phone in PHONES]),
+    ]
+
+def calibration():
+    """Fixed pure Python workload used to gauge machine speed"""
+    total = 0.0
+    for i in range(50):
+        row = {'id': i, 'lat': i * 0.01, 'label': f'row {i}'}
+        total += row['lat'] * 2
+    return total
+
+def time_cases(cases, repeat):
+    """Best-of-N nanoseconds per call for each case, timed round-robin"""
+    timers = []
+    for name, calls, fn in cases:
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        timers.append((name, calls, timer, number))
+
+    best = {name: float('inf') for name, _, _, _ in timers}
+    for _ in range(repeat):
+        for name, calls, timer, number in timers:
+            best[name] = min(best[name], timer.timeit(number) / number / calls * 1e9)
+    return best
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def same_python(version):
+    """True if version (e.g. '3.12.7') has this interpreter's major.minor"""
+    return (version or '').split('.')[:2] == list(platform.python_version_tuple()[:2])
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark per-row hot code')
+    parser.add_argument('--repeat', type=int, default=7, help='Timing repetitions (best is reported)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown against the baseline (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Write results to {os.path.basename(BASELINE_FILE)}')
+    parser.add_argument('-k', dest='only', help='Only run cases whose name contains this')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench_micro.db")}'
+    os.environ.setdefault('FAST_BOOT', 'true')
+
+    from app import create_app
+    from models import db, User, Driver, Trip
+
+    app = create_app()
+    with app.app_context():
+        driver = seed(db, User, Driver)
+        cases = build_cases(db, driver, make_trip(Trip))
+        if args.only:
+            cases = [case for case in cases if args.only in case[0]]
+        results = time_cases([('calibration', 1, calibration)] + cases, args.repeat)
+    calibration_ns = results.pop('calibration')
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'createdAt': datetime.utcnow().isoformat(timespec='seconds'),
+                'calibrationNs': round(calibration_ns, 1),
+                'nsPerCall': {name: round(ns, 1) for name, ns in results.items()}
+            }, f, indent=2)
+            f.write('\n')
+        print(f'Baseline saved to {BASELINE_FILE}')
+
+    baseline = load_baseline()
+    mismatch = baseline and not args.save_baseline and not same_python(baseline.get('python'))
+    reference = baseline['nsPerCall'] if baseline and not args.save_baseline and not mismatch else {}
+    # Baseline times scaled to this run's machine speed
+    scale = calibration_ns / baseline['calibrationNs'] if reference else 1
+    regressions = []
+
+    print(f'calibration: {calibration_ns:,.0f} ns' + (f' ({scale - 1:+.1%} vs baseline machine)' if reference else ''))
+    print(f'{"case":<24}{"ns/call":>12}{"baseline":>12}{"change":>10}')
+    for name, ns in results.items():
+        base = reference.get(name)
+        if base is None:
+            print(f'{name:<24}{ns:>12,.0f}{"-":>12}{"":>10}')
+            continue
+        base *= scale
+        change = ns / base - 1
+        flag = '  REGRESSION' if change > args.threshold else ''
+        if flag:
+            regressions.append(name)
+        print(f'{name:<24}{ns:>12,.0f}{base:>12,.0f}{change:>+9.1%}{flag}')
+
+    if mismatch:
+        print(f"\nBaseline was recorded on Python {baseline.get('python')}, this is {platform.python_version()}; "
+              f"not compared. Run on the baseline's version or re-record with --save-baseline.")
+        sys.exit(2)
+    if regressions:
+        print(f'\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
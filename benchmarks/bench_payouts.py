@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Driver payout settlement benchmark
+
+Queues payouts for seeded drivers (each with paid trip earnings) and
+settles them through services/payouts.py against the local M-Pesa stub,
+whose B2C results are POSTed back to a throwaway gunicorn
+(/api/v1/payments/result). Runs a small sequential baseline
+(--workers 1) and then the full set with the thread pool, and reports
+submission throughput and the time until every payout reads as paid.
+
+With --b2c-error-rate some submissions get a 503 and are retried; the
+stub's duplicate count shows resubmissions that Daraja would have
+deduplicated by OriginatorConversationID.
+
+Usage:
+    python benchmarks/bench_payouts.py [--payouts 2000] [--workers 32] [--baseline 50]
+        [--mpesa-delay-ms 200] [--b2c-error-rate 0.02]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_ride_lifecycle import start_server
+from mpesa_stub import start_stub
+
+def queue_payouts(db, models, prefix, count, phone_offset):
+    """Drivers with one paid 1,000 KES trip each and a pending 500 KES payout"""
+    User, Trip, Payout = models
+    now = datetime.utcnow()
+    users, trips, payouts = [], [], []
+    for i in range(count):
+        user_id = f'u_{prefix}{i}'
+        users.append({'id': user_id, 'email': f'{prefix}{i}@payout.test', 'password_hash': '-',
+                      'name': f'Payout Driver {i}', 'phone': f'+2547{phone_offset + i:08d}',
+                      'role': 'driver', 'created_at': now})
+        trips.append({'id': f't_{prefix}{i}', 'passenger_id': user_id, 'driver_id': user_id,
+                      'pickup_lat': -1.2921, 'pickup_lng': 36.8219, 'pickup_address': 'CBD',
+                      'dropoff_lat': -1.2632, 'dropoff_lng': 36.8036, 'dropoff_address': 'Westlands',
+                      'status': 'completed', 'fare': 1000, 'distance': 7.2, 'duration': 14, 'payment_status': 'paid',
+                      'created_at': now, 'completed_at': now})
+        payouts.append({'id': f'po_{prefix}{i}', 'driver_id': user_id, 'amount': 500,
+                        'phone': f'2547{phone_offset + i:08d}', 'status': 'pending', 'attempts': 0,
+                        'created_at': now, 'updated_at': now})
+    for model, rows in ((User, users), (Trip, trips), (Payout, payouts)):
+        db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+def settle(app, label, prefix, count, workers, phone_offset, args):
+    from models import db, User, Trip, Payout
+    from services.payouts import process_pending
+
+    with app.app_context():
+        queue_payouts(db, (User, Trip, Payout), prefix, count, phone_offset)
+        start = time.perf_counter()
+        totals = process_pending(batch_size=args.batch_size, workers=workers, retries=args.retries)
+        submitted = time.perf_counter() - start
+
+        # Results arrive at the server callback_delay after acceptance
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            db.session.rollback()
+            open_payouts = Payout.query.filter(
+                Payout.id.like(f'po_{prefix}%'), Payout.status.notin_(('paid', 'failed'))
+            ).count()
+            if not open_payouts:
+                break
+            time.sleep(0.1)
+        settled = time.perf_counter() - start
+        paid = Payout.query.filter(Payout.id.like(f'po_{prefix}%'), Payout.status == 'paid').count()
+
+    print(f'{label:<12}{count:>8}{totals["batches"]:>9}{submitted:>12.2f}{count / submitted:>10.1f}'
+          f'{settled:>11.2f}{paid:>7}{count - paid:>9}')
+    return paid == count
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched B2C payout settlement')
+    parser.add_argument('--payouts', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=32, help='Concurrent B2C requests')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--baseline', type=int, default=50, help='Payouts settled one at a time first (0 to skip)')
+    parser.add_argument('--mpesa-delay-ms', type=float, default=200)
+    parser.add_argument('--callback-delay-ms', type=float, default=500)
+    parser.add_argument('--b2c-error-rate', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub = start_stub(delay=args.mpesa_delay_ms / 1000, callback_delay=args.callback_delay_ms / 1000,
+                      b2c_error_rate=args.b2c_error_rate)
+    proc, base_url = start_server(SimpleNamespace(worker_class='gthread', workers=None), stub.url)
+    try:
+        from app import create_app
+        from models import Config
+        app = create_app()
+        with app.app_context():
+            Config.set_value('MPESA_RESULT_URL', f'{base_url}/api/v1/payments/result')
+            Config.set_value('MPESA_TIMEOUT_URL', f'{base_url}/api/v1/payments/timeout')
+
+        print(f'M-Pesa stub {stub.url} ({args.mpesa_delay_ms:.0f}ms per request), server {base_url}')
+        print(f'{"run":<12}{"payouts":>8}{"batches":>9}{"submit s":>12}{"per s":>10}{"settled s":>11}{"paid":>7}{"unpaid":>9}')
+        ok = True
+        if args.baseline:
+            ok &= settle(app, 'sequential', 'base', args.baseline, 1, 0, args)
+        ok &= settle(app, f'{args.workers} workers', 'pool', args.payouts, args.workers, 10000000, args)
+        print(f'\nStub: {stub.b2c_errors} B2C 503s, {stub.b2c_duplicates} duplicate submissions, '
+              f'{stub.callbacks_sent} callbacks sent, {stub.callback_errors} callback errors')
+        if args.baseline:
+            print(f'Sequential at this latency would take {args.payouts * args.mpesa_delay_ms / 1000:.0f}s '
+                  f'to submit {args.payouts} payouts')
+        if not ok:
+            sys.exit('Some payouts were not paid')
+    finally:
+        proc.terminate()
+        proc.wait()
+        stub.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Registration throughput benchmark
+
+Registers N users against a throwaway SQLite database through the Flask
+test client and reports registrations per second and SQL statements per
+registration (including duplicate-email/phone rejections).
+
+Usage:
+    python benchmarks/bench_registration.py [-n 200] [--cheap-hash]
+
+--cheap-hash swaps PBKDF2 for a single-iteration hash so the numbers
+reflect the database path rather than password hashing.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark POST /auth/register')
+    parser.add_argument('-n', '--count', type=int, default=200, help='Number of registrations')
+    parser.add_argument('--cheap-hash', action='store_true', help='Use a 1-iteration password hash')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_registration.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import create_app
+    from models import User
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from werkzeug.security import generate_password_hash
+
+    if args.cheap_hash:
+        User.set_password = lambda self, password: setattr(
+            self, 'password_hash', generate_password_hash(password, method='pbkdf2:sha256:1'))
+
+    app = create_app()
+    client = app.test_client()
+
+    statements = [0]
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    def register(i, role):
+        return client.post('/api/v1/auth/register', json={
+            'email': f'bench{i}@example.com',
+            'password': 'password123',
+            'name': f'Bench User {i}',
+            'phone': f'+2547{i:08d}',
+            'role': role
+        })
+
+    # Warm up config cache and connection pool
+    register(10**7, 'passenger')
+
+    statements[0] = 0
+    start = time.perf_counter()
+    for i in range(args.count):
+        response = register(i, 'driver' if i % 2 else 'passenger')
+        assert response.status_code == 201, response.json
+    elapsed = time.perf_counter() - start
+    created_statements = statements[0]
+
+    statements[0] = 0
+    duplicates = min(args.count, 50)
+    for i in range(duplicates):
+        response = register(i, 'passenger')
+        assert response.status_code == 409, response.json
+    duplicate_statements = statements[0]
+
+    print(f'Registrations:            {args.count}')
+    print(f'Elapsed:                  {elapsed:.2f}s')
+    print(f'Registrations/sec:        {args.count / elapsed:.1f}')
+    print(f'Statements/registration:  {created_statements / args.count:.2f}')
+    print(f'Statements/duplicate:     {duplicate_statements / duplicates:.2f}')
+    print(f'Password hashing:         {"1 iteration" if args.cheap_hash else "default PBKDF2"}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark
+
+Boots the app in fresh interpreters (as a Gunicorn master with
+preload_app does) and measures time-to-first-request: importing app.py,
+which runs create_app(), then serving GET /api/v1/health. Each run uses
+`python -X importtime` so the slowest top-level imports can be reported
+next to the create_app() phase timings from utils/boot.py.
+
+Default boot (create_all on every start) and FAST_BOOT (schema-version
+check) are compared against the same already-initialised SQLite database.
+Exits non-zero if the median FAST_BOOT time-to-first-request exceeds
+--budget-ms.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 800] [--top 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+status = app.test_client().get('/api/v1/health').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'importMs': (imported - start) * 1000,
+    'firstRequestMs': (served - imported) * 1000,
+    'totalMs': (served - start) * 1000,
+    'phases': app.extensions['boot_timings'],
+}))
+"""
+
+def boot_once(env):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    if result['status'] != 200:
+        raise RuntimeError(f"health check returned {result['status']}")
+    return result, parse_importtime(proc.stderr)
+
+def parse_importtime(stderr):
+    """Cumulative microseconds of each import made directly by app.py"""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        # -X importtime lists a module's imports before the module itself
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == 'app':
+                return children
+            children = {}
+    return {}
+
+def run_mode(label, env, runs):
+    results, imports = [], {}
+    for _ in range(runs):
+        result, modules = boot_once(env)
+        results.append(result)
+        for name, us in modules.items():
+            imports.setdefault(name, []).append(us)
+
+    total = statistics.median(r['totalMs'] for r in results)
+    phases = {
+        name: statistics.median(r['phases'][name] for r in results)
+        for name in results[0]['phases']
+    }
+    print(f"\n{label}")
+    print(f"  time-to-first-request: {total:.1f} ms (median of {runs})")
+    print(f"  import app:            {statistics.median(r['importMs'] for r in results):.1f} ms")
+    print(f"  first request:         {statistics.median(r['firstRequestMs'] for r in results):.1f} ms")
+    print("  create_app phases:     " + ", ".join(f"{k}={v:.1f}" for k, v in phases.items()))
+    return total, {name: statistics.median(values) for name, values in imports.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app cold-start time')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per mode')
+    parser.add_argument('--budget-ms', type=float, default=800, help='FAST_BOOT time-to-first-request budget')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench_startup.db")}'
+    env.pop('ENABLE_SWAGGER_UI', None)
+    env.pop('BOOT_PROFILE', None)
+
+    # Initialise the schema once so both modes boot against an existing database
+    boot_once(dict(env, FAST_BOOT='true'))
+
+    default_ms, _ = run_mode('Default boot (create_all)', dict(env, FAST_BOOT='false'), args.runs)
+    fast_ms, imports = run_mode('FAST_BOOT (schema version check)', dict(env, FAST_BOOT='true'), args.runs)
+
+    print("\nSlowest imports made by app.py (cumulative, FAST_BOOT):")
+    for name, us in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    print(f"\nFAST_BOOT saves {default_ms - fast_ms:.1f} ms; budget {args.budget_ms:.0f} ms -> "
+          f"{'OK' if fast_ms <= args.budget_ms else 'OVER BUDGET'}")
+    return 0 if fast_ms <= args.budget_ms else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Trip address search benchmark
+
+Seeds a temporary SQLite database with --trips trips between random
+Nairobi places (the FTS5 triggers index them as they are inserted), then
+times the first page of GET /admin/trips/search's query for a few
+searches through the FTS5 index and through the LIKE scan it replaces.
+
+Usage:
+    python benchmarks/bench_trip_search.py [--trips 1000000] [--runs 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PLACES = [
+    'Westlands, Sarit Centre', 'JKIA Terminal 1A', 'Wilson Airport', 'Kilimani, Yaya Centre',
+    'CBD, Kenyatta Avenue', 'Upper Hill, KNH', 'Karen, The Hub', 'Lavington Mall', 'Gigiri, UN Avenue',
+    'Parklands, Aga Khan Hospital', 'Eastleigh, First Avenue', 'South B, Capital Centre',
+    'Thika Road Mall', 'Two Rivers Mall, Ruaka', 'Kileleshwa, Othaya Road', 'Embakasi, Fedha',
+    'Rongai, Maasai Lodge', 'Ngong Road, Junction Mall', 'Muthaiga, Limuru Road', 'Langata, Galleria'
+]
+QUERIES = ['westlands', 'jkia', 'junction mall', 'galler', '17 jkia', '250 yaya centre']
+
+def seed(db, Trip, count, batch=20000):
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=365)
+    for offset in range(0, count, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, count)):
+            pickup, dropoff = rng.sample(PLACES, 2)
+            rows.append({'id': f't_s{i}', 'passenger_id': 'u_search', 'driver_id': None,
+                         'pickup_lat': -1.29, 'pickup_lng': 36.82, 'pickup_address': f'{rng.randint(1, 400)} {pickup}',
+                         'dropoff_lat': -1.26, 'dropoff_lng': 36.80, 'dropoff_address': dropoff,
+                         'status': 'completed', 'fare': 500, 'distance': 5, 'duration': 12, 'payment_status': 'paid',
+                         'created_at': start + timedelta(seconds=i * 30)})
+        db.session.execute(Trip.__table__.insert(), rows)
+        db.session.commit()
+
+def time_search(backend, runs, limit):
+    import services.trip_search as trip_search
+    from utils.serializers import serialize_trips
+
+    trip_search._backend = backend
+    results = {}
+    for query in QUERIES:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            trips, order = trip_search.search_trips(query)
+            page = serialize_trips(trips.limit(limit + 1))
+            timings.append((time.perf_counter() - start) * 1000)
+        results[query] = (statistics.median(timings), len(page), order)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark trip address search')
+    parser.add_argument('--trips', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "search.db")}'
+    # Seeding and the LIKE scan would fill the log
+    os.environ.setdefault('DB_STATS_ENABLED', 'false')
+    from app import create_app
+    from models import db, Trip
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db, Trip, args.trips)
+        print(f'Seeded {args.trips} trips in {time.perf_counter() - start:.1f}s (FTS5 maintained by triggers)')
+
+        fts = time_search('fts5', args.runs, args.limit)
+        like = time_search('like', max(args.runs // 5, 1), args.limit)
+
+    print(f'\n{"query":<18}{"fts5 ms":>10}{"like ms":>10}{"rows":>6}  order')
+    for query in QUERIES:
+        print(f'{query:<18}{fts[query][0]:>10.1f}{like[query][0]:>10.1f}{fts[query][1]:>6}  {fts[query][2]}')
+
+if __name__ == '__main__':
+    main()
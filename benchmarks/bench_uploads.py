@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Document upload benchmark
+
+Compares the previous upload path (Werkzeug spools the file, the view
+seeks to measure it, FileStorage.save() copies it, then hashing would
+read it a third time) with the streaming path in utils/uploads.py
+(written and hashed once, then os.replace()d into place). Reports time
+per upload and peak Python heap during the request (tracemalloc), and
+checks both paths store identical bytes and hashes.
+
+Usage:
+    python benchmarks/bench_uploads.py [--size-kb 4096] [-n 20]
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, request
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import EnvironBuilder, encode_multipart, run_wsgi_app
+
+from utils.helpers import hash_file
+from utils.uploads import init_uploads
+
+def build_app(directory, max_bytes):
+    app = Flask(__name__)
+    init_uploads(app)
+
+    @app.post('/spool')
+    def spool():
+        file = request.files['file']
+        file.seek(0, os.SEEK_END)
+        if file.tell() > max_bytes:
+            return jsonify({'error': 'too large'}), 400
+        file.seek(0)
+        path = os.path.join(directory, f'spool_{uuid.uuid4().hex[:8]}.pdf')
+        file.save(path)
+        if not os.path.exists(path):
+            return jsonify({'error': 'save failed'}), 500
+        return jsonify({'path': path, 'sha256': hash_file(path)})
+
+    @app.post('/stream')
+    def stream():
+        request.stream_files_to(directory, max_bytes=max_bytes)
+        file = request.files['file']
+        path = os.path.join(directory, f'stream_{uuid.uuid4().hex[:8]}.pdf')
+        saved = file.stream.commit(path)
+        return jsonify({'path': path, 'sha256': saved['sha256']})
+
+    return app
+
+def upload(app, path, boundary, body):
+    environ = EnvironBuilder(path=path, method='POST', input_stream=io.BytesIO(body),
+                             content_type=f'multipart/form-data; boundary={boundary}',
+                             content_length=len(body)).get_environ()
+    app_iter, status, _ = run_wsgi_app(app, environ, buffered=True)
+    assert status.startswith('200'), status
+    return json.loads(b''.join(app_iter))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark spooled vs streamed document uploads')
+    parser.add_argument('--size-kb', type=int, default=4096, help='Uploaded file size')
+    parser.add_argument('-n', '--uploads', type=int, default=20, help='Uploads per path')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        app = build_app(directory, max_bytes=64 * 1024 * 1024)
+        payload = os.urandom(args.size_kb * 1024)
+        boundary, body = encode_multipart({
+            'type': 'license',
+            'file': FileStorage(io.BytesIO(payload), 'doc.pdf', content_type='application/pdf'),
+        })
+
+        results = {}
+        for path in ('/spool', '/stream'):
+            upload(app, path, boundary, body)  # warm up
+            start = time.perf_counter()
+            for _ in range(args.uploads):
+                result = upload(app, path, boundary, body)
+            elapsed = (time.perf_counter() - start) / args.uploads
+
+            tracemalloc.start()
+            upload(app, path, boundary, body)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            with open(result['path'], 'rb') as f:
+                assert f.read() == payload, f'{path}: stored bytes differ'
+            results[path] = (elapsed, peak, result['sha256'])
+
+        assert results['/spool'][2] == results['/stream'][2], 'hashes differ'
+        print(f'{args.size_kb} KB file, {args.uploads} uploads per path')
+        print(f'{"path":<10}{"ms/upload":>12}{"peak heap KB":>15}')
+        for path, (elapsed, peak, _) in results.items():
+            print(f'{path:<10}{elapsed * 1000:>12.2f}{peak / 1024:>15,.0f}')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+User typeahead search benchmark
+
+Seeds a temporary SQLite database with --users users and times
+services/user_search.py (index range scans, one UNION ALL) against the
+obvious ILIKE '%q%' over name, email and phone, for name, email and phone
+prefixes as a support agent would type them.
+
+Usage:
+    python benchmarks/bench_user_search.py [--users 500000] [--runs 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST = ['Jane', 'John', 'Wanjiru', 'Otieno', 'Amina', 'Brian', 'Faith', 'Kevin', 'Mercy', 'Peter',
+         'Grace', 'Dennis', 'Akinyi', 'Kamau', 'Njeri', 'Mwangi', 'Achieng', 'Kiprop', 'Halima', 'Juma']
+QUERIES = ['ja', 'jane', 'jane wanj', 'mercy.k', 'otieno.a12', '0700001', '+254 700 02', '7000031']
+
+def seed(db, User, count, batch=20000):
+    rng = random.Random(7)
+    for offset in range(0, count, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, count)):
+            first, last = rng.sample(FIRST, 2)
+            rows.append({'id': f'u_s{i}', 'email': f'{first.lower()}.{last[0].lower()}{i}@mail.test',
+                         'password_hash': '-', 'name': f'{first} {last}',
+                         'phone': rng.choice(['+2547', '07', '2547']) + f'{i:08d}', 'role': 'passenger'})
+        db.session.execute(User.__table__.insert(), rows)
+        db.session.commit()
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark user prefix search')
+    parser.add_argument('--users', type=int, default=500000)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "users.db")}'
+    os.environ.setdefault('DB_STATS_ENABLED', 'false')
+    from app import create_app
+    from models import db, User
+    from services.user_search import search_user_ids
+    from sqlalchemy import or_
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db, User, args.users)
+        print(f'Seeded {args.users} users in {time.perf_counter() - start:.1f}s')
+
+        def scan(query):
+            pattern = f'%{query}%'
+            return [row.id for row in User.query.with_entities(User.id).filter(or_(
+                User.name.ilike(pattern), User.email.ilike(pattern), User.phone.ilike(pattern)
+            )).order_by(User.name).limit(args.limit + 1)]
+
+        print(f'\n{"query":<14}{"index p50":>11}{"p95":>8}{"scan p50":>10}{"hits":>6}')
+        for query in QUERIES:
+            p50, p95, (ids, _) = timed(lambda: search_user_ids(query, args.limit), args.runs)
+            scan_p50, _, _ = timed(lambda: scan(query), max(args.runs // 10, 1))
+            print(f'{query:<14}{p50:>9.2f}ms{p95:>6.2f}ms{scan_p50:>8.1f}ms{len(ids):>6}')
+
+if __name__ == '__main__':
+    main()
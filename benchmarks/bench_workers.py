@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Gunicorn worker-class load test
+
+Starts gunicorn with gunicorn.conf.py in several configurations and drives
+it with concurrent clients for a fixed duration. The workload mixes
+POST /auth/login (a password hash check), GET /payments/status (an STK
+query against a local M-Pesa stub that answers after --upstream-ms) and
+authenticated GET /trips reads; the first two block a sync worker. Reports requests per second and
+p50/p95/p99 latency for each configuration:
+
+    sync x1         the previous gunicorn.conf.py (1 sync worker)
+    gthread x1      one worker with GUNICORN_THREADS threads
+    tuned           gunicorn.conf.py defaults derived from CPU count
+
+Uses a throwaway SQLite database, so write-heavy endpoints are left out.
+
+Usage:
+    python benchmarks/bench_workers.py [--clients 16] [--duration 10] [--threads 4] [--upstream-ms 150]
+"""
+
+import argparse
+import http.client
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EMAIL = 'bench.workers@example.com'
+PASSWORD = 'bench-password'
+
+class MpesaStub(http.server.BaseHTTPRequestHandler):
+    """Slow Daraja stand-in: issues tokens and reports STK pushes as still processing"""
+
+    delay = 0.15
+
+    def do_GET(self):
+        self.reply({'access_token': 'bench-token', 'expires_in': '3599'})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        self.reply({'ResultCode': '4999', 'ResultDesc': 'The transaction is still under processing'})
+
+    def reply(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(delay):
+    MpesaStub.delay = delay
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MpesaStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+def seed(env, mpesa_url):
+    """Create a passenger with trips and a pending payment; returns (token, payment id)"""
+    os.environ.update(env)
+    from app import create_app
+    from flask_jwt_extended import create_access_token
+    from models import db, User, Trip, Payment, Config
+    from werkzeug.security import generate_password_hash
+
+    app = create_app()
+    with app.app_context():
+        user = User(email=EMAIL, name='Bench Workers', phone='+254700000099',
+                    password_hash=generate_password_hash(PASSWORD), role='passenger')
+        db.session.add(user)
+        db.session.flush()
+        now = datetime.utcnow()
+        db.session.execute(Trip.__table__.insert(), [{
+            'id': f't_bench{i:05d}', 'passenger_id': user.id,
+            'pickup_lat': -1.28, 'pickup_lng': 36.82, 'pickup_address': f'Pickup {i}',
+            'dropoff_lat': -1.30, 'dropoff_lng': 36.80, 'dropoff_address': f'Dropoff {i}',
+            'status': 'completed', 'fare': 350, 'distance': 3.0, 'duration': 6,
+            'payment_status': 'paid', 'created_at': now - timedelta(minutes=i), 'updated_at': now
+        } for i in range(200)])
+        payment = Payment(trip_id='t_bench00000', amount=350, phone='254700000099',
+                          checkout_request_id='ws_CO_bench', status='pending')
+        db.session.add(payment)
+        db.session.add(Config(key='MPESA_BASE_URL', value=mpesa_url))
+        db.session.commit()
+        return create_access_token(identity=user.id), payment.id
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(env, port):
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/v1/health')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+def client(port, token, payment_id, stop_at, latencies, errors, index):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    login = json.dumps({'email': EMAIL, 'password': PASSWORD})
+    n = index
+    while time.monotonic() < stop_at:
+        n += 1
+        start = time.perf_counter()
+        try:
+            # Each cycle of four: login, payment status, two trip lists
+            if n % 4 == 0:
+                conn.request('POST', '/api/v1/auth/login', body=login,
+                             headers={'Content-Type': 'application/json'})
+            elif n % 4 == 1:
+                conn.request('GET', f'/api/v1/payments/status/{payment_id}',
+                             headers={'Authorization': f'Bearer {token}'})
+            else:
+                conn.request('GET', '/api/v1/trips?limit=20',
+                             headers={'Authorization': f'Bearer {token}'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException):
+            errors.append('connection')
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def run(label, env, token, payment_id, clients, duration):
+    port = free_port()
+    proc = start_gunicorn(env, port)
+    try:
+        latencies, errors = [], []
+        stop_at = time.monotonic() + duration
+        threads = [
+            threading.Thread(target=client, args=(port, token, payment_id, stop_at, latencies, errors, i))
+            for i in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    rps = len(latencies) / duration
+    print(f"{label:<28} {rps:8.1f} req/s  p50 {pct(0.50):7.1f} ms  "
+          f"p95 {pct(0.95):7.1f} ms  p99 {pct(0.99):7.1f} ms  errors {len(errors)}")
+    return rps
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare gunicorn worker classes under load')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per configuration')
+    parser.add_argument('--threads', type=int, default=4, help='GUNICORN_THREADS for gthread runs')
+    parser.add_argument('--upstream-ms', type=float, default=150, help='M-Pesa stub response delay')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench_workers.db")}',
+        'JWT_SECRET_KEY': 'bench-workers-secret',
+        'FAST_BOOT': 'true',
+        # Every client logs in from 127.0.0.1 as the same user
+        'LOGIN_IP_ATTEMPTS': '1000000',
+        'LOGIN_EMAIL_ATTEMPTS': '1000000',
+    })
+    for key in ('WEB_CONCURRENCY', 'GUNICORN_WORKER_CLASS', 'GUNICORN_THREADS'):
+        env.pop(key, None)
+    token, payment_id = seed(env, start_stub(args.upstream_ms / 1000))
+
+    print(f"{args.clients} clients, {args.duration:.0f}s per configuration, "
+          f"{os.cpu_count()} CPUs\n")
+    baseline = run('sync x1 (previous config)', dict(env, GUNICORN_WORKER_CLASS='sync', WEB_CONCURRENCY='1'),
+                   token, payment_id, args.clients, args.duration)
+    run(f'gthread x1, {args.threads} threads', dict(env, GUNICORN_WORKER_CLASS='gthread', WEB_CONCURRENCY='1',
+                                                   GUNICORN_THREADS=str(args.threads)),
+        token, payment_id, args.clients, args.duration)
+    tuned = run('tuned (gunicorn.conf.py)', dict(env, GUNICORN_THREADS=str(args.threads)),
+                token, payment_id, args.clients, args.duration)
+    print(f"\nTuned config: {tuned / baseline:.1f}x the previous throughput")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Query budget harness
+
+Seeds a throwaway SQLite database with --rows rows per table, then calls
+every endpoint once through the Flask test client with
+QUERY_BUDGET_MODE=strict. Each request's statement count is printed next
+to its @query_budget; any request over budget fails the run (exit code 1).
+The user cache is cleared before every request so N+1 loops over a list
+cannot hide behind it.
+
+Routes without a budget are listed with their counts as candidates for
+one, and routes the harness does not call are reported so new endpoints
+get added here.
+
+Usage:
+    python benchmarks/check_query_budgets.py [-n 200]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'Budget123!'
+
+# Served without the app or not meaningful to call here
+SKIPPED_ENDPOINTS = {'static'}
+
+def seed(db, models, count):
+    """Bulk insert users, drivers, trips, payments, ratings and notifications"""
+    from werkzeug.security import generate_password_hash
+    User, Driver, Trip, Payment, Rating, Notification = models
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+
+    users = [{'id': 'u_qb_admin', 'email': 'admin@budget.test', 'password_hash': password_hash,
+              'name': 'Budget Admin', 'phone': '+254700000000', 'role': 'admin', 'created_at': now}]
+    drivers = []
+    for i in range(count):
+        users.append({'id': f'u_qb_p{i}', 'email': f'p{i}@budget.test', 'password_hash': password_hash,
+                      'name': f'Passenger {i}', 'phone': f'+2547100{i:05d}', 'role': 'passenger',
+                      'created_at': now - timedelta(minutes=i)})
+        users.append({'id': f'u_qb_d{i}', 'email': f'd{i}@budget.test', 'password_hash': password_hash,
+                      'name': f'Driver {i}', 'phone': f'+2547200{i:05d}', 'role': 'driver',
+                      'created_at': now - timedelta(minutes=i)})
+        drivers.append({'id': f'd_qb{i}', 'user_id': f'u_qb_d{i}', 'vehicle_make': 'Toyota',
+                        'vehicle_model': 'Vitz', 'vehicle_year': 2015, 'vehicle_plate': f'KDA {i:03d}Q',
+                        'vehicle_color': 'Silver', 'rating': 4.5, 'total_trips': 10, 'total_earnings': 5000,
+                        'status': 'pending' if i == count - 1 else 'approved', 'is_online': i % 2 == 0,
+                        'created_at': now - timedelta(minutes=i)})
+
+    trips, payments, ratings, notifications = [], [], [], []
+    for i in range(count):
+        trips.append({'id': f't_qb{i}', 'passenger_id': f'u_qb_p{i % 10}', 'driver_id': f'u_qb_d{i % 10}',
+                      'pickup_lat': -1.2921, 'pickup_lng': 36.8219, 'pickup_address': 'CBD',
+                      'dropoff_lat': -1.2632, 'dropoff_lng': 36.8036, 'dropoff_address': 'Westlands',
+                      'status': 'completed', 'fare': 559.4, 'distance': 7.19, 'duration': 14,
+                      'payment_status': 'paid', 'created_at': now - timedelta(minutes=i),
+                      'accepted_at': now, 'started_at': now, 'completed_at': now})
+        payments.append({'id': f'pay_qb{i}', 'trip_id': f't_qb{i}', 'amount': 559.4, 'phone': '+254710000000',
+                         'checkout_request_id': f'mock_qb{i}', 'mpesa_receipt_number': f'QB{i}',
+                         'status': 'paid', 'created_at': now - timedelta(minutes=i)})
+        if i % 2:
+            ratings.append({'id': f'rating_qb{i}', 'trip_id': f't_qb{i}', 'passenger_rating': 5,
+                            'driver_rating': 4, 'created_at': now - timedelta(minutes=i)})
+        notifications.append({'id': f'notif_qb{i}', 'user_id': 'u_qb_p0', 'title': 'Trip completed',
+                              'message': 'Your trip has been completed', 'type': 'system',
+                              'trip_id': f't_qb{i}', 'is_read': False, 'is_sent': True,
+                              'created_at': now - timedelta(minutes=i)})
+
+    # Trips in the states the write endpoints need
+    def trip(trip_id, status, driver_id=None, payment_status='pending'):
+        return {'id': trip_id, 'passenger_id': 'u_qb_p0', 'driver_id': driver_id,
+                'pickup_lat': -1.2921, 'pickup_lng': 36.8219, 'pickup_address': 'CBD',
+                'dropoff_lat': -1.2632, 'dropoff_lng': 36.8036, 'dropoff_address': 'Westlands',
+                'status': status, 'fare': 559.4, 'distance': 7.19, 'duration': 14,
+                'payment_status': payment_status, 'created_at': now,
+                'accepted_at': now if driver_id else None,
+                'started_at': now if status in ('driving', 'completed') else None,
+                'completed_at': now if status == 'completed' else None}
+    trips += [
+        trip('t_qb_requested', 'requested'),
+        trip('t_qb_delete', 'requested'),
+        trip('t_qb_accepted', 'accepted', 'u_qb_d0'),
+        trip('t_qb_driving', 'driving', 'u_qb_d0'),
+        trip('t_qb_unpaid', 'completed', 'u_qb_d0'),
+        trip('t_qb_pending_pay', 'completed', 'u_qb_d0'),
+        trip('t_qb_unrated', 'completed', 'u_qb_d0', 'paid'),
+        trip('t_qb_rate', 'completed', 'u_qb_d0', 'paid'),
+    ]
+    payments.append({'id': 'pay_qb_pending', 'trip_id': 't_qb_pending_pay', 'amount': 559.4,
+                     'phone': '+254710000000', 'checkout_request_id': 'mock_qb_pending', 'mpesa_receipt_number': None,
+                     'status': 'pending', 'created_at': now})
+
+    for model, rows in ((User, users), (Driver, drivers), (Trip, trips), (Payment, payments),
+                        (Rating, ratings), (Notification, notifications)):
+        db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+def scenario(count):
+    """(method, path, role, request kwargs) for every endpoint; order matters for writes"""
+    last = count - 1
+    today = datetime.utcnow().date().isoformat()
+    return [
+        ('GET', '/', None, {}),
+        ('GET', '/api/v1/health', None, {}),
+        ('GET', '/apispec.json', None, {}),
+        ('GET', '/metrics', 'metrics', {}),
+
+        ('POST', '/api/v1/auth/register', None, {'json': {
+            'name': 'New Rider', 'email': 'new@budget.test', 'phone': '0799999999',
+            'password': PASSWORD, 'role': 'passenger'}}),
+        ('POST', '/api/v1/auth/login', None, {'json': {'email': 'p0@budget.test', 'password': PASSWORD}}),
+        ('GET', '/api/v1/auth/me', 'passenger', {}),
+
+        ('GET', '/api/v1/users', 'admin', {'query_string': {'limit': 50}}),
+        ('GET', '/api/v1/users/search', 'admin', {'query_string': {'q': 'passenger'}}),
+        ('GET', '/api/v1/users/u_qb_p1', 'admin', {}),
+        ('GET', '/api/v1/users/profile', 'passenger', {}),
+        ('PUT', '/api/v1/users/profile', 'passenger', {'json': {'name': 'Passenger Zero'}}),
+
+        ('GET', '/api/v1/trips', 'passenger', {'query_string': {'limit': 50}}),
+        ('GET', '/api/v1/trips/available', 'driver', {}),
+        ('POST', '/api/v1/trips', 'passenger', {'json': {
+            'pickup': {'lat': -1.2921, 'lng': 36.8219, 'address': 'CBD'},
+            'dropoff': {'lat': -1.2632, 'lng': 36.8036, 'address': 'Westlands'}}}),
+        ('GET', '/api/v1/trips/t_qb_driving', 'passenger', {}),
+        ('PUT', '/api/v1/trips/t_qb_requested/accept', 'driver', {}),
+        ('PUT', '/api/v1/trips/t_qb_accepted', 'driver', {'json': {'status': 'driving'}}),
+        ('PUT', '/api/v1/trips/t_qb_driving/complete', 'driver', {}),
+        ('POST', '/api/v1/trips/t_qb_rate/rate', 'passenger', {'json': {'rating': 5, 'feedback': 'Smooth'}}),
+        ('DELETE', '/api/v1/trips/t_qb_delete', 'passenger', {}),
+
+        ('GET', '/api/v1/drivers/available-trips', 'driver', {}),
+        ('PUT', '/api/v1/drivers/status', 'driver', {'json': {'isOnline': True}}),
+        ('GET', '/api/v1/drivers/profile', 'driver', {}),
+        ('PUT', '/api/v1/drivers/profile', 'driver', {'json': {'vehicle': {'color': 'Blue'}}}),
+        ('POST', '/api/v1/drivers/upload-document', 'driver', {'data': {
+            'type': 'insurance', 'file': (io.BytesIO(b'%PDF-1.4 budget'), 'insurance.pdf')},
+            'content_type': 'multipart/form-data'}),
+        ('GET', '/api/v1/drivers/earnings', 'driver', {}),
+        ('POST', '/api/v1/drivers/payout', 'driver', {'json': {'amount': 100, 'phone': '0720000000'}}),
+        ('GET', '/api/v1/drivers/payouts', 'driver', {}),
+        ('GET', '/api/v1/drivers/d_qb1', 'admin', {}),
+        ('GET', '/api/v1/drivers/d_qb1/stats', 'admin', {}),
+
+        ('GET', '/api/v1/payments', 'passenger', {}),
+        ('GET', '/api/v1/payments/pay_qb0', 'passenger', {}),
+        ('GET', '/api/v1/payments/status/pay_qb_pending', 'passenger', {}),
+        ('POST', '/api/v1/payments/initiate', 'passenger', {'json': {
+            'tripId': 't_qb_unpaid', 'phone': '0710000000', 'amount': 559.4}}),
+        ('POST', '/api/v1/payments/mpesa/stk-push', 'passenger', {'json': {
+            'tripId': 't_qb_unpaid', 'phoneNumber': '0710000000', 'amount': 559.4}}),
+        ('POST', '/api/v1/payments/callback', None, {'json': {'Body': {'stkCallback': {
+            'CheckoutRequestID': 'mock_qb_pending', 'ResultCode': 0, 'ResultDesc': 'Success',
+            'CallbackMetadata': {'Item': [{'Name': 'MpesaReceiptNumber', 'Value': 'QBPAID'}]}}}}}),
+        ('POST', '/api/v1/payments/result', None, {'json': {'Result': {
+            'ResultCode': 0, 'OriginatorConversationID': 'po_unknown', 'ConversationID': 'AG_unknown'}}}),
+        ('POST', '/api/v1/payments/timeout', None, {'json': {'Result': {
+            'OriginatorConversationID': 'po_unknown', 'ConversationID': 'AG_unknown'}}}),
+
+        ('POST', '/api/v1/ratings', 'passenger', {'json': {'tripId': 't_qb_unrated', 'passengerRating': 5}}),
+        ('GET', '/api/v1/ratings', 'passenger', {}),
+        ('GET', '/api/v1/ratings/rating_qb1', 'admin', {}),
+        ('PUT', '/api/v1/ratings/rating_qb1', 'admin', {'json': {'driverFeedback': 'Polite'}}),
+        ('DELETE', '/api/v1/ratings/rating_qb3', 'admin', {}),
+
+        ('POST', '/api/v1/notifications', 'passenger', {'json': {
+            'title': 'Budget', 'message': 'Harness notification', 'type': 'system'}}),
+        ('GET', '/api/v1/notifications', 'passenger', {}),
+        ('PUT', '/api/v1/notifications/notif_qb0', 'passenger', {'json': {'isRead': True}}),
+        ('DELETE', '/api/v1/notifications/notif_qb1', 'passenger', {}),
+
+        ('GET', '/api/v1/admin/stats', 'admin', {}),
+        ('GET', '/api/v1/admin/drivers', 'admin', {}),
+        ('PUT', f'/api/v1/admin/drivers/d_qb{last}/approve', 'admin', {}),
+        ('GET', '/api/v1/admin/drivers/d_qb0/documents/insurance', 'admin', {}),
+        ('GET', '/api/v1/admin/trips', 'admin', {}),
+        ('GET', '/api/v1/admin/trips/search?q=westl', 'admin', {}),
+        ('GET', '/api/v1/admin/payments', 'admin', {}),
+        ('GET', '/api/v1/admin/exports/trips', 'admin', {'query_string': {'start': today}}),
+        ('GET', '/api/v1/admin/users/online', 'admin', {}),
+        ('GET', '/api/v1/admin/cache', 'admin', {}),
+        ('GET', '/api/v1/admin/compression', 'admin', {}),
+        ('GET', '/api/v1/admin/diagnostics/db', 'admin', {}),
+        ('GET', '/api/v1/admin/profiles', 'admin', {}),
+        ('GET', '/api/v1/admin/profiles/0000000000000000', 'admin', {}),
+        ('GET', '/api/v1/admin/profiles/0000000000000000/pstats', 'admin', {}),
+
+        ('DELETE', f'/api/v1/drivers/d_qb{last - 1}', 'admin', {}),
+        ('DELETE', f'/api/v1/users/u_qb_p{last}', 'admin', {}),
+        ('POST', '/api/v1/migrate/migrate-db', None, {}),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check every endpoint against its @query_budget')
+    parser.add_argument('-n', '--rows', type=int, default=200, help='Rows per table')
+    args = parser.parse_args()
+    if args.rows < 12:
+        parser.error('--rows must be at least 12')
+
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "budget.db")}',
+        'QUERY_BUDGET_MODE': 'strict',
+        'DB_STATS_ENABLED': 'true',
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+        'LOGIN_IP_ATTEMPTS': '1000000',
+        'METRICS_TOKEN': 'budget-metrics',
+    })
+    os.environ.pop('METRICS_DIR', None)
+    # Uploads go to the relative uploads/ folders
+    os.chdir(workdir)
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from models import db, User, Driver, Trip, Payment, Rating, Notification, Config
+    from utils.cache import user_cache
+    from utils.query_budget import QueryBudgetExceeded, budget_for
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        seed(db, (User, Driver, Trip, Payment, Rating, Notification), args.rows)
+        # Refuse M-Pesa calls immediately; the routes fall back to mock pushes
+        Config.set_value('MPESA_BASE_URL', 'http://127.0.0.1:9')
+        tokens = {
+            'admin': create_access_token(identity='u_qb_admin'),
+            'passenger': create_access_token(identity='u_qb_p0'),
+            'driver': create_access_token(identity='u_qb_d0'),
+            'metrics': os.environ['METRICS_TOKEN'],
+        }
+
+    client = app.test_client()
+    called = set()
+    violations = []
+    unbudgeted = []
+
+    print(f'{"method":<7}{"path":<52}{"status":>7}{"queries":>9}{"budget":>8}')
+    for method, path, role, kwargs in scenario(args.rows):
+        headers = {'Authorization': f'Bearer {tokens[role]}'} if role else {}
+        user_cache.clear()
+        try:
+            response = client.open(path, method=method, headers=headers, **kwargs)
+        except QueryBudgetExceeded as e:
+            violations.append((method, path, e))
+            print(f'{method:<7}{path:<52}{"-":>7}{e.count:>9}{e.budget:>8}  OVER BUDGET')
+            continue
+
+        with app.test_request_context(path, method=method):
+            from flask import request
+            endpoint = request.url_rule.endpoint if request.url_rule else None
+            budget = budget_for(endpoint) if endpoint else None
+        called.add(endpoint)
+        count = response.headers.get('X-Query-Count', '?')
+        # Streamed bodies (exports) hold their slot until closed
+        response.close()
+        if budget is None:
+            unbudgeted.append((method, path, count))
+        print(f'{method:<7}{path:<52}{response.status_code:>7}{count:>9}{budget if budget is not None else "-":>8}')
+
+    missing = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - called - SKIPPED_ENDPOINTS)
+    if missing:
+        print(f'\nNot exercised: {", ".join(missing)}')
+    if unbudgeted:
+        print(f'\n{len(unbudgeted)} request(s) hit routes without a @query_budget')
+    if violations:
+        print(f'\n{len(violations)} request(s) over budget:')
+        for method, path, error in violations:
+            print(f'  {method} {path}: {error}')
+        sys.exit(1)
+    print('\nAll requests within budget')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+End-to-end ride lifecycle load generator
+
+Simulates N passengers and M drivers over HTTP against a local server and
+the local M-Pesa stub (benchmarks/mpesa_stub.py):
+
+    passenger: register -> login -> create trip -> (wait for driver)
+               -> pay (STK push) -> payment confirmed (stub callback) -> rate
+    driver:    register -> login -> accept -> drive -> complete
+
+Passengers run --rides rides each; drivers take trips from a shared queue.
+Reports per-step throughput and p50/p95/p99 latency, plus error counts by
+status code. "payment_confirmed" is the time from the STK push response
+until the trip reads as paid, i.e. the callback round trip.
+
+By default a throwaway gunicorn (gunicorn.conf.py, SQLite database) is
+started with the M-Pesa config pointed at the stub, AUTO_COMPLETE_PAYMENT
+off (so trips stay unpaid until the callback) and login rate limits
+lifted. With --base-url an already running local server is used instead;
+it must have MPESA_BASE_URL set to the printed stub URL, MPESA_CALLBACK_URL
+pointing back at itself, AUTO_COMPLETE_PAYMENT=false and LOGIN_IP_ATTEMPTS
+raised.
+
+Usage:
+    python benchmarks/load_ride_lifecycle.py [--passengers 20] [--drivers 5] [--rides 3]
+        [--base-url URL] [--worker-class gthread] [--workers N] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mpesa_stub import start_stub
+
+STEPS = ('register', 'login', 'create_trip', 'accept', 'drive', 'complete',
+         'pay', 'payment_confirmed', 'rate')
+
+PASSWORD = 'load-test-password'
+
+class Recorder:
+    """Thread-safe latency samples and error counts per step"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def record(self, step, seconds):
+        with self._lock:
+            self.samples[step].append(seconds)
+
+    def error(self, step, reason):
+        with self._lock:
+            self.errors[step][str(reason)] += 1
+
+    def call(self, step, session, method, url, **kwargs):
+        """Time one request; returns the JSON body on 2xx, else None"""
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+        except requests.RequestException as e:
+            self.error(step, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            try:
+                code = response.json()['error']['code']
+            except (ValueError, KeyError, TypeError):
+                code = ''
+            self.error(step, f'{response.status_code} {code}'.strip())
+            return None
+        self.record(step, elapsed)
+        return response.json()
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+class LoadTest:
+    def __init__(self, base_url, run_id, rides):
+        self.api = f'{base_url}/api/v1'
+        self.run_id = run_id
+        self.rides = rides
+        self.recorder = Recorder()
+        self.trips = queue.Queue()
+        self.stop = threading.Event()
+        self.completed_rides = 0
+        self._lock = threading.Lock()
+
+    def sign_up(self, session, role, index):
+        # Drivers take the upper half of the number range so phones stay unique
+        offset = 500000 if role == 'driver' else 0
+        phone = f'+2547{self.run_id:02d}{offset + index:06d}'
+        email = f'load{self.run_id}.{role}{index}@example.com'
+        body = self.recorder.call('register', session, 'POST', f'{self.api}/auth/register', json={
+            'email': email, 'password': PASSWORD, 'name': f'Load {role.title()} {index}',
+            'phone': phone, 'role': role
+        })
+        if body is None:
+            return None
+        body = self.recorder.call('login', session, 'POST', f'{self.api}/auth/login',
+                                  json={'email': email, 'password': PASSWORD})
+        if body is None:
+            return None
+        session.headers['Authorization'] = f"Bearer {body['token']}"
+        return phone
+
+    def passenger(self, index):
+        session = requests.Session()
+        phone = self.sign_up(session, 'passenger', index)
+        if phone is None:
+            return
+        rec = self.recorder
+        for ride in range(self.rides):
+            trip = rec.call('create_trip', session, 'POST', f'{self.api}/trips', json={
+                'pickup': {'lat': -1.2921 + random.uniform(-0.05, 0.05), 'lng': 36.8219, 'address': f'Pickup {index}.{ride}'},
+                'dropoff': {'lat': -1.2632, 'lng': 36.8036 + random.uniform(-0.05, 0.05), 'address': f'Dropoff {index}.{ride}'}
+            })
+            if trip is None:
+                continue
+            trip = trip['data']
+            handoff = {'trip_id': trip['id'], 'done': threading.Event(), 'completed': False}
+            self.trips.put(handoff)
+            if not handoff['done'].wait(120) or not handoff['completed']:
+                continue
+
+            payment = rec.call('pay', session, 'POST', f'{self.api}/payments/mpesa/stk-push', json={
+                'tripId': trip['id'], 'phoneNumber': phone, 'amount': trip['fare']
+            })
+            if payment is None:
+                continue
+            if not self.wait_until_paid(session, trip['id']):
+                continue
+
+            if rec.call('rate', session, 'POST', f"{self.api}/trips/{trip['id']}/rate",
+                        json={'rating': random.randint(3, 5), 'feedback': 'Load test ride'}) is not None:
+                with self._lock:
+                    self.completed_rides += 1
+
+    def wait_until_paid(self, session, trip_id, timeout=60):
+        # The callback marks the trip paid; a cancelled push (non-zero
+        # --result-code) only fails the payment, so it ends in a timeout
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            try:
+                response = session.get(f'{self.api}/trips/{trip_id}', timeout=30)
+            except requests.RequestException as e:
+                self.recorder.error('payment_confirmed', type(e).__name__)
+                return False
+            if not response.ok:
+                self.recorder.error('payment_confirmed', f'status {response.status_code}')
+                return False
+            if response.json().get('data', {}).get('paymentStatus') == 'paid':
+                self.recorder.record('payment_confirmed', time.perf_counter() - start)
+                return True
+            time.sleep(0.1)
+        self.recorder.error('payment_confirmed', 'timeout')
+        return False
+
+    def driver(self, index):
+        session = requests.Session()
+        if self.sign_up(session, 'driver', index) is None:
+            return
+        rec = self.recorder
+        while not self.stop.is_set():
+            try:
+                handoff = self.trips.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            trip_url = f"{self.api}/trips/{handoff['trip_id']}"
+            handoff['completed'] = (
+                rec.call('accept', session, 'PUT', f'{trip_url}/accept') is not None
+                and rec.call('drive', session, 'PUT', trip_url, json={'status': 'driving'}) is not None
+                and rec.call('complete', session, 'PUT', f'{trip_url}/complete') is not None
+            )
+            handoff['done'].set()
+
+    def run(self, passengers, drivers):
+        start = time.perf_counter()
+        driver_threads = [threading.Thread(target=self.driver, args=(i,)) for i in range(drivers)]
+        passenger_threads = [threading.Thread(target=self.passenger, args=(i,)) for i in range(passengers)]
+        for thread in driver_threads + passenger_threads:
+            thread.start()
+        for thread in passenger_threads:
+            thread.join()
+        self.stop.set()
+        for thread in driver_threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        rec = self.recorder
+        print(f"\n{'step':<18} {'ok':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors")
+        results = {}
+        for step in STEPS:
+            values = sorted(rec.samples.get(step, []))
+            errors = rec.errors.get(step, Counter())
+            row = {
+                'ok': len(values),
+                'errors': dict(errors),
+                'throughput': round(len(values) / elapsed, 2),
+                'p50Ms': round(percentile(values, 0.50) * 1000, 1) if values else None,
+                'p95Ms': round(percentile(values, 0.95) * 1000, 1) if values else None,
+                'p99Ms': round(percentile(values, 0.99) * 1000, 1) if values else None
+            }
+            results[step] = row
+            fmt = lambda v: f'{v:9.1f}' if v is not None else f"{'-':>9}"
+            print(f"{step:<18} {row['ok']:>6} {sum(errors.values()):>5} {row['throughput']:>8.2f} "
+                  f"{fmt(row['p50Ms'])} {fmt(row['p95Ms'])} {fmt(row['p99Ms'])}  "
+                  f"{', '.join(f'{k}x{v}' for k, v in errors.items())}")
+        print(f"\nCompleted rides: {self.completed_rides} in {elapsed:.1f}s "
+              f"({self.completed_rides / elapsed:.2f} rides/s)")
+        return {'elapsedSeconds': round(elapsed, 2), 'completedRides': self.completed_rides, 'steps': results}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(args, stub_url):
+    """Throwaway gunicorn on a fresh SQLite database, wired to the stub"""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f'sqlite:///{os.path.join(tempfile.mkdtemp(), "load_ride.db")}',
+        'FAST_BOOT': 'true',
+        # Every simulated user logs in from 127.0.0.1
+        'LOGIN_IP_ATTEMPTS': '1000000',
+        'METRICS_DIR': tempfile.mkdtemp(),
+    })
+    env['GUNICORN_WORKER_CLASS'] = args.worker_class
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+
+    # Create the schema and point M-Pesa at the stub before gunicorn boots
+    os.environ.update(env)
+    from app import create_app
+    from models import Config
+    with create_app().app_context():
+        Config.set_value('MPESA_BASE_URL', stub_url)
+        Config.set_value('MPESA_CALLBACK_URL', f'{base_url}/api/v1/payments/callback')
+        Config.set_value('AUTO_COMPLETE_PAYMENT', 'false')
+
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/v1/health', timeout=1).ok:
+                return proc, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+def main():
+    parser = argparse.ArgumentParser(description='Ride lifecycle load test')
+    parser.add_argument('--passengers', type=int, default=20)
+    parser.add_argument('--drivers', type=int, default=5)
+    parser.add_argument('--rides', type=int, default=3, help='Rides per passenger')
+    parser.add_argument('--base-url', help='Use a running server instead of starting one')
+    parser.add_argument('--worker-class', default='gthread', help='GUNICORN_WORKER_CLASS for the started server')
+    parser.add_argument('--workers', type=int, help='WEB_CONCURRENCY for the started server')
+    parser.add_argument('--stub-port', type=int, default=0, help='M-Pesa stub port (0 = any free port)')
+    parser.add_argument('--mpesa-delay-ms', type=float, default=100)
+    parser.add_argument('--callback-delay-ms', type=float, default=1000,
+                        help='Stub callback delay; real callbacks wait for the customer PIN')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    stub = start_stub(port=args.stub_port, delay=args.mpesa_delay_ms / 1000,
+                      callback_delay=args.callback_delay_ms / 1000)
+    print(f"M-Pesa stub: {stub.url}")
+
+    proc = None
+    if args.base_url:
+        base_url = args.base_url.rstrip('/')
+    else:
+        proc, base_url = start_server(args, stub.url)
+    print(f"Server: {base_url}")
+    print(f"{args.passengers} passengers x {args.rides} rides, {args.drivers} drivers")
+
+    try:
+        test = LoadTest(base_url, random.randint(10, 99), args.rides)
+        elapsed = test.run(args.passengers, args.drivers)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    results = test.report(elapsed)
+    results['config'] = vars(args)
+    results['stub'] = {'callbacksSent': stub.callbacks_sent, 'callbackErrors': stub.callback_errors}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
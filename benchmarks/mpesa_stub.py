@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Local M-Pesa (Daraja) stub
+
+Implements the Daraja endpoints MpesaService calls:
+
+    GET  /oauth/v1/generate               access token
+    POST /mpesa/stkpush/v1/processrequest accepts the STK push, then POSTs
+                                          the result to the payload's
+                                          CallBackURL after --callback-delay-ms
+    POST /mpesa/stkpushquery/v1/query     result of a previous push
+    POST /mpesa/b2c/v3/paymentrequest     accepts a B2C payout, then POSTs
+                                          the result to the payload's
+                                          ResultURL after --callback-delay-ms;
+                                          a repeated OriginatorConversationID
+                                          is acknowledged but not paid again
+
+Each request takes --delay-ms to answer, standing in for Safaricom's
+latency, and --b2c-error-rate of B2C requests get a 503. Point the app at
+it with the MPESA_BASE_URL config value (and MPESA_CALLBACK_URL /
+MPESA_RESULT_URL at the app's /api/v1/payments/callback and /result).
+
+Usage:
+    python benchmarks/mpesa_stub.py [--port 18090] [--delay-ms 100] [--callback-delay-ms 500]
+        [--result-code 0] [--b2c-error-rate 0]
+"""
+
+import argparse
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+
+class MpesaStubHandler(http.server.BaseHTTPRequestHandler):
+    """Request handler; settings live on the server instance"""
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        if self.path.startswith('/oauth/v1/generate'):
+            self.reply(200, {'access_token': uuid.uuid4().hex, 'expires_in': '3599'})
+        else:
+            self.reply(404, {'errorMessage': 'Not found'})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.server.delay)
+        if self.path == '/mpesa/stkpush/v1/processrequest':
+            self.reply(200, self.server.stk_push(body))
+        elif self.path == '/mpesa/stkpushquery/v1/query':
+            self.reply(200, self.server.stk_query(body.get('CheckoutRequestID')))
+        elif self.path == '/mpesa/b2c/v3/paymentrequest':
+            self.reply(*self.server.b2c_payment(body))
+        else:
+            self.reply(404, {'errorMessage': 'Not found'})
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class MpesaStub(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.1, callback_delay=0.5, result_code=0, b2c_error_rate=0.0):
+        super().__init__(address, MpesaStubHandler)
+        self.delay = delay
+        self.callback_delay = callback_delay
+        self.result_code = result_code
+        self.b2c_error_rate = b2c_error_rate
+        self.results = {}
+        self.b2c_conversations = {}
+        self.b2c_duplicates = 0
+        self.b2c_errors = 0
+        self.callbacks_sent = 0
+        self.callback_errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def stk_push(self, payload):
+        checkout_request_id = f'ws_CO_{uuid.uuid4().hex[:20]}'
+        merchant_request_id = f'{uuid.uuid4().int % 10**5}-{uuid.uuid4().int % 10**8}-1'
+        timer = threading.Timer(self.callback_delay, self.send_callback,
+                                args=(payload, checkout_request_id, merchant_request_id))
+        timer.daemon = True
+        timer.start()
+        return {
+            'MerchantRequestID': merchant_request_id,
+            'CheckoutRequestID': checkout_request_id,
+            'ResponseCode': '0',
+            'ResponseDescription': 'Success. Request accepted for processing',
+            'CustomerMessage': 'Success. Request accepted for processing'
+        }
+
+    def stk_query(self, checkout_request_id):
+        result = self.results.get(checkout_request_id)
+        if result is None:
+            return {'ResultCode': '4999', 'ResultDesc': 'The transaction is still under processing'}
+        return {
+            'CheckoutRequestID': checkout_request_id,
+            'ResultCode': str(result['code']),
+            'ResultDesc': result['desc'],
+            'MpesaReceiptNumber': result['receipt']
+        }
+
+    def b2c_payment(self, payload):
+        """(status, body) for a B2C request; schedules the result callback once per originator id"""
+        if random.random() < self.b2c_error_rate:
+            with self._lock:
+                self.b2c_errors += 1
+            return 503, {'errorCode': '503.001.01', 'errorMessage': 'Service temporarily unavailable'}
+
+        originator_id = payload.get('OriginatorConversationID') or uuid.uuid4().hex
+        with self._lock:
+            conversation_id = self.b2c_conversations.get(originator_id)
+            duplicate = conversation_id is not None
+            if duplicate:
+                self.b2c_duplicates += 1
+            else:
+                conversation_id = f'AG_{time.strftime("%Y%m%d")}_{uuid.uuid4().hex[:20]}'
+                self.b2c_conversations[originator_id] = conversation_id
+        if not duplicate:
+            timer = threading.Timer(self.callback_delay, self.send_b2c_result,
+                                    args=(payload, originator_id, conversation_id))
+            timer.daemon = True
+            timer.start()
+        return 200, {
+            'ConversationID': conversation_id,
+            'OriginatorConversationID': originator_id,
+            'ResponseCode': '0',
+            'ResponseDescription': 'Accept the service request successfully.'
+        }
+
+    def send_b2c_result(self, payload, originator_id, conversation_id):
+        success = self.result_code == 0
+        result = {
+            'ResultType': 0,
+            'ResultCode': self.result_code,
+            'ResultDesc': 'The service request is processed successfully.' if success
+                          else 'The initiator information is invalid.',
+            'OriginatorConversationID': originator_id,
+            'ConversationID': conversation_id,
+            'TransactionID': f'S{uuid.uuid4().hex[:9].upper()}'
+        }
+        if success:
+            result['ResultParameters'] = {'ResultParameter': [
+                {'Key': 'TransactionAmount', 'Value': payload.get('Amount')},
+                {'Key': 'ReceiverPartyPublicName', 'Value': f"{payload.get('PartyB')} - Stub Driver"}
+            ]}
+        self.post(payload.get('ResultURL', ''), {'Result': result})
+
+    def post(self, url, body, attempts=3):
+        """POST a callback, retrying connection errors (an overloaded local server resets some)"""
+        request = urllib.request.Request(
+            url, data=json.dumps(body).encode(),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        for attempt in range(attempts):
+            try:
+                urllib.request.urlopen(request, timeout=30).read()
+                with self._lock:
+                    self.callbacks_sent += 1
+                return
+            except Exception as e:
+                error = e
+                time.sleep(0.5 * (attempt + 1))
+        with self._lock:
+            self.callback_errors += 1
+        print(f"M-Pesa stub callback error: {error}")
+
+    def send_callback(self, payload, checkout_request_id, merchant_request_id):
+        receipt = f'S{uuid.uuid4().hex[:9].upper()}'
+        desc = 'The service request is processed successfully.' if self.result_code == 0 else 'Request cancelled by user'
+        callback = {'Body': {'stkCallback': {
+            'MerchantRequestID': merchant_request_id,
+            'CheckoutRequestID': checkout_request_id,
+            'ResultCode': self.result_code,
+            'ResultDesc': desc
+        }}}
+        if self.result_code == 0:
+            callback['Body']['stkCallback']['CallbackMetadata'] = {'Item': [
+                {'Name': 'Amount', 'Value': payload.get('Amount')},
+                {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+                {'Name': 'TransactionDate', 'Value': int(time.strftime('%Y%m%d%H%M%S'))},
+                {'Name': 'PhoneNumber', 'Value': int(payload.get('PhoneNumber') or 0)}
+            ]}
+        self.results[checkout_request_id] = {'code': self.result_code, 'desc': desc, 'receipt': receipt}
+        self.post(payload.get('CallBackURL', ''), callback)
+
+def start_stub(host='127.0.0.1', port=0, delay=0.1, callback_delay=0.5, result_code=0, b2c_error_rate=0.0):
+    """Serve the stub from a background thread; returns the server (see .url)"""
+    server = MpesaStub((host, port), delay, callback_delay, result_code, b2c_error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local M-Pesa Daraja stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18090)
+    parser.add_argument('--delay-ms', type=float, default=100, help='Latency added to every response')
+    parser.add_argument('--callback-delay-ms', type=float, default=500, help='Delay before STK and B2C result callbacks')
+    parser.add_argument('--result-code', type=int, default=0, help='0 = paid, 1032 = cancelled by user')
+    parser.add_argument('--b2c-error-rate', type=float, default=0.0, help='Fraction of B2C requests answered 503')
+    args = parser.parse_args()
+
+    server = MpesaStub((args.host, args.port), args.delay_ms / 1000, args.callback_delay_ms / 1000,
+                       args.result_code, args.b2c_error_rate)
+    print(f"M-Pesa stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Build the static OpenAPI spec
+
+Parses the flasgger YAML in every route docstring once and writes the
+result to static/apispec.json, which production workers serve at
+/apispec.json without importing flasgger. Run at deploy time (see
+render.yaml) and after changing route docstrings.
+"""
+
+import json
+import os
+import sys
+
+def main():
+    from app import create_app
+    from swagger_docs import build_spec
+    from utils.openapi import SPEC_PATH
+
+    output = sys.argv[1] if len(sys.argv) > 1 else SPEC_PATH
+    spec = build_spec(create_app())
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(spec, f, separators=(',', ':'), sort_keys=True)
+
+    print(f"✅ Wrote {len(spec.get('paths', {}))} paths to {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Driver ledger compaction
+
+Folds each driver's ledger entries since their last balance snapshot into
+a new snapshot (services/ledger.py), keeping balance reads to one snapshot
+plus a short tail. Entries are never modified or deleted. Run it from
+cron / a Render cron job, or keep it running with --loop.
+
+--backfill first posts entries for history recorded before the ledger
+existed (paid trips, payouts and failed payouts); entries already posted
+are skipped, so it is safe to repeat. Run it once after deploying.
+
+Usage:
+    python compact_ledger.py [--backfill] [--settle-seconds 60] [--loop] [--interval 3600]
+"""
+
+import argparse
+import os
+import time
+
+from app import create_app
+from models import db
+from services.ledger import compact, post_payout_reversals, post_payouts, post_trip_fares
+
+def backfill():
+    """Post every ledger entry that is missing; returns counts by type"""
+    counts = {
+        'fares': post_trip_fares(),
+        'payouts': post_payouts(),
+        'reversals': post_payout_reversals()
+    }
+    db.session.commit()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact driver ledger entries into balance snapshots')
+    parser.add_argument('--backfill', action='store_true',
+                        help='Post entries for trips and payouts that predate the ledger first')
+    parser.add_argument('--settle-seconds', type=int,
+                        default=int(os.environ.get('LEDGER_SETTLE_SECONDS', 60)),
+                        help='Only fold entries at least this old')
+    parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds')
+    parser.add_argument('--interval', type=float, default=3600)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.backfill:
+            counts = backfill()
+            print(f"📒 Backfilled {counts['fares']} fares, {counts['payouts']} payouts, "
+                  f"{counts['reversals']} payout reversals")
+
+    while True:
+        start = time.perf_counter()
+        with app.app_context():
+            stats = compact(args.settle_seconds)
+        print(f"🧮 Snapshotted {stats['drivers']} drivers, folding {stats['entries']} entries "
+              f"({time.perf_counter() - start:.1f}s)")
+        if not args.loop:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
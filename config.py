@@ -36,7 +36,6 @@ class Config:
     MPESA_TIMEOUT_URL = os.getenv('MPESA_TIMEOUT_URL', 'http://localhost:5000/api/v1/payments/timeout')
     
     # File Upload
-    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
 
@@ -109,6 +109,8 @@ def init_db():
             FOREIGN KEY (trip_id) REFERENCES trips (id)
         )
     ''')
+    db.execute('CREATE INDEX IF NOT EXISTS ix_trips_created_at ON trips (created_at)')
+    db.execute('CREATE INDEX IF NOT EXISTS ix_payments_created_at ON payments (created_at)')
     
     # Create payouts table
     db.execute('''
@@ -120,13 +122,46 @@ def init_db():
             conversation_id TEXT,
             originator_conversation_id TEXT,
             transaction_id TEXT,
-            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'paid', 'failed')),
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'submitting', 'processing', 'paid', 'failed')),
+            batch_id TEXT,
+            attempts INTEGER DEFAULT 0,
+            result_code TEXT,
+            last_error TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (driver_id) REFERENCES users (id)
         )
     ''')
-    
+
+    # Create ledger tables (append-only entries plus compacted balances)
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id TEXT NOT NULL,
+            entry_type TEXT NOT NULL CHECK (entry_type IN ('fare', 'commission', 'payout', 'payout_reversal', 'refund')),
+            amount REAL NOT NULL,
+            reference_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (entry_type, reference_id),
+            FOREIGN KEY (driver_id) REFERENCES users (id)
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS ix_ledger_entries_driver_id ON ledger_entries (driver_id, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS ix_ledger_entries_driver_created ON ledger_entries (driver_id, created_at)')
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS balance_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id TEXT NOT NULL,
+            balance REAL NOT NULL,
+            last_entry_id INTEGER NOT NULL,
+            entry_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (driver_id) REFERENCES users (id)
+        )
+    ''')
+    db.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_balance_snapshots_driver_entry ON balance_snapshots (driver_id, last_entry_id)')
+
     # Create notifications table
     db.execute('''
         CREATE TABLE IF NOT EXISTS notifications (
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Trip / payment export for analytics
+
+Streams every trip or payment created in [start, end) to CSV or Parquet
+(services/exports.py): rows are read through a server-side cursor and
+written a batch at a time, so memory stays flat for any range. Unlike
+GET /api/v1/admin/exports/<kind>, there is no limit on the range.
+
+Usage:
+    python export_data.py trips --start 2024-05-01 --end 2024-06-01 [--format csv|parquet] [-o trips.csv]
+    python export_data.py payments --start 2024-05-01 -o - | gzip > payments.csv.gz
+"""
+
+import argparse
+import sys
+import time
+
+from app import create_app
+from services import exports
+
+def main():
+    parser = argparse.ArgumentParser(description='Export trips or payments for a date range')
+    parser.add_argument('kind', choices=sorted(exports.TABLES))
+    parser.add_argument('--start', required=True, help='ISO date or datetime, inclusive')
+    parser.add_argument('--end', help='ISO date or datetime, exclusive (default start + 1 day)')
+    parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+    parser.add_argument('-o', '--output', help='Output file, "-" for stdout (default <kind>_<start>_<end>.<format>)')
+    parser.add_argument('--batch-size', type=int, default=exports.BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        exports.check_format(args.format)
+        start, end = exports.parse_range(args.start, args.end, max_days=None)
+    except exports.ExportError as e:
+        parser.error(str(e))
+
+    output = args.output or exports.filename(args.kind, start, end, args.format)
+    app = create_app()
+    began = time.perf_counter()
+    written = 0
+    with app.app_context():
+        if output == '-':
+            stream = sys.stdout.buffer
+        else:
+            stream = open(output, 'wb')
+        try:
+            for chunk in exports.iter_export(args.kind, args.format, start, end, args.batch_size):
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+            else:
+                stream.flush()
+
+    print(f"📦 Exported {args.kind} {start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M} to {output} "
+          f"({written / 1024 / 1024:.1f} MB, {time.perf_counter() - began:.1f}s)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
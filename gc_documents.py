@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Document store garbage collection
+
+Deletes blobs that no driver document references any more, stored files
+with no DocumentBlob row, and abandoned upload temp files; see
+services/storage.py. Only things unchanged for the grace period are
+touched, so it is safe to run while the API is serving uploads.
+
+--import-legacy first moves documents saved before the content-addressed
+store (Driver.document_* holding a file path) into the store.
+
+Usage:
+    python gc_documents.py [--dry-run] [--grace-seconds 3600] [--import-legacy]
+"""
+
+import argparse
+import os
+
+from app import create_app
+from models import db, Driver
+from services.storage import collect_garbage, import_file, is_blob_ref
+from routes.drivers import DOCUMENT_COLUMNS
+
+def import_legacy_documents(dry_run=False):
+    """Replace path-valued document columns with blob hashes"""
+    imported = missing = 0
+    for driver in Driver.query.all():
+        for column in DOCUMENT_COLUMNS.values():
+            path = getattr(driver, column)
+            if not path or is_blob_ref(path):
+                continue
+            if not os.path.exists(path):
+                print(f"⚠️  {driver.id} {column}: {path} not found")
+                missing += 1
+                continue
+            if not dry_run:
+                setattr(driver, column, import_file(path))
+                db.session.commit()
+                os.remove(path)
+            imported += 1
+    return imported, missing
+
+def main():
+    parser = argparse.ArgumentParser(description='Garbage-collect the document store')
+    parser.add_argument('--dry-run', action='store_true', help='Report without deleting anything')
+    parser.add_argument('--grace-seconds', type=int,
+                        default=int(os.environ.get('DOCUMENT_GC_GRACE_SECONDS', 3600)),
+                        help='Only remove blobs and files unchanged for this long')
+    parser.add_argument('--import-legacy', action='store_true',
+                        help='Move path-based driver documents into the store first')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.import_legacy:
+            imported, missing = import_legacy_documents(args.dry_run)
+            print(f"📥 Legacy documents imported: {imported} (missing files: {missing})")
+
+        stats = collect_garbage(args.grace_seconds, dry_run=args.dry_run)
+        prefix = 'Would remove' if args.dry_run else 'Removed'
+        print(f"🗑️  {prefix} {stats['blobsDeleted']} unreferenced blobs "
+              f"({stats['bytesFreed'] / 1024 / 1024:.1f} MB), "
+              f"{stats['orphanFiles']} orphan files, {stats['staleUploads']} stale uploads")
+
+if __name__ == '__main__':
+    main()
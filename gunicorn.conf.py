@@ -1,14 +1,73 @@
+import multiprocessing
 import os
 
+# Worker model. gthread (default) keeps a slow M-Pesa call or password hash
+# from blocking other requests in the same worker; gevent suits mostly
+# I/O-bound traffic with many idle connections.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# CPUs this process may run on, capped so a large host doesn't fork more
+# workers than the instance's memory allows (WEB_CONCURRENCY overrides)
+try:
+    cpu_count = len(os.sched_getaffinity(0))
+except AttributeError:
+    cpu_count = multiprocessing.cpu_count()
+max_workers = int(os.environ.get('GUNICORN_MAX_WORKERS', 8))
+
+if worker_class == 'gevent':
+    # Patch before preload_app imports the app so sockets, locks and
+    # psycopg2 (via psycogreen, if installed) yield to other greenlets
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+    workers = int(os.environ.get('WEB_CONCURRENCY', min(cpu_count + 1, max_workers)))
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+elif worker_class == 'gthread':
+    workers = int(os.environ.get('WEB_CONCURRENCY', min(cpu_count * 2 + 1, max_workers)))
+    # Keep threads at or below SQLAlchemy pool_size + max_overflow (15)
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+else:
+    workers = int(os.environ.get('WEB_CONCURRENCY', min(cpu_count * 2 + 1, max_workers)))
+
 bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
-workers = 1
-worker_class = "sync"
 timeout = 120
 keepalive = 5
 preload_app = True
 max_requests = 500
 max_requests_jitter = 25
 worker_tmp_dir = "/dev/shm"
-worker_connections = 1000
 graceful_timeout = 30
-max_worker_memory = 200
\ No newline at end of file
+
+# Per-worker /metrics snapshots, summed at scrape time (see utils/metrics.py).
+# Set here so the preloaded app sees it.
+metrics_dir = os.environ.setdefault('METRICS_DIR', os.path.join(worker_tmp_dir, 'safedrive-metrics'))
+
+def on_starting(server):
+    from utils.metrics import reset_directory
+    reset_directory(metrics_dir)
+
+def post_fork(server, worker):
+    """
+    Drop pooled connections inherited from the master
+
+    With preload_app, create_app() opens database connections in the master
+    before forking; sharing those sockets between workers corrupts the
+    protocol stream. close=False leaves them for the master to close.
+    """
+    from app import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    """Write the exiting worker's last metrics before the master archives them"""
+    from utils.metrics import request_metrics
+    request_metrics.flush()
+
+def child_exit(server, worker):
+    from utils.metrics import mark_process_dead
+    mark_process_dead(metrics_dir, worker.pid)
@@ -45,6 +45,16 @@ def migrate_database():
                 'table': 'users', 
                 'column': 'last_seen',
                 'sql': 'ALTER TABLE users ADD COLUMN last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP;'
+            },
+            {
+                'table': 'users',
+                'column': 'updated_at',
+                'sql': 'ALTER TABLE users ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;'
+            },
+            {
+                'table': 'trips',
+                'column': 'updated_at',
+                'sql': 'ALTER TABLE trips ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;'
             }
         ]
         
@@ -9,5 +9,8 @@ from .payment import Payment
 from .config import Config
 from .notification import Notification
 from .rating import Rating
+from .document_blob import DocumentBlob
+from .payout import Payout
+from .ledger import LedgerEntry, BalanceSnapshot
 
-__all__ = ['db', 'User', 'Driver', 'Trip', 'Payment', 'Config', 'Notification', 'Rating']
\ No newline at end of file
+__all__ = ['db', 'User', 'Driver', 'Trip', 'Payment', 'Config', 'Notification', 'Rating', 'DocumentBlob', 'Payout', 'LedgerEntry', 'BalanceSnapshot']
\ No newline at end of file
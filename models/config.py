@@ -1,7 +1,12 @@
 from . import db
 from datetime import datetime
+from utils.cache import TTLCache
 import uuid
 
+# Per-worker cache of config values; entries are tuples so that missing
+# keys are cached too
+_value_cache = TTLCache(maxsize=256, ttl=300)
+
 class Config(db.Model):
     __tablename__ = 'config'
     
@@ -26,6 +31,19 @@ class Config(db.Model):
         except:
             return default
     
+    @staticmethod
+    def get_cached_value(key, default=None):
+        """Get config value through the per-worker cache"""
+        entry = _value_cache.get(key)
+        if entry is None:
+            try:
+                config = Config.query.filter_by(key=key).first()
+            except:
+                return default
+            entry = (config.value if config else None,)
+            _value_cache.set(key, entry)
+        return entry[0] if entry[0] is not None else default
+    
     @staticmethod
     def set_value(key, value, description=None):
         config = Config.query.filter_by(key=key).first()
@@ -36,4 +54,5 @@ class Config(db.Model):
             config = Config(key=key, value=value, description=description)
             db.session.add(config)
         db.session.commit()
+        _value_cache.invalidate(key)
         return config
\ No newline at end of file
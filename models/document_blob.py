@@ -0,0 +1,28 @@
+from . import db
+from datetime import datetime
+
+class DocumentBlob(db.Model):
+    """One stored file per distinct content hash; see services/storage.py"""
+    __tablename__ = 'document_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100))
+
+    # Number of Driver.document_* columns pointing at this blob; blobs at
+    # zero are deleted by gc_documents.py after a grace period
+    ref_count = db.Column(db.Integer, default=0, nullable=False, index=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'contentType': self.content_type,
+            'refCount': self.ref_count,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at
+        }
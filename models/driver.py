@@ -1,5 +1,7 @@
 from . import db
 from datetime import datetime
+from sqlalchemy import func, update
+from utils.cache import get_cached_user
 import uuid
 
 class Driver(db.Model):
@@ -36,14 +38,38 @@ class Driver(db.Model):
     # Relationship
     user = db.relationship('User', backref='driver_profile')
     
+    @staticmethod
+    def record_completed_trip(user_id, fare):
+        """
+        Add a completed trip to a driver's stats with a single UPDATE
+        
+        The increments are evaluated by the database, so concurrent
+        completions for one driver neither lose updates nor hold the row
+        locked across a read. Runs in the caller's transaction.
+        
+        Returns:
+            int: number of driver rows updated (0 if no profile)
+        """
+        return db.session.execute(
+            update(Driver)
+            .where(Driver.user_id == user_id)
+            .values(total_trips=func.coalesce(Driver.total_trips, 0) + 1,
+                    total_earnings=func.coalesce(Driver.total_earnings, 0) + fare,
+                    updated_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+    
     def to_dict(self):
         """Convert to dictionary"""
+        # User fields come from the per-worker user cache; the relationship
+        # is only loaded on a cache miss
+        user = get_cached_user(self.user_id, load=lambda: self.user)
         return {
             'id': self.id,
             'userId': self.user_id,
-            'name': self.user.name if self.user else None,
-            'email': self.user.email if self.user else None,
-            'phone': self.user.phone if self.user else None,
+            'name': user['name'] if user else None,
+            'email': user['email'] if user else None,
+            'phone': user['phone'] if user else None,
             'vehicle': {
                 'make': self.vehicle_make,
                 'model': self.vehicle_model,
@@ -57,10 +83,10 @@ class Driver(db.Model):
                 'insurance': bool(self.document_insurance),
                 'logbook': bool(self.document_logbook)
             },
-            'rating': float(self.rating) if self.rating else 0,
+            'rating': self.rating or 0,
             'totalTrips': self.total_trips,
-            'totalEarnings': float(self.total_earnings) if self.total_earnings else 0,
+            'totalEarnings': self.total_earnings or 0,
             'status': self.status,
             'isOnline': self.is_online,
-            'createdAt': self.created_at.isoformat()
+            'createdAt': self.created_at
         }
\ No newline at end of file
@@ -0,0 +1,66 @@
+from . import db
+from datetime import datetime
+
+# Integer rowid on SQLite (BIGINT is not an alias for it there)
+LedgerId = db.BigInteger().with_variant(db.Integer, 'sqlite')
+
+class LedgerEntry(db.Model):
+    """
+    One immutable movement of driver money; see services/ledger.py
+
+    Rows are only ever inserted. Credits are positive (fare, payout
+    reversal), debits negative (commission, payout, refund). The id
+    increases with every entry, so a balance is the latest snapshot plus
+    the entries after its last_entry_id.
+    """
+    __tablename__ = 'ledger_entries'
+    __table_args__ = (
+        # A fare, payout, ... is posted at most once
+        db.UniqueConstraint('entry_type', 'reference_id', name='uq_ledger_entries_reference'),
+        db.Index('ix_ledger_entries_driver_id', 'driver_id', 'id'),
+        db.Index('ix_ledger_entries_driver_created', 'driver_id', 'created_at'),
+        # Never reuse the id of a deleted last row
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(LedgerId, primary_key=True, autoincrement=True)
+    driver_id = db.Column(db.String(50), db.ForeignKey('users.id'), nullable=False)
+    entry_type = db.Column(db.String(20), nullable=False)  # fare, commission, payout, payout_reversal, refund
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    reference_id = db.Column(db.String(50), nullable=False)  # trip, payout or payment id
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'driverId': self.driver_id,
+            'type': self.entry_type,
+            'amount': self.amount,
+            'referenceId': self.reference_id,
+            'createdAt': self.created_at
+        }
+
+class BalanceSnapshot(db.Model):
+    """A driver's balance after every entry up to last_entry_id (compact_ledger.py)"""
+    __tablename__ = 'balance_snapshots'
+    __table_args__ = (
+        db.Index('ix_balance_snapshots_driver_entry', 'driver_id', 'last_entry_id', unique=True),
+    )
+
+    id = db.Column(LedgerId, primary_key=True, autoincrement=True)
+    driver_id = db.Column(db.String(50), db.ForeignKey('users.id'), nullable=False)
+    balance = db.Column(db.Numeric(14, 2), nullable=False)
+    last_entry_id = db.Column(db.BigInteger, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False)  # entries folded in since the previous snapshot
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'driverId': self.driver_id,
+            'balance': self.balance,
+            'lastEntryId': self.last_entry_id,
+            'entryCount': self.entry_count,
+            'createdAt': self.created_at
+        }
@@ -36,6 +36,6 @@ class Notification(db.Model):
             'paymentId': self.payment_id,
             'isRead': self.is_read,
             'isSent': self.is_sent,
-            'createdAt': self.created_at.isoformat(),
-            'readAt': self.read_at.isoformat() if self.read_at else None
+            'createdAt': self.created_at,
+            'readAt': self.read_at
         }
\ No newline at end of file
@@ -17,17 +17,17 @@ class Payment(db.Model):
     # Status
     status = db.Column(db.String(20), default='pending', nullable=False)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Date-range exports
     
     def to_dict(self):
         """Convert to dictionary"""
         return {
             'id': self.id,
             'tripId': self.trip_id,
-            'amount': float(self.amount),
+            'amount': self.amount,
             'phone': self.phone,
             'checkoutRequestId': self.checkout_request_id,
             'mpesaReceiptNumber': self.mpesa_receipt_number,
             'status': self.status,
-            'createdAt': self.created_at.isoformat()
+            'createdAt': self.created_at
         }
\ No newline at end of file
@@ -0,0 +1,45 @@
+from . import db
+from datetime import datetime
+import uuid
+
+class Payout(db.Model):
+    __tablename__ = 'payouts'
+
+    id = db.Column(db.String(50), primary_key=True, default=lambda: f'po_{uuid.uuid4().hex[:12]}')
+    driver_id = db.Column(db.String(50), db.ForeignKey('users.id'), nullable=False, index=True)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+
+    # M-Pesa B2C details. OriginatorConversationID is the payout id, so a
+    # resubmitted payout is recognised as a duplicate by Daraja
+    conversation_id = db.Column(db.String(100), index=True)
+    originator_conversation_id = db.Column(db.String(100))
+    transaction_id = db.Column(db.String(100))
+
+    # Status: pending (queued) -> submitting (claimed by a batch) ->
+    # processing (accepted by M-Pesa) -> paid / failed
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    batch_id = db.Column(db.String(50), index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    result_code = db.Column(db.String(20))
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'driverId': self.driver_id,
+            'amount': self.amount,
+            'phone': self.phone,
+            'conversationId': self.conversation_id,
+            'transactionId': self.transaction_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'resultCode': self.result_code,
+            'error': self.last_error,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at
+        }
@@ -36,5 +36,5 @@ class Rating(db.Model):
             'punctualityRating': self.punctuality_rating,
             'communicationRating': self.communication_rating,
             'safetyRating': self.safety_rating,
-            'createdAt': self.created_at.isoformat()
+            'createdAt': self.created_at
         }
\ No newline at end of file
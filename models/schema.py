@@ -0,0 +1,90 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from . import db
+
+# Bump whenever models add tables, indexes or columns so that FAST_BOOT
+# workers run create_all(), ensure_columns() and ensure_indexes() once
+# against existing databases. New columns on existing tables are added
+# automatically if nullable; NOT NULL columns and type changes still need
+# migrate_database.py.
+SCHEMA_VERSION = '9'
+
+def ensure_columns():
+    """
+    ALTER TABLE ... ADD COLUMN for nullable model columns missing from existing tables
+
+    create_all() skips tables that exist, so a column added to a model
+    (e.g. users.updated_at) would otherwise make every SELECT of it fail.
+    Python-side defaults don't apply to existing rows, which read as NULL.
+
+    Returns:
+        list: "table.column" names added
+    """
+    bind = db.session.get_bind()
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                print(f"Schema: {table.name}.{column.name} is NOT NULL without a server default; "
+                      f"add it with migrate_database.py")
+                continue
+            definition = CreateColumn(column).compile(dialect=bind.dialect)
+            db.session.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}'))
+            added.append(f'{table.name}.{column.name}')
+    db.session.commit()
+    return added
+
+def ensure_indexes():
+    """
+    CREATE INDEX IF NOT EXISTS for every model index
+
+    create_all() only creates indexes together with a new table, so an
+    index added to an existing model would otherwise never be built.
+    Indexes limited to a dialect with .ddl_if() are skipped elsewhere, as
+    create_all() does.
+    """
+    connection = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            statement = CreateIndex(index, if_not_exists=True)
+            if index._ddl_if is None or index._ddl_if._should_execute(statement, index, connection):
+                connection.execute(statement)
+    db.session.commit()
+
+def ensure_schema():
+    """
+    Cheap boot-time schema check
+
+    Reads the stored schema version with a single SELECT and only runs
+    db.create_all() and the column / index checks (catalog queries per
+    table) when it is missing or differs from SCHEMA_VERSION.
+
+    Returns:
+        bool: True if create_all() ran
+    """
+    try:
+        row = db.session.execute(
+            text("SELECT value FROM config WHERE key = 'SCHEMA_VERSION'")
+        ).first()
+    except Exception:
+        db.session.rollback()
+        row = None
+
+    if row and row[0] == SCHEMA_VERSION:
+        return False
+
+    db.create_all()
+    ensure_columns()
+    ensure_indexes()
+    from services.trip_search import ensure_trip_search
+    ensure_trip_search()
+    from .config import Config
+    Config.set_value('SCHEMA_VERSION', SCHEMA_VERSION, 'Schema version applied by create_all')
+    return True
@@ -33,10 +33,11 @@ class Trip(db.Model):
     feedback = db.Column(db.Text)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Date-range exports
     accepted_at = db.Column(db.DateTime)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ETag version
     
     # Relationships
     passenger = db.relationship('User', foreign_keys=[passenger_id])
@@ -49,24 +50,25 @@ class Trip(db.Model):
             'passengerId': self.passenger_id,
             'driverId': self.driver_id,
             'pickup': {
-                'lat': float(self.pickup_lat),
-                'lng': float(self.pickup_lng),
+                'lat': self.pickup_lat,
+                'lng': self.pickup_lng,
                 'address': self.pickup_address
             },
             'dropoff': {
-                'lat': float(self.dropoff_lat),
-                'lng': float(self.dropoff_lng),
+                'lat': self.dropoff_lat,
+                'lng': self.dropoff_lng,
                 'address': self.dropoff_address
             },
             'status': self.status,
-            'fare': float(self.fare),
-            'distance': float(self.distance),
+            'fare': self.fare,
+            'distance': self.distance,
             'duration': self.duration,
             'paymentStatus': self.payment_status,
             'rating': self.rating,
             'feedback': self.feedback,
-            'createdAt': self.created_at.isoformat(),
-            'acceptedAt': self.accepted_at.isoformat() if self.accepted_at else None,
-            'startedAt': self.started_at.isoformat() if self.started_at else None,
-            'completedAt': self.completed_at.isoformat() if self.completed_at else None
+            'createdAt': self.created_at,
+            'acceptedAt': self.accepted_at,
+            'startedAt': self.started_at,
+            'completedAt': self.completed_at,
+            'updatedAt': self.updated_at
         }
\ No newline at end of file
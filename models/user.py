@@ -13,6 +13,18 @@ class User(db.Model):
     phone = db.Column(db.String(20), unique=True, nullable=True, index=True)
     role = db.Column(db.String(20), nullable=False, index=True)  # passenger, driver, admin
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ETag version
+
+    # Prefix search (services/user_search.py) ranges over lower(name) and
+    # lower(email), and on PostgreSQL compares bytewise (COLLATE "C") as
+    # SQLite does; SQLite's phone ranges use ix_users_phone
+    __table_args__ = (
+        db.Index('ix_users_name_lower', db.func.lower(name)).ddl_if(dialect='sqlite'),
+        db.Index('ix_users_email_lower', db.func.lower(email)).ddl_if(dialect='sqlite'),
+        db.Index('ix_users_name_lower_c', db.func.lower(name).collate('C')).ddl_if(dialect='postgresql'),
+        db.Index('ix_users_email_lower_c', db.func.lower(email).collate('C')).ddl_if(dialect='postgresql'),
+        db.Index('ix_users_phone_c', phone.collate('C')).ddl_if(dialect='postgresql'),
+    )
     
     def set_password(self, password):
         """Hash and set password"""
@@ -30,5 +42,6 @@ class User(db.Model):
             'name': self.name,
             'phone': self.phone,
             'role': self.role,
-            'createdAt': self.created_at.isoformat()
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at
         }
\ No newline at end of file
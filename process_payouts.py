@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Driver payout runner
+
+Submits queued driver payouts (POST /api/v1/drivers/payout) to M-Pesa B2C
+in batches with bounded concurrency; see services/payouts.py. Results
+arrive asynchronously at /api/v1/payments/result. Run it from cron / a
+Render cron job, or keep it running with --loop.
+
+Usage:
+    python process_payouts.py [--batch-size 200] [--workers 16] [--retries 3]
+        [--max-attempts 5] [--loop] [--interval 60]
+"""
+
+import argparse
+import os
+import time
+
+from app import create_app
+from services.payouts import process_pending
+
+def main():
+    parser = argparse.ArgumentParser(description='Submit pending driver payouts to M-Pesa B2C')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('PAYOUT_BATCH_SIZE', 200)),
+                        help='Payouts claimed per batch')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('PAYOUT_WORKERS', 16)),
+                        help='Concurrent B2C requests')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Immediate retries of a network error, 429 or 5xx')
+    parser.add_argument('--max-attempts', type=int, default=5,
+                        help='Batches that may try a payout before it is marked failed')
+    parser.add_argument('--stale-seconds', type=int, default=600,
+                        help='Requeue payouts stuck in submitting for this long')
+    parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds')
+    parser.add_argument('--interval', type=float, default=60)
+    args = parser.parse_args()
+
+    app = create_app()
+    while True:
+        start = time.perf_counter()
+        with app.app_context():
+            totals = process_pending(args.batch_size, args.workers, args.retries,
+                                     args.max_attempts, args.stale_seconds)
+        elapsed = time.perf_counter() - start
+        if totals['submitted'] or totals['recovered'] or not args.loop:
+            print(f"💸 Submitted {totals['submitted']} payouts in {totals['batches']} batches "
+                  f"({elapsed:.1f}s): {totals['accepted']} accepted, {totals['failed']} failed, "
+                  f"{totals['requeued']} requeued, {totals['recovered']} recovered")
+        if not args.loop:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
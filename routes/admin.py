@@ -1,9 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import User, Driver, Trip, Payment
+from models import User, Driver, Trip, Payment, DocumentBlob
 from models import db
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from routes.drivers import DOCUMENT_COLUMNS
+from services import exports
+from services.storage import get_backend, is_blob_ref
+from services.trip_search import search_trips
+from utils.etag import not_modified
+from utils.cache import user_cache
+from utils.compression import compression_stats
+from utils.db_stats import db_stats, pool_state
+from utils.profiling import list_profiles, load_profile, pstats_path
+from utils.serializers import serialize_trips, serialize_payments
+from utils.query_budget import budget_violations, query_budget
+import mimetypes
+import os
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -15,6 +29,7 @@ def admin_required():
 
 @admin_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@query_budget(15)
 def get_dashboard_stats():
     """
     Get admin dashboard statistics
@@ -110,6 +125,7 @@ def get_dashboard_stats():
 
 @admin_bp.route('/drivers', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_all_drivers():
     """
     Get all drivers
@@ -134,7 +150,9 @@ def get_all_drivers():
                 }
             }), 403
         
-        drivers = Driver.query.order_by(Driver.created_at.desc()).all()
+        # Load each driver's user in the same query; to_dict() reads it on
+        # user cache misses, which was one SELECT per driver
+        drivers = Driver.query.options(db.joinedload(Driver.user)).order_by(Driver.created_at.desc()).all()
         
         return jsonify({
             'success': True,
@@ -216,8 +234,153 @@ def approve_driver(driver_id):
             }
         }), 500
 
+def _private_no_cache(response):
+    # Documents are personal data: browsers revalidate, shared caches never store
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@admin_bp.route('/drivers/<driver_id>/documents/<document_type>', methods=['GET'])
+@jwt_required()
+@query_budget(3)
+def get_driver_document(driver_id, document_type):
+    """
+    Download a driver's uploaded document for review
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: driver_id
+        in: path
+        type: string
+        required: true
+        description: Driver ID
+      - name: document_type
+        in: path
+        type: string
+        required: true
+        enum: ["idCard", "license", "insurance", "logbook"]
+      - name: Range
+        in: header
+        type: string
+        required: false
+        description: Byte range, e.g. bytes=0-1048575
+    produces:
+      - application/pdf
+      - image/png
+      - image/jpeg
+    responses:
+      200:
+        description: Document contents
+      206:
+        description: Requested byte range
+      304:
+        description: Not modified (If-None-Match matches the content hash)
+      403:
+        description: Admin access required
+      404:
+        description: Driver or document not found
+      416:
+        description: Range not satisfiable
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        if document_type not in DOCUMENT_COLUMNS:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_TYPE',
+                    'message': 'Invalid document type'
+                }
+            }), 400
+        
+        driver = Driver.query.get(driver_id)
+        if not driver:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'DRIVER_NOT_FOUND',
+                    'message': 'Driver not found'
+                }
+            }), 404
+        
+        reference = getattr(driver, DOCUMENT_COLUMNS[document_type])
+        path = etag = mimetype = None
+        if is_blob_ref(reference):
+            # The content hash is a strong ETag that never needs recomputing
+            etag = reference
+            cached = not_modified(etag)
+            if cached:
+                return _private_no_cache(cached)
+            blob = db.session.get(DocumentBlob, reference)
+            mimetype = blob.content_type if blob else None
+            path = get_backend().local_path(reference)
+        elif reference:
+            # Saved before the content-addressed store (gc_documents.py --import-legacy)
+            path = reference
+        
+        if not path or not os.path.isfile(path):
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'DOCUMENT_NOT_FOUND',
+                    'message': 'Document not found'
+                }
+            }), 404
+        
+        mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        extension = mimetypes.guess_extension(mimetype) or ''
+        download_name = f'{driver_id}_{document_type}{extension}'
+        
+        accel_prefix = os.environ.get('DOCUMENT_ACCEL_REDIRECT_PREFIX')
+        if accel_prefix and etag:
+            # nginx serves the file itself (sendfile, Range) from an internal
+            # location aliased to DOCUMENT_STORE_ROOT
+            response = current_app.response_class(mimetype=mimetype)
+            relative = os.path.relpath(path, get_backend().root).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative
+            response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+        else:
+            # Opened file goes to the server's wsgi.file_wrapper, so gunicorn
+            # sends full responses with sendfile(); Range/If-None-Match are
+            # answered by make_conditional()
+            response = send_file(os.path.abspath(path), mimetype=mimetype, download_name=download_name,
+                                 conditional=True, etag=etag or True)
+        if etag:
+            response.set_etag(etag)
+        return _private_no_cache(response)
+        
+    except RequestedRangeNotSatisfiable as e:
+        length = e.length if e.length is not None else os.path.getsize(path)
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'RANGE_NOT_SATISFIABLE',
+                'message': f'Requested range is outside the document ({length} bytes)'
+            }
+        }), 416, {'Content-Range': f'bytes */{length}'}
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
 @admin_bp.route('/trips', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_all_trips():
     """
     Get all trips
@@ -242,12 +405,12 @@ def get_all_trips():
                 }
             }), 403
         
-        trips = Trip.query.order_by(Trip.created_at.desc()).limit(50).all()
+        trips = serialize_trips(Trip.query.order_by(Trip.created_at.desc()).limit(50))
         
         return jsonify({
             'success': True,
             'data': {
-                'trips': [trip.to_dict() for trip in trips]
+                'trips': trips
             }
         }), 200
         
@@ -260,8 +423,95 @@ def get_all_trips():
             }
         }), 500
 
+@admin_bp.route('/trips/search', methods=['GET'])
+@jwt_required()
+@query_budget(4)
+def search_all_trips():
+    """
+    Search trips by pickup / dropoff address
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Address words, matched as prefixes (e.g. "westl jkia")
+      - name: status
+        in: query
+        type: string
+        description: Filter by trip status
+      - name: page
+        in: query
+        type: integer
+        default: 1
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+        description: Items per page (max 100)
+    responses:
+      200:
+        description: Matching trips, by relevance (narrow searches) or newest first (order)
+      400:
+        description: Missing search query
+      403:
+        description: Admin access required
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+        query, order = search_trips(request.args.get('q'), request.args.get('status'))
+        if query is None:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'MISSING_QUERY',
+                    'message': 'Search query (q) is required'
+                }
+            }), 400
+
+        # One row past the page instead of a COUNT over every match
+        trips = serialize_trips(query.limit(limit + 1).offset((page - 1) * limit))
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'trips': trips[:limit],
+                'order': order,
+                'pagination': {
+                    'page': page,
+                    'limit': limit,
+                    'hasMore': len(trips) > limit
+                }
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'SEARCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
 @admin_bp.route('/payments', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_all_payments():
     """
     Get all payments
@@ -286,12 +536,12 @@ def get_all_payments():
                 }
             }), 403
         
-        payments = Payment.query.order_by(Payment.created_at.desc()).limit(50).all()
+        payments = serialize_payments(Payment.query.order_by(Payment.created_at.desc()).limit(50))
         
         return jsonify({
             'success': True,
             'data': {
-                'payments': [payment.to_dict() for payment in payments]
+                'payments': payments
             }
         }), 200
         
@@ -304,8 +554,121 @@ def get_all_payments():
             }
         }), 500
 
+@admin_bp.route('/exports/<kind>', methods=['GET'])
+@jwt_required()
+@query_budget(1)
+def export_records(kind):
+    """
+    Stream trips or payments created in a date range as CSV or Parquet
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: kind
+        in: path
+        type: string
+        enum: ["trips", "payments"]
+        required: true
+      - name: start
+        in: query
+        type: string
+        required: true
+        description: ISO date or datetime, inclusive (e.g. 2024-05-01)
+      - name: end
+        in: query
+        type: string
+        description: ISO date or datetime, exclusive (default start + 1 day; at most EXPORT_MAX_DAYS later)
+      - name: format
+        in: query
+        type: string
+        enum: ["csv", "parquet"]
+        default: csv
+        description: parquet needs pyarrow installed
+    responses:
+      200:
+        description: Rows oldest first, streamed as an attachment
+      400:
+        description: Invalid range or format
+      403:
+        description: Admin access required
+      404:
+        description: Unknown export
+      429:
+        description: Too many exports running on this worker
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+
+        if kind not in exports.TABLES:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'NOT_FOUND',
+                    'message': f'Unknown export: {kind}'
+                }
+            }), 404
+
+        fmt = request.args.get('format', 'csv')
+        try:
+            exports.check_format(fmt)
+            start, end = exports.parse_range(request.args.get('start'), request.args.get('end'))
+        except exports.ExportError as e:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': e.code,
+                    'message': str(e)
+                }
+            }), 400
+
+        if not exports.export_slots.acquire(blocking=False):
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'EXPORT_BUSY',
+                    'message': 'Another export is running, try again shortly'
+                }
+            }), 429
+
+        try:
+            # Release the request's pooled connection; the export reads on its own
+            db.session.remove()
+            response = Response(
+                stream_with_context(exports.iter_export(kind, fmt, start, end)),
+                mimetype=exports.FORMATS[fmt],
+                headers={
+                    'Content-Disposition': f'attachment; filename="{exports.filename(kind, start, end, fmt)}"',
+                    'Cache-Control': 'no-store'
+                }
+            )
+        except Exception:
+            exports.export_slots.release()
+            raise
+        # Runs when the stream finishes or the client goes away
+        response.call_on_close(exports.export_slots.release)
+        return response
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'EXPORT_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
 @admin_bp.route('/users/online', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_online_users():
     """
     Get all online users (drivers and passengers)
@@ -360,4 +723,295 @@ def get_online_users():
                 'code': 'ONLINE_USERS_FAILED',
                 'message': str(e)
             }
-        }), 500
\ No newline at end of file
+        }), 500
+
+@admin_bp.route('/cache', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """
+    Get per-worker cache statistics
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Cache hit/miss counters for the serving worker
+      403:
+        description: Admin access required
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'users': user_cache.stats()
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
+@admin_bp.route('/compression', methods=['GET'])
+@jwt_required()
+def get_compression_stats():
+    """
+    Get response compression statistics
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Bytes saved and CPU spent per encoding for the serving worker
+      403:
+        description: Admin access required
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        return jsonify({
+            'success': True,
+            'data': compression_stats.snapshot()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+@admin_bp.route('/diagnostics/db', methods=['GET'])
+@jwt_required()
+def get_db_diagnostics():
+    """
+    Get connection pool and query timing diagnostics
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: reset
+        in: query
+        type: boolean
+        description: Clear the counters after reading them
+    responses:
+      200:
+        description: Pool occupancy, checkout wait, statement timings, recent slow queries and query budget violations for the serving worker
+      403:
+        description: Admin access required
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        data = db_stats.snapshot()
+        data['pool']['current'] = pool_state(db.engine)
+        data['queryBudgetViolations'] = budget_violations.snapshot()
+        if request.args.get('reset', 'false').lower() == 'true':
+            db_stats.reset()
+            budget_violations.reset()
+        
+        return jsonify({
+            'success': True,
+            'data': data
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+@admin_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+def get_profiles():
+    """
+    List stored request profiles
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Profiles captured with X-Profile or ?__profile, newest first
+      403:
+        description: Admin access required
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'profiles': list_profiles()
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+def get_profile(profile_id):
+    """
+    Get a request profile's SQL statements and top functions
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: profile_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Profile metadata, captured SQL and cumulative-time function listing
+      403:
+        description: Admin access required
+      404:
+        description: Profile not found
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        profile = load_profile(profile_id)
+        if not profile:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'PROFILE_NOT_FOUND',
+                    'message': 'Profile not found'
+                }
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': profile
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+@admin_bp.route('/profiles/<profile_id>/pstats', methods=['GET'])
+@jwt_required()
+def download_profile(profile_id):
+    """
+    Download a request profile as a pstats file
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: profile_id
+        in: path
+        type: string
+        required: true
+    produces:
+      - application/octet-stream
+    responses:
+      200:
+        description: cProfile stats, readable with python -m pstats or snakeviz
+      403:
+        description: Admin access required
+      404:
+        description: Profile not found
+    """
+    try:
+        if not admin_required():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+        
+        path = pstats_path(profile_id)
+        if not path:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'PROFILE_NOT_FOUND',
+                    'message': 'Profile not found'
+                }
+            }), 404
+        
+        return send_file(path, mimetype='application/octet-stream',
+                         as_attachment=True, download_name=f'{profile_id}.pstats')
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
@@ -1,10 +1,41 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from models import User, Driver, db
+from models import User, Driver, Config, db
+from sqlalchemy.exc import IntegrityError
+from utils.cache import get_cached_user, invalidate_user
+from utils.etag import make_etag, not_modified, with_etag
+from utils.rate_limit import RateLimiter, create_store
+from utils.query_budget import query_budget
+import os
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+# Login throttling, checked before any password hashing
+_login_store = create_store()
+login_ip_limiter = RateLimiter(
+    'login-ip',
+    attempts=int(os.environ.get('LOGIN_IP_ATTEMPTS', 20)),
+    window=int(os.environ.get('LOGIN_WINDOW_SECONDS', 60)),
+    store=_login_store
+)
+login_email_limiter = RateLimiter(
+    'login-email',
+    attempts=int(os.environ.get('LOGIN_EMAIL_ATTEMPTS', 5)),
+    window=int(os.environ.get('LOGIN_WINDOW_SECONDS', 60)),
+    store=_login_store
+)
+
+def too_many_attempts(retry_after):
+    """429 response for throttled login attempts"""
+    return jsonify({
+        'success': False,
+        'error': {
+            'code': 'TOO_MANY_ATTEMPTS',
+            'message': f'Too many login attempts. Try again in {retry_after} seconds'
+        }
+    }), 429, {'Retry-After': str(retry_after)}
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -15,6 +46,16 @@ def validate_phone(phone):
     pattern = r'^(\+254|254|0)?[17]\d{8}$'
     return re.match(pattern, phone) is not None
 
+def unique_violation_field(error):
+    """Return the users column ('email' or 'phone') behind a unique-constraint error"""
+    message = str(getattr(error, 'orig', error)).lower()
+    # SQLite: "UNIQUE constraint failed: users.email"
+    # PostgreSQL: 'violates unique constraint "ix_users_email" ... Key (email)=(...)'
+    for field in ('email', 'phone'):
+        if f'users.{field}' in message or f'users_{field}' in message or f'({field})' in message:
+            return field
+    return None
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """
@@ -111,11 +152,7 @@ def register():
             }), 400
         
         # Validate password strength
-        try:
-            from models import Config
-            min_password_length = int(Config.get_value('MIN_PASSWORD_LENGTH', '8'))
-        except:
-            min_password_length = 8
+        min_password_length = int(Config.get_cached_value('MIN_PASSWORD_LENGTH', '8'))
             
         if len(password) < min_password_length:
             return jsonify({
@@ -126,27 +163,9 @@ def register():
                 }
             }), 400
         
-        # Check if user exists
-        if User.query.filter_by(email=email).first():
-            return jsonify({
-                'success': False,
-                'error': {
-                    'code': 'EMAIL_EXISTS',
-                    'message': 'Email already registered'
-                }
-            }), 409
-        
-        # Only check phone uniqueness for non-admin users
-        if role != 'admin' and User.query.filter_by(phone=phone).first():
-            return jsonify({
-                'success': False,
-                'error': {
-                    'code': 'PHONE_EXISTS',
-                    'message': 'Phone number already registered'
-                }
-            }), 409
-        
-        # Create user (admin gets null phone)
+        # Create user (admin gets null phone) and, for drivers, the driver
+        # profile in a single transaction. Email/phone uniqueness is enforced
+        # by the unique constraints rather than existence SELECTs.
         user = User(
             email=email,
             name=name,
@@ -154,23 +173,47 @@ def register():
             role=role
         )
         user.set_password(password)
-        
         db.session.add(user)
-        db.session.commit()
         
-        # If driver, create driver profile
         if role == 'driver':
-            driver = Driver(user_id=user.id)
-            db.session.add(driver)
-            db.session.commit()
+            db.session.add(Driver(user=user))
+        
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            field = unique_violation_field(e)
+            if field == 'email':
+                return jsonify({
+                    'success': False,
+                    'error': {
+                        'code': 'EMAIL_EXISTS',
+                        'message': 'Email already registered'
+                    }
+                }), 409
+            if field == 'phone':
+                return jsonify({
+                    'success': False,
+                    'error': {
+                        'code': 'PHONE_EXISTS',
+                        'message': 'Phone number already registered'
+                    }
+                }), 409
+            raise
+        
+        # Serialize before commit so the response doesn't reload the
+        # expired instance
+        user_data = user.to_dict()
+        db.session.commit()
+        invalidate_user(user_data['id'])
         
         # Generate JWT token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user_data['id'])
         
         return jsonify({
             'success': True,
             'message': 'User registered successfully',
-            'user': user.to_dict(),
+            'user': user_data,
             'token': access_token
         }), 201
         
@@ -183,11 +226,6 @@ def register():
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -217,8 +255,14 @@ def login():
         description: Login successful
       401:
         description: Invalid credentials
+      429:
+        description: Too many login attempts
     """
     try:
+        retry_after = login_ip_limiter.hit(request.remote_addr)
+        if retry_after:
+            return too_many_attempts(retry_after)
+        
         data = request.json
         
         email = data.get('email', '').lower()
@@ -233,6 +277,10 @@ def login():
                 }
             }), 400
         
+        retry_after = login_email_limiter.hit(email)
+        if retry_after:
+            return too_many_attempts(retry_after)
+        
         # Find user
         user = User.query.filter_by(email=email).first()
         
@@ -245,6 +293,8 @@ def login():
                 }
             }), 401
         
+        login_email_limiter.reset(email)
+        
         # Generate JWT token
         access_token = create_access_token(identity=user.id)
         
@@ -262,14 +312,10 @@ def login():
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_current_user():
     """
     Get current user profile
@@ -281,6 +327,8 @@ def get_current_user():
     responses:
       200:
         description: User profile retrieved
+      304:
+        description: Not modified (If-None-Match matched the ETag)
       401:
         description: Unauthorized
       404:
@@ -288,7 +336,7 @@ def get_current_user():
     """
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_cached_user(user_id)
         
         if not user:
             return jsonify({
@@ -299,12 +347,15 @@ def get_current_user():
                 }
             }), 404
         
-        # User profile retrieved successfully
+        etag = make_etag(user['id'], user['updatedAt'] or user['createdAt'])
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
-            'data': user.to_dict()
-        }), 200
+            'data': user
+        }), etag), 200
         
     except Exception as e:
         return jsonify({
@@ -314,8 +365,3 @@ def get_current_user():
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
\ No newline at end of file
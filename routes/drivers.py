@@ -1,22 +1,43 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Driver, User, Trip
+from models import Driver, User, Trip, Payout
 from models import db
+from utils.cache import get_cached_user
+from utils.etag import make_etag, not_modified, with_etag
+from utils.query_budget import query_budget
+from utils.uploads import upload_limit
+from services.ledger import post_payouts
+from services.payouts import available_balance
+from services.storage import get_backend, release, store_upload
+from utils.helpers import format_mpesa_phone
 from datetime import datetime, timedelta
-import os
-from werkzeug.utils import secure_filename
-import uuid
+from decimal import Decimal, InvalidOperation
+import mimetypes
+from werkzeug.exceptions import RequestEntityTooLarge
 
 drivers_bp = Blueprint('drivers', __name__)
 
-UPLOAD_FOLDER = 'uploads/documents'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+MAX_DOCUMENT_SIZE = 5 * 1024 * 1024  # 5MB
+DOCUMENT_COLUMNS = {
+    'idCard': 'document_id_card',
+    'license': 'document_license',
+    'insurance': 'document_insurance',
+    'logbook': 'document_logbook'
+}
+MIN_PAYOUT = 10  # KES, M-Pesa B2C minimum
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def release_documents(driver):
+    """Drop the driver's document blob references; call before deleting the driver"""
+    for column in DOCUMENT_COLUMNS.values():
+        release(getattr(driver, column))
+
 @drivers_bp.route('/available-trips', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_available_trips():
     """
     Get available trips for driver
@@ -150,6 +171,7 @@ def update_driver_status():
 
 @drivers_bp.route('/profile', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_driver_profile():
     """
     Get driver profile
@@ -161,14 +183,16 @@ def get_driver_profile():
     responses:
       200:
         description: Driver profile retrieved successfully
+      304:
+        description: Not modified (If-None-Match matched the ETag)
       403:
         description: Unauthorized - Only drivers can access this endpoint
     """
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_cached_user(user_id)
         
-        if user.role != 'driver':
+        if not user or user['role'] != 'driver':
             return jsonify({
                 'success': False,
                 'error': {
@@ -185,10 +209,16 @@ def get_driver_profile():
             db.session.add(driver)
             db.session.commit()
         
-        return jsonify({
+        # Profile body also embeds user fields, so both versions feed the ETag
+        etag = make_etag(driver.id, driver.updated_at, user['updatedAt'])
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        return with_etag(jsonify({
             'success': True,
             'data': driver.to_dict()
-        }), 200
+        }), etag), 200
         
     except Exception as e:
         return jsonify({
@@ -297,6 +327,7 @@ def update_driver_profile():
 
 @drivers_bp.route('/upload-document', methods=['POST'])
 @jwt_required()
+@upload_limit(MAX_DOCUMENT_SIZE)
 def upload_document():
     """
     Upload driver document
@@ -326,6 +357,8 @@ def upload_document():
         description: Invalid file or missing parameters
       403:
         description: Unauthorized - Only drivers can upload documents
+      413:
+        description: File larger than 5MB (PAYLOAD_TOO_LARGE)
     """
     try:
         user_id = get_jwt_identity()
@@ -340,7 +373,24 @@ def upload_document():
                 }
             }), 403
         
-        if 'file' not in request.files:
+        # Bodies over the @upload_limit were already refused with 413 from
+        # Content-Length. File parts stream into the document store's staging
+        # directory in chunks, hashed and size checked as they arrive, which
+        # catches a file just over the limit that fits in the multipart
+        # allowance; it gets the same 413 as the early check
+        request.stream_files_to(get_backend().staging_dir, max_bytes=MAX_DOCUMENT_SIZE)
+        try:
+            files = request.files
+        except RequestEntityTooLarge:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'PAYLOAD_TOO_LARGE',
+                    'message': 'File size must be less than 5MB'
+                }
+            }), 413
+        
+        if 'file' not in files:
             return jsonify({
                 'success': False,
                 'error': {
@@ -349,10 +399,10 @@ def upload_document():
                 }
             }), 400
         
-        file = request.files['file']
+        file = files['file']
         document_type = request.form.get('type')  # idCard, license, insurance, logbook
         
-        if not document_type or document_type not in ['idCard', 'license', 'insurance', 'logbook']:
+        if not document_type or document_type not in DOCUMENT_COLUMNS:
             return jsonify({
                 'success': False,
                 'error': {
@@ -371,55 +421,18 @@ def upload_document():
             }), 400
         
         if file and allowed_file(file.filename):
+            driver = Driver.query.filter_by(user_id=user_id).first()
+            if not driver:
+                driver = Driver(user_id=user_id)
+                db.session.add(driver)
+            
             try:
-                # Create upload directory if it doesn't exist
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                
-                # Validate file size (max 5MB)
-                file.seek(0, os.SEEK_END)
-                file_size = file.tell()
-                file.seek(0)
-                
-                if file_size > 5 * 1024 * 1024:  # 5MB limit
-                    return jsonify({
-                        'success': False,
-                        'error': {
-                            'code': 'FILE_TOO_LARGE',
-                            'message': 'File size must be less than 5MB'
-                        }
-                    }), 400
-                
-                # Generate secure unique filename
-                ext = file.filename.rsplit('.', 1)[1].lower()
-                filename = f"{user_id}_{document_type}_{uuid.uuid4().hex[:8]}.{ext}"
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                
-                # Validate file path is within upload directory
-                abs_upload_path = os.path.abspath(UPLOAD_FOLDER)
-                abs_file_path = os.path.abspath(filepath)
-                if not abs_file_path.startswith(abs_upload_path):
-                    return jsonify({
-                        'success': False,
-                        'error': {
-                            'code': 'INVALID_PATH',
-                            'message': 'Invalid file path'
-                        }
-                    }), 400
-                
-                # Save file
-                file.save(filepath)
-                
-                # Verify file was saved successfully
-                if not os.path.exists(filepath):
-                    return jsonify({
-                        'success': False,
-                        'error': {
-                            'code': 'SAVE_FAILED',
-                            'message': 'Failed to save file'
-                        }
-                    }), 500
-                    
+                # Content-addressed: identical bytes are stored once, and
+                # the column holds the SHA-256 instead of a file path
+                content_type = mimetypes.guess_type(file.filename)[0]
+                sha256, stored = store_upload(file.stream, content_type)
             except Exception as save_error:
+                db.session.rollback()
                 return jsonify({
                     'success': False,
                     'error': {
@@ -428,20 +441,10 @@ def upload_document():
                     }
                 }), 500
             
-            # Update driver profile
-            driver = Driver.query.filter_by(user_id=user_id).first()
-            if not driver:
-                driver = Driver(user_id=user_id)
-                db.session.add(driver)
-            
-            if document_type == 'idCard':
-                driver.document_id_card = filepath
-            elif document_type == 'license':
-                driver.document_license = filepath
-            elif document_type == 'insurance':
-                driver.document_insurance = filepath
-            elif document_type == 'logbook':
-                driver.document_logbook = filepath
+            # Update driver profile, dropping the reference to the replaced document
+            column = DOCUMENT_COLUMNS[document_type]
+            release(getattr(driver, column))
+            setattr(driver, column, sha256)
             
             # Check if all required documents are uploaded
             if (driver.document_id_card and driver.document_license and 
@@ -455,7 +458,10 @@ def upload_document():
                 'message': 'Document uploaded successfully',
                 'data': {
                     'type': document_type,
-                    'uploaded': True
+                    'uploaded': True,
+                    'size': file.stream.size,
+                    'sha256': sha256,
+                    'deduplicated': not stored
                 }
             }), 200
         
@@ -478,6 +484,7 @@ def upload_document():
 
 @drivers_bp.route('/earnings', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_driver_earnings():
     """
     Get driver earnings summary
@@ -581,9 +588,9 @@ def request_payout():
               example: "+254712345678"
     responses:
       200:
-        description: Payout request submitted successfully
+        description: Payout queued; sent to M-Pesa by the next process_payouts.py batch
       400:
-        description: Missing required fields
+        description: Missing fields, invalid amount or phone, or insufficient balance
       403:
         description: Unauthorized - Only drivers can request payouts
     """
@@ -613,21 +620,73 @@ def request_payout():
                 }
             }), 400
         
-        # Mock payout processing
-        payout_id = f'po_{uuid.uuid4().hex[:12]}'
+        # B2C pays whole shillings
+        try:
+            amount = Decimal(str(amount))
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite() or amount < MIN_PAYOUT or amount != amount.to_integral_value():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_AMOUNT',
+                    'message': f'Amount must be a whole number of at least {MIN_PAYOUT}'
+                }
+            }), 400
+        
+        formatted_phone = format_mpesa_phone(phone)
+        if not formatted_phone:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_PHONE',
+                    'message': 'Invalid phone number format'
+                }
+            }), 400
+        
+        # Lock the driver row so concurrent requests can't both spend the
+        # same balance
+        driver = Driver.query.filter_by(user_id=user_id).with_for_update().first()
+        if not driver:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'DRIVER_NOT_FOUND',
+                    'message': 'Driver profile not found'
+                }
+            }), 404
+        
+        balance = available_balance(user_id)
+        if amount > balance:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INSUFFICIENT_BALANCE',
+                    'message': f'Available balance is {balance}'
+                }
+            }), 400
+        
+        payout = Payout(driver_id=user_id, amount=amount, phone=formatted_phone)
+        db.session.add(payout)
+        db.session.flush()
+        post_payouts(Payout.id == payout.id)
+        db.session.commit()
         
         return jsonify({
             'success': True,
             'message': 'Payout request submitted successfully',
             'data': {
-                'payoutId': payout_id,
-                'amount': amount,
-                'phone': phone,
-                'status': 'processing'
+                'payoutId': payout.id,
+                'amount': payout.amount,
+                'phone': payout.phone,
+                'status': payout.status,
+                'availableBalance': balance - amount
             }
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'error': {
@@ -636,8 +695,58 @@ def request_payout():
             }
         }), 500
 
+@drivers_bp.route('/payouts', methods=['GET'])
+@jwt_required()
+@query_budget(3)
+def get_payouts():
+    """
+    Get the current driver's payouts and available balance
+    ---
+    tags:
+      - Drivers
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Payouts retrieved successfully
+      403:
+        description: Unauthorized - Only drivers can view payouts
+    """
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        
+        if user.role != 'driver':
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'UNAUTHORIZED',
+                    'message': 'Only drivers can view payouts'
+                }
+            }), 403
+        
+        payouts = Payout.query.filter_by(driver_id=user_id).order_by(Payout.created_at.desc()).limit(50).all()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'payouts': [payout.to_dict() for payout in payouts],
+                'availableBalance': available_balance(user_id)
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'FETCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
 @drivers_bp.route('/<driver_id>', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_driver(driver_id):
     """
     Get specific driver (admin only)
@@ -744,6 +853,7 @@ def delete_driver(driver_id):
                 }
             }), 404
         
+        release_documents(driver)
         db.session.delete(driver)
         db.session.commit()
         
@@ -764,6 +874,7 @@ def delete_driver(driver_id):
 
 @drivers_bp.route('/<driver_id>/stats', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_driver_stats(driver_id):
     """
     Get driver statistics
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Notification, db
+from utils.serializers import serialize_notifications
+from utils.query_budget import query_budget
 from datetime import datetime
 
 notifications_bp = Blueprint('notifications', __name__)
@@ -82,6 +84,7 @@ def create_notification():
 
 @notifications_bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_notifications():
     """
     Get user notifications
@@ -108,11 +111,11 @@ def get_notifications():
         if unread_only:
             query = query.filter_by(is_read=False)
         
-        notifications = query.order_by(Notification.created_at.desc()).all()
+        notifications = serialize_notifications(query.order_by(Notification.created_at.desc()))
         
         return jsonify({
             'success': True,
-            'data': [notification.to_dict() for notification in notifications]
+            'data': notifications
         }), 200
         
     except Exception as e:
@@ -7,6 +7,10 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.mpesa import MpesaService
+from services.ledger import post_trip_fares
+from services.payouts import handle_result, handle_timeout
+from utils.helpers import format_mpesa_phone
+from utils.query_budget import query_budget
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -53,6 +57,8 @@ def mpesa_callback():
                         trip = Trip.query.get(payment.trip_id)
                         if trip and trip.payment_status != 'paid':
                             trip.payment_status = 'paid'
+                            db.session.flush()
+                            post_trip_fares(Trip.id == trip.id)
                 else:
                     # Safety: Only mark as failed if currently pending
                     if payment.status == 'pending':
@@ -65,6 +71,57 @@ def mpesa_callback():
     except Exception:
         return jsonify({'ResultCode': 1, 'ResultDesc': 'Failed'}), 500
 
+@payments_bp.route('/result', methods=['POST'])
+def b2c_result():
+    """
+    Handle M-Pesa B2C payout result
+    ---
+    tags:
+      - Payments
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          description: 'M-Pesa B2C result ({"Result": {...}})'
+    responses:
+      200:
+        description: Result processed (repeated results are acknowledged and ignored)
+      500:
+        description: Result processing failed
+    """
+    try:
+        result = (request.json or {}).get('Result', {})
+        handle_result(result)
+        return jsonify({'ResultCode': 0, 'ResultDesc': 'Success'}), 200
+        
+    except Exception:
+        db.session.rollback()
+        return jsonify({'ResultCode': 1, 'ResultDesc': 'Failed'}), 500
+
+@payments_bp.route('/timeout', methods=['POST'])
+def b2c_timeout():
+    """
+    Handle M-Pesa B2C queue timeout; the payout is requeued
+    ---
+    tags:
+      - Payments
+    responses:
+      200:
+        description: Timeout processed
+      500:
+        description: Timeout processing failed
+    """
+    try:
+        result = (request.json or {}).get('Result', {})
+        handle_timeout(result)
+        return jsonify({'ResultCode': 0, 'ResultDesc': 'Success'}), 200
+        
+    except Exception:
+        db.session.rollback()
+        return jsonify({'ResultCode': 1, 'ResultDesc': 'Failed'}), 500
+
 @payments_bp.route('/mpesa/stk-push', methods=['POST'])
 @jwt_required()
 def mpesa_stk_push():
@@ -142,17 +199,9 @@ def mpesa_stk_push():
                 }
             }), 400
         
-        # Format phone number
-        formatted_phone = phone.strip()
-        if formatted_phone.startswith('+254'):
-            formatted_phone = formatted_phone[1:]
-        elif formatted_phone.startswith('0'):
-            formatted_phone = '254' + formatted_phone[1:]
-        elif not formatted_phone.startswith('254'):
-            formatted_phone = '254' + formatted_phone
-        
-        # Validate phone format
-        if not formatted_phone.isdigit() or len(formatted_phone) != 12:
+        # Format and validate phone number
+        formatted_phone = format_mpesa_phone(phone)
+        if not formatted_phone:
             return jsonify({
                 'success': False,
                 'error': {
@@ -310,16 +359,8 @@ def initiate_payment():
             }), 400
         
         # Validate and format phone number
-        formatted_phone = phone.strip()
-        if formatted_phone.startswith('+254'):
-            formatted_phone = formatted_phone[1:]  # Remove +
-        elif formatted_phone.startswith('0'):
-            formatted_phone = '254' + formatted_phone[1:]  # Replace 0 with 254
-        elif not formatted_phone.startswith('254'):
-            formatted_phone = '254' + formatted_phone
-        
-        # Validate phone number format
-        if not formatted_phone.isdigit() or len(formatted_phone) != 12:
+        formatted_phone = format_mpesa_phone(phone)
+        if not formatted_phone:
             return jsonify({
                 'success': False,
                 'error': {
@@ -369,6 +410,8 @@ def initiate_payment():
             trip.payment_status = 'paid'
         
         db.session.add(payment)
+        db.session.flush()
+        post_trip_fares(Trip.id == trip_id)
         db.session.commit()
         
         return jsonify({
@@ -449,19 +492,14 @@ def check_payment_status(payment_id):
                         payment.status = 'paid'
                         payment.mpesa_receipt_number = status_data.get('MpesaReceiptNumber', f'MPE{uuid.uuid4().hex[:8].upper()}')
                         
-                        # Update trip payment status safely
+                        # Update trip payment status safely. Driver stats
+                        # were updated at completion; the fare's ledger
+                        # entry is posted once the trip is also paid
                         trip = Trip.query.get(payment.trip_id)
                         if trip and trip.payment_status != 'paid':
                             trip.payment_status = 'paid'
-                            
-                            # Safety: Update driver earnings only once
-                            if trip.driver_id and trip.status == 'completed':
-                                driver = Driver.query.filter_by(user_id=trip.driver_id).first()
-                                if driver:
-                                    # Check if earnings already added
-                                    if not hasattr(trip, '_earnings_added'):
-                                        driver.total_earnings += trip.fare
-                                        trip._earnings_added = True
+                            db.session.flush()
+                            post_trip_fares(Trip.id == trip.id)
                         
                         db.session.commit()
                 elif result_code in ['1032', '1037']:  # Cancelled or timeout
@@ -484,6 +522,7 @@ def check_payment_status(payment_id):
 
 @payments_bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_payments():
     """
     Get user payments
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Rating, Trip, User, Driver, db
+from utils.query_budget import query_budget
 
 ratings_bp = Blueprint('ratings', __name__)
 
@@ -130,6 +131,7 @@ def create_rating():
 
 @ratings_bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_ratings():
     """
     Get user's ratings
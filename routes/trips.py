@@ -29,7 +29,13 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Trip, User, Driver, db
+from services.ledger import post_trip_fares
+from utils.serializers import serialize_trips
+from utils.cache import get_cached_user
+from utils.etag import make_etag, not_modified, with_etag
+from utils.query_budget import query_budget
 from datetime import datetime
+from sqlalchemy import update
 import math
 
 # Initialize trips blueprint for modular route organization
@@ -52,7 +58,7 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     try:
         # Try to get Earth's radius from dynamic config
         from models import Config
-        R = float(Config.get_value('EARTH_RADIUS_KM', '6371'))
+        R = float(Config.get_cached_value('EARTH_RADIUS_KM', '6371'))
     except:
         # Fallback to standard Earth radius in kilometers
         R = 6371
@@ -158,16 +164,10 @@ def create_trip():
         # Calculate fare using cached config values for performance
         try:
             from models import Config
-            # Cache config values to avoid repeated database queries on each trip creation
-            if not hasattr(create_trip, '_config_cache'):
-                create_trip._config_cache = {
-                    'BASE_FARE': float(Config.get_value('TRIP_BASE_FARE', '200')),      # Base fare in KES
-                    'RATE_PER_KM': float(Config.get_value('TRIP_RATE_PER_KM', '50')),   # Rate per kilometer
-                    'AVERAGE_SPEED': float(Config.get_value('TRIP_AVERAGE_SPEED', '30')) # Average speed in km/h
-                }
-            BASE_FARE = create_trip._config_cache['BASE_FARE']
-            RATE_PER_KM = create_trip._config_cache['RATE_PER_KM']
-            AVERAGE_SPEED = create_trip._config_cache['AVERAGE_SPEED']
+            # Per-worker TTL cache shared safely across threads (see models/config.py)
+            BASE_FARE = float(Config.get_cached_value('TRIP_BASE_FARE', '200'))        # Base fare in KES
+            RATE_PER_KM = float(Config.get_cached_value('TRIP_RATE_PER_KM', '50'))     # Rate per kilometer
+            AVERAGE_SPEED = float(Config.get_cached_value('TRIP_AVERAGE_SPEED', '30')) # Average speed in km/h
         except:
             # Fallback values if config is unavailable
             BASE_FARE = 200      # KES base fare
@@ -221,14 +221,10 @@ def create_trip():
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_trips():
     """
     Get user's trips
@@ -282,12 +278,11 @@ def get_trips():
         if status:
             query = query.filter_by(status=status)
         
-        # Optimize query with eager loading to prevent N+1 queries
-        # Load passenger and driver data in single query
-        trips = query.options(
-            db.joinedload(Trip.passenger),  # Load passenger info
-            db.joinedload(Trip.driver)      # Load driver info
-        ).order_by(Trip.created_at.desc()).limit(limit).offset((page-1)*limit).all()
+        # Select only the serialized columns as tuples (no ORM hydration,
+        # no passenger/driver joins)
+        trips = serialize_trips(
+            query.order_by(Trip.created_at.desc()).limit(limit).offset((page-1)*limit)
+        )
         
         # Get total count for pagination metadata
         total = query.count()
@@ -295,7 +290,7 @@ def get_trips():
         return jsonify({
             'success': True,
             'data': {
-                'trips': [trip.to_dict() for trip in trips],
+                'trips': trips,
                 'pagination': {
                     'page': page,
                     'limit': limit,
@@ -313,11 +308,6 @@ def get_trips():
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/<trip_id>/accept', methods=['PUT'])
 @jwt_required()
@@ -404,11 +394,6 @@ def accept_trip(trip_id):
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/<trip_id>/complete', methods=['PUT'])
 @jwt_required()
@@ -429,6 +414,8 @@ def complete_trip(trip_id):
     responses:
       200:
         description: Trip completed successfully
+      400:
+        description: Trip is already completed
       403:
         description: Unauthorized
       404:
@@ -448,32 +435,40 @@ def complete_trip(trip_id):
                 }
             }), 403
         
-        # Mark trip as completed
-        trip.status = 'completed'
-        trip.completed_at = datetime.utcnow()
-        
         # Handle payment status based on system configuration
         try:
             from models import Config
             # Check if auto-payment completion is enabled
-            auto_payment = Config.get_value('AUTO_COMPLETE_PAYMENT', 'true').lower() == 'true'
-            trip.payment_status = 'paid' if auto_payment else 'pending'
+            auto_payment = Config.get_cached_value('AUTO_COMPLETE_PAYMENT', 'true').lower() == 'true'
+            payment_status = 'paid' if auto_payment else 'pending'
         except:
             # Default to paid status if config unavailable
-            trip.payment_status = 'paid'
+            payment_status = 'paid'
+        
+        # Mark trip as completed. The status condition makes completion
+        # happen once, so a retried request can't count the trip twice
+        now = datetime.utcnow()
+        completed = db.session.execute(
+            update(Trip)
+            .where(Trip.id == trip_id, Trip.driver_id == user_id, Trip.status != 'completed')
+            .values(status='completed', completed_at=now, payment_status=payment_status, updated_at=now),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if not completed:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_STATUS',
+                    'message': 'Trip is already completed'
+                }
+            }), 400
         
-        # Update driver performance statistics using relationship
-        if trip.driver and hasattr(trip.driver, 'driver_profile'):
-            driver = trip.driver.driver_profile
-            if driver:
-                driver.total_trips += 1              # Increment completed trips count
-                driver.total_earnings += trip.fare   # Add trip fare to total earnings
-        else:
-            # Fallback to query if relationship not available
-            driver = Driver.query.filter_by(user_id=user_id).first()
-            if driver:
-                driver.total_trips += 1
-                driver.total_earnings += trip.fare
+        # Update driver performance statistics in the same transaction
+        # (total_trips + 1, total_earnings + fare, computed in SQL)
+        Driver.record_completed_trip(user_id, trip.fare)
+        # Ledger fare entry, if the trip is already paid
+        post_trip_fares(Trip.id == trip_id)
         
         db.session.commit()
         
@@ -492,11 +487,6 @@ def complete_trip(trip_id):
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/<trip_id>/rate', methods=['POST'])
 @jwt_required()
@@ -604,14 +594,10 @@ def rate_trip(trip_id):
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/available', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_available_trips():
     """
     Get available trips for drivers to accept
@@ -660,14 +646,10 @@ def get_available_trips():
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/<trip_id>', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_trip(trip_id):
     """
     Get detailed information for a specific trip
@@ -682,16 +664,14 @@ def get_trip(trip_id):
     
     Returns:
         JSON: Complete trip information including passenger/driver details
+        (304 with no body when If-None-Match matches the trip's ETag)
     """
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_cached_user(user_id)
         
-        # Find the requested trip with eager loading to prevent N+1 queries
-        trip = Trip.query.options(
-            db.joinedload(Trip.passenger),
-            db.joinedload(Trip.driver)
-        ).get(trip_id)
+        # to_dict() reads no relationships, so no eager loading needed
+        trip = Trip.query.get(trip_id)
         if not trip:
             return jsonify({
                 'success': False,
@@ -705,7 +685,7 @@ def get_trip(trip_id):
         # Admin: can view any trip
         # Passenger: can only view their own trips
         # Driver: can only view trips they're assigned to
-        if user.role not in ['admin'] and trip.passenger_id != user_id and trip.driver_id != user_id:
+        if user['role'] not in ['admin'] and trip.passenger_id != user_id and trip.driver_id != user_id:
             return jsonify({
                 'success': False,
                 'error': {
@@ -714,10 +694,15 @@ def get_trip(trip_id):
                 }
             }), 403
         
-        return jsonify({
+        etag = make_etag(trip.id, trip.updated_at or trip.created_at)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        return with_etag(jsonify({
             'success': True,
             'data': trip.to_dict()
-        }), 200
+        }), etag), 200
         
     except Exception as e:
         return jsonify({
@@ -727,11 +712,6 @@ def get_trip(trip_id):
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/<trip_id>', methods=['PUT'])
 @jwt_required()
@@ -804,11 +784,6 @@ def update_trip(trip_id):
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
 
 @trips_bp.route('/<trip_id>', methods=['DELETE'])
 @jwt_required()
@@ -891,8 +866,3 @@ def delete_trip(trip_id):
                 'message': str(e)
             }
         }), 500
-    finally:
-        try:
-            db.session.close()
-        except:
-            pass
\ No newline at end of file
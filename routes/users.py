@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, db
+from routes.drivers import release_documents
+from services.user_search import MIN_LENGTH, search_user_ids
+from utils.cache import get_cached_user, invalidate_user
+from utils.serializers import serialize_users
+from utils.etag import make_etag, not_modified, with_etag
+from utils.query_budget import query_budget
 import math
 
 users_bp = Blueprint('users', __name__)
 
 @users_bp.route('/profile', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_user_profile():
     """
     Get user profile
@@ -18,12 +25,14 @@ def get_user_profile():
     responses:
       200:
         description: User profile retrieved successfully
+      304:
+        description: Not modified (If-None-Match matched the ETag)
       404:
         description: User not found
     """
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_cached_user(user_id)
         
         if not user:
             return jsonify({
@@ -34,10 +43,15 @@ def get_user_profile():
                 }
             }), 404
         
-        return jsonify({
+        etag = make_etag(user['id'], user['updatedAt'] or user['createdAt'])
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        return with_etag(jsonify({
             'success': True,
-            'data': user.to_dict()
-        }), 200
+            'data': user
+        }), etag), 200
         
     except Exception as e:
         return jsonify({
@@ -114,6 +128,7 @@ def update_user_profile():
             user.phone = data['phone']
         
         db.session.commit()
+        invalidate_user(user_id)
         
         return jsonify({
             'success': True,
@@ -133,6 +148,7 @@ def update_user_profile():
 
 @users_bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_users():
     """
     Get all users (admin only)
@@ -185,13 +201,15 @@ def get_users():
         if role:
             query = query.filter_by(role=role)
         
-        users = query.order_by(User.created_at.desc()).limit(limit).offset((page-1)*limit).all()
+        users = serialize_users(
+            query.order_by(User.created_at.desc()).limit(limit).offset((page-1)*limit)
+        )
         total = query.count()
         
         return jsonify({
             'success': True,
             'data': {
-                'users': [user.to_dict() for user in users],
+                'users': users,
                 'pagination': {
                     'page': page,
                     'limit': limit,
@@ -210,8 +228,89 @@ def get_users():
             }
         }), 500
 
+@users_bp.route('/search', methods=['GET'])
+@jwt_required()
+@query_budget(3)
+def search_users():
+    """
+    Search users by name, email or phone prefix (admin only)
+    ---
+    tags:
+      - Users
+    security:
+      - Bearer: []
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Start of a name, email or phone number (at least 2 characters)
+      - name: role
+        in: query
+        type: string
+        enum: ["passenger", "driver", "admin"]
+        description: Filter by user role
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+        description: Maximum results (max 50)
+    responses:
+      200:
+        description: Matching users, name matches first
+      400:
+        description: Query too short
+      403:
+        description: Admin access required
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        current_user = User.query.get(current_user_id)
+
+        if current_user.role != 'admin':
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'ADMIN_REQUIRED',
+                    'message': 'Admin access required'
+                }
+            }), 403
+
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        ids, has_more = search_user_ids(request.args.get('q'), limit, request.args.get('role'))
+        if ids is None:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'QUERY_TOO_SHORT',
+                    'message': f'Search query (q) must be at least {MIN_LENGTH} characters'
+                }
+            }), 400
+
+        users = serialize_users(User.query.filter(User.id.in_(ids))) if ids else []
+        position = {user_id: index for index, user_id in enumerate(ids)}
+        users.sort(key=lambda user: position[user['id']])
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'users': users,
+                'hasMore': has_more
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'SEARCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
 @users_bp.route('/<user_id>', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_user(user_id):
     """
     Get specific user (admin only)
@@ -318,8 +417,13 @@ def delete_user(user_id):
                 }
             }), 404
         
+        # The driver profile goes with the user (drivers.user_id is NOT NULL)
+        for driver in user.driver_profile:
+            release_documents(driver)
+            db.session.delete(driver)
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(user_id)
         
         return jsonify({
             'success': True,
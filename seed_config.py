@@ -16,6 +16,7 @@ def seed_config():
         ('TRIP_BASE_FARE', '200', 'Base fare for trips (KES)'),
         ('TRIP_RATE_PER_KM', '50', 'Rate per kilometer (KES)'),
         ('TRIP_AVERAGE_SPEED', '30', 'Average speed for duration calculation (km/h)'),
+        ('DRIVER_COMMISSION_RATE', '0', 'Platform share of each fare, debited from the driver ledger (0-1)'),
         
         # App Configuration
         ('APP_NAME', 'SafeDrive', 'Application name'),
@@ -0,0 +1,193 @@
+"""
+Bulk export of trips and payments for a created_at range
+
+Rows are read with Core (no ORM objects) through a server-side cursor
+(stream_results, fetched BATCH_SIZE at a time; SQLite's cursor is lazy
+already) in created_at order off the ix_*_created_at index, and written
+out as they arrive, so memory stays flat however long the range:
+
+    CSV      one chunk of text per batch
+    Parquet  one row group per ROW_GROUP_ROWS rows (needs pyarrow, which
+             is optional)
+
+Small batches keep each csv.writerows() call, which holds the GIL, short
+enough not to delay API requests on the worker's other threads.
+
+The API runs at most EXPORT_MAX_CONCURRENT exports per worker so that a
+few analysts cannot take every thread; the CLI (export_data.py) is not
+limited.
+"""
+
+from sqlalchemy import select
+from models import db, Trip, Payment
+from datetime import datetime, timedelta, timezone
+import csv
+import io
+import os
+import threading
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+ROW_GROUP_ROWS = 50000
+MAX_DAYS = int(os.environ.get('EXPORT_MAX_DAYS', 92))
+
+TABLES = {
+    'trips': Trip.__table__,
+    'payments': Payment.__table__,
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+export_slots = threading.BoundedSemaphore(int(os.environ.get('EXPORT_MAX_CONCURRENT', 1)))
+
+class ExportError(ValueError):
+    """Invalid export request; code is the API error code"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+def _naive_utc(value):
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def parse_range(start, end, max_days=MAX_DAYS):
+    """
+    Validate an ISO date / datetime range
+
+    end defaults to a day after start; a bare end date is exclusive.
+    Values with an offset (e.g. 2024-05-01T00:00:00Z) are converted to
+    naive UTC, which is how created_at is stored.
+
+    Returns:
+        tuple: (start, end) datetimes
+    """
+    if not start:
+        raise ExportError('MISSING_RANGE', 'start is required (ISO date, e.g. 2024-05-01)')
+    try:
+        start = _naive_utc(datetime.fromisoformat(start))
+        end = _naive_utc(datetime.fromisoformat(end)) if end else start + timedelta(days=1)
+    except ValueError:
+        raise ExportError('INVALID_RANGE', 'start and end must be ISO dates, e.g. 2024-05-01')
+    if end <= start:
+        raise ExportError('INVALID_RANGE', 'end must be after start')
+    if max_days and end - start > timedelta(days=max_days):
+        raise ExportError('RANGE_TOO_LARGE', f'Export at most {max_days} days at a time')
+    return start, end
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ExportError('INVALID_FORMAT', f'format must be one of: {", ".join(FORMATS)}')
+    if fmt == 'parquet' and pyarrow is None:
+        raise ExportError('FORMAT_UNAVAILABLE', 'Parquet export needs pyarrow installed')
+
+def filename(kind, start, end, fmt):
+    return f'{kind}_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}'
+
+def _batches(kind, start, end, batch_size):
+    """Lists of row tuples, oldest first"""
+    table = TABLES[kind]
+    query = (
+        select(*table.c)
+        .where(table.c.created_at >= start, table.c.created_at < end)
+        .order_by(table.c.created_at, table.c.id)
+    )
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for rows in result.partitions():
+            yield rows
+
+def iter_csv(kind, start, end, batch_size=BATCH_SIZE):
+    """CSV text, header first, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TABLES[kind].c.keys())
+    yield buffer.getvalue()
+    for rows in _batches(kind, start, end, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter whose bytes are taken as they come"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def _arrow_type(column):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return pyarrow.timestamp('us')
+    if python_type is int:
+        return pyarrow.int64()
+    if python_type is float:
+        return pyarrow.float64()
+    if getattr(column.type, 'scale', None) is not None:
+        return pyarrow.decimal128(column.type.precision, column.type.scale)
+    return pyarrow.string()
+
+def iter_parquet(kind, start, end, batch_size=BATCH_SIZE):
+    """Parquet bytes, one chunk per row group"""
+    schema = pyarrow.schema([(column.name, _arrow_type(column)) for column in TABLES[kind].c])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode='w'), schema, compression='zstd')
+
+    def row_group(rows):
+        values = list(zip(*rows))
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values[i], type=field.type) for i, field in enumerate(schema)],
+            schema=schema
+        ))
+        return sink.drain()
+
+    try:
+        pending = []
+        for rows in _batches(kind, start, end, batch_size):
+            pending.extend(rows)
+            if len(pending) >= ROW_GROUP_ROWS:
+                yield row_group(pending)
+                pending = []
+        if pending:
+            yield row_group(pending)
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def iter_export(kind, fmt, start, end, batch_size=BATCH_SIZE):
+    if fmt == 'parquet':
+        return iter_parquet(kind, start, end, batch_size)
+    return iter_csv(kind, start, end, batch_size)
@@ -0,0 +1,170 @@
+"""
+Append-only driver earnings ledger
+
+Every movement of driver money is one immutable LedgerEntry:
+
+    fare             + trip fare, once the trip is completed and paid
+    commission       - DRIVER_COMMISSION_RATE x fare, posted with the fare
+    payout           - payout amount, when the payout is queued
+    payout_reversal  + payout amount, when the payout fails
+    refund           - amount refunded to the passenger out of a fare
+
+Entries are unique per (entry_type, reference_id) and the post_*
+functions insert with INSERT ... SELECT from the source rows, skipping
+anything already posted. They can therefore be called from every code
+path that might finish a transition (and with no criteria, to backfill
+history): whichever runs first posts the entry. They run in the caller's
+transaction.
+
+compact_ledger.py periodically folds each driver's new entries into a
+BalanceSnapshot, so balance() reads one snapshot plus the short tail of
+entries after it, however long the history.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import and_, exists, func, literal, select
+from models import db, BalanceSnapshot, Config, LedgerEntry, Payout, Trip
+
+ENTRY_COLUMNS = ('driver_id', 'entry_type', 'amount', 'reference_id', 'created_at')
+
+def commission_rate():
+    """Platform share of each fare (Config DRIVER_COMMISSION_RATE, 0-1)"""
+    try:
+        rate = Decimal(Config.get_cached_value('DRIVER_COMMISSION_RATE', '0'))
+    except InvalidOperation:
+        return Decimal('0')
+    return rate if 0 < rate <= 1 else Decimal('0')
+
+def _not_posted(entry_type, reference):
+    return ~exists().where(LedgerEntry.entry_type == entry_type, LedgerEntry.reference_id == reference)
+
+def _insert_ignore(source):
+    """INSERT INTO ledger_entries SELECT ...; returns the number of entries posted"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+    statement = insert(LedgerEntry).from_select(ENTRY_COLUMNS, source)
+    if dialect in ('postgresql', 'sqlite'):
+        # source already skips posted entries; this covers a concurrent post
+        statement = statement.on_conflict_do_nothing(index_elements=['entry_type', 'reference_id'])
+    return db.session.execute(statement).rowcount
+
+def _entry(driver_id, entry_type, amount, reference_id):
+    return (driver_id, literal(entry_type), amount, reference_id,
+            literal(datetime.utcnow(), db.DateTime))
+
+def post_trip_fares(*criteria):
+    """
+    Post fare (and commission) entries for completed, paid trips
+
+    Args:
+        *criteria: filters on Trip, e.g. Trip.id == trip_id; none for all trips
+
+    Returns:
+        int: number of fares posted
+    """
+    payable = [*criteria, Trip.status == 'completed', Trip.payment_status == 'paid',
+               Trip.driver_id.isnot(None)]
+    rate = commission_rate()
+    if rate:
+        # Before the fare, so it is only charged alongside a new fare
+        _insert_ignore(
+            select(*_entry(Trip.driver_id, 'commission', -func.round(Trip.fare * literal(rate, db.Numeric(5, 4)), 2), Trip.id))
+            .where(*payable, _not_posted('fare', Trip.id), _not_posted('commission', Trip.id))
+        )
+    return _insert_ignore(
+        select(*_entry(Trip.driver_id, 'fare', Trip.fare, Trip.id))
+        .where(*payable, _not_posted('fare', Trip.id))
+    )
+
+def post_payouts(*criteria):
+    """Post a debit for every payout matching criteria; returns the number posted"""
+    return _insert_ignore(
+        select(*_entry(Payout.driver_id, 'payout', -Payout.amount, Payout.id))
+        .where(*criteria, _not_posted('payout', Payout.id))
+    )
+
+def post_payout_reversals(*criteria):
+    """Credit back failed payouts matching criteria; returns the number posted"""
+    return _insert_ignore(
+        select(*_entry(Payout.driver_id, 'payout_reversal', Payout.amount, Payout.id))
+        .where(*criteria, Payout.status == 'failed', _not_posted('payout_reversal', Payout.id))
+    )
+
+def post_refund(driver_id, amount, reference_id):
+    """Debit a refund (reference_id: the refund or payment id) from a driver"""
+    return _insert_ignore(
+        select(*_entry(literal(driver_id), 'refund', literal(-Decimal(str(amount)), db.Numeric(12, 2)),
+                       literal(reference_id)))
+        .where(_not_posted('refund', reference_id))
+    )
+
+def balance(driver_id):
+    """Latest snapshot plus the entries after it (one query)"""
+    last_id = select(func.coalesce(func.max(BalanceSnapshot.last_entry_id), 0)).where(
+        BalanceSnapshot.driver_id == driver_id
+    ).scalar_subquery()
+    snapshot = select(BalanceSnapshot.balance).where(
+        BalanceSnapshot.driver_id == driver_id,
+        BalanceSnapshot.last_entry_id == last_id
+    ).scalar_subquery()
+    tail = select(func.coalesce(func.sum(LedgerEntry.amount), 0)).where(
+        LedgerEntry.driver_id == driver_id,
+        LedgerEntry.id > last_id
+    ).scalar_subquery()
+    snapshot, tail = db.session.execute(select(func.coalesce(snapshot, 0), tail)).one()
+    return Decimal(str(snapshot)) + Decimal(str(tail))
+
+def compact(settle_seconds=60):
+    """
+    Fold every driver's entries since their last snapshot into a new one
+
+    Only entries older than settle_seconds are folded: ids are assigned
+    at insert, so a transaction still open could commit an id below one
+    already visible. Run it from one place at a time; a concurrent run
+    fails on the unique (driver_id, last_entry_id) index rather than
+    writing a second snapshot.
+
+    Returns:
+        dict: drivers snapshotted and entries folded
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    upto = db.session.execute(
+        select(func.max(LedgerEntry.id)).where(LedgerEntry.created_at < cutoff)
+    ).scalar()
+    if upto is None:
+        return {'drivers': 0, 'entries': 0}
+
+    latest = (
+        select(BalanceSnapshot.driver_id, func.max(BalanceSnapshot.last_entry_id).label('last_entry_id'))
+        .group_by(BalanceSnapshot.driver_id)
+        .subquery()
+    )
+    tails = db.session.execute(
+        select(LedgerEntry.driver_id,
+               func.coalesce(BalanceSnapshot.balance, 0),
+               func.sum(LedgerEntry.amount),
+               func.count(LedgerEntry.id),
+               func.max(LedgerEntry.id))
+        .outerjoin(latest, latest.c.driver_id == LedgerEntry.driver_id)
+        .outerjoin(BalanceSnapshot, and_(BalanceSnapshot.driver_id == latest.c.driver_id,
+                                         BalanceSnapshot.last_entry_id == latest.c.last_entry_id))
+        .where(LedgerEntry.id > func.coalesce(latest.c.last_entry_id, 0), LedgerEntry.id <= upto)
+        .group_by(LedgerEntry.driver_id, BalanceSnapshot.balance)
+    ).all()
+    if not tails:
+        return {'drivers': 0, 'entries': 0}
+
+    now = datetime.utcnow()
+    db.session.execute(BalanceSnapshot.__table__.insert(), [
+        {'driver_id': driver_id, 'balance': Decimal(str(base)) + Decimal(str(total)),
+         'last_entry_id': last_entry_id, 'entry_count': count, 'created_at': now}
+        for driver_id, base, total, count, last_entry_id in tails
+    ])
+    db.session.commit()
+    return {'drivers': len(tails), 'entries': sum(row[3] for row in tails)}
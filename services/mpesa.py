@@ -1,16 +1,32 @@
-import requests
 import base64
+import os
+import threading
+import time
 from datetime import datetime
 from models import Config
 
+# OAuth tokens shared by every MpesaService in the worker, keyed by
+# (base_url, consumer_key). One thread fetches a new token when it expires
+# while the others wait for its result; the lock only guards the dicts,
+# never the HTTP call. A failed fetch is remembered for
+# MPESA_TOKEN_BACKOFF_SECONDS so that during an OAuth outage callers fail
+# fast instead of each waiting out the 10s timeout.
+TOKEN_TIMEOUT = 10
+TOKEN_FAILURE_BACKOFF = float(os.environ.get('MPESA_TOKEN_BACKOFF_SECONDS', 5))
+
+_token_cache = {}
+_token_failures = {}
+_token_fetches = {}
+_token_lock = threading.Lock()
+
 class MpesaService:
     def __init__(self):
         try:
-            self.consumer_key = Config.get_value('MPESA_CONSUMER_KEY', 'UnDvUCktXcQDyRScx0uAnJlA7rboMWhSnAxvhSOYQiX8QU0t')
-            self.consumer_secret = Config.get_value('MPESA_CONSUMER_SECRET', 'eP7nwvhM3OwL0nVhRlOCsGnRawPi32BkENmT33NygDpdYdq5sy1WyAshdCnidCkb')
-            self.business_shortcode = Config.get_value('MPESA_BUSINESS_SHORTCODE', '174379')
-            self.passkey = Config.get_value('MPESA_PASSKEY', 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919')
-            self.base_url = Config.get_value('MPESA_BASE_URL', 'https://sandbox.safaricom.co.ke')
+            self.consumer_key = Config.get_cached_value('MPESA_CONSUMER_KEY', 'UnDvUCktXcQDyRScx0uAnJlA7rboMWhSnAxvhSOYQiX8QU0t')
+            self.consumer_secret = Config.get_cached_value('MPESA_CONSUMER_SECRET', 'eP7nwvhM3OwL0nVhRlOCsGnRawPi32BkENmT33NygDpdYdq5sy1WyAshdCnidCkb')
+            self.business_shortcode = Config.get_cached_value('MPESA_BUSINESS_SHORTCODE', '174379')
+            self.passkey = Config.get_cached_value('MPESA_PASSKEY', 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919')
+            self.base_url = Config.get_cached_value('MPESA_BASE_URL', 'https://sandbox.safaricom.co.ke')
         except Exception:
             # Fallback to environment variables
             import os
@@ -20,17 +36,45 @@ class MpesaService:
             self.passkey = os.environ.get('MPESA_PASSKEY', 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919')
             self.base_url = os.environ.get('MPESA_BASE_URL', 'https://sandbox.safaricom.co.ke')
         
-        # Token caching
-        self._cached_token = None
-        self._token_expires = None
-        
     def get_access_token(self):
-        """Get OAuth access token with caching"""
-        # Check cached token
-        if self._cached_token and self._token_expires:
-            if datetime.now() < self._token_expires:
-                return self._cached_token
+        """Get OAuth access token with caching; None if it can't be fetched"""
+        cache_key = (self.base_url, self.consumer_key)
+        with _token_lock:
+            token, expires = _token_cache.get(cache_key, (None, 0))
+            now = time.monotonic()
+            if token and now < expires:
+                return token
+            if now < _token_failures.get(cache_key, 0):
+                return None
+            fetch = _token_fetches.get(cache_key)
+            leader = fetch is None
+            if leader:
+                fetch = _token_fetches[cache_key] = threading.Event()
         
+        if not leader:
+            # Another thread is fetching; use whatever it got
+            fetch.wait(TOKEN_TIMEOUT + 1)
+            with _token_lock:
+                token, expires = _token_cache.get(cache_key, (None, 0))
+            return token if token and time.monotonic() < expires else None
+        
+        result = None
+        try:
+            result = self._fetch_access_token()
+        finally:
+            with _token_lock:
+                if result:
+                    token, expires_in = result
+                    _token_cache[cache_key] = (token, time.monotonic() + int(expires_in) - 60)  # 1 min buffer
+                    _token_failures.pop(cache_key, None)
+                else:
+                    _token_failures[cache_key] = time.monotonic() + TOKEN_FAILURE_BACKOFF
+                del _token_fetches[cache_key]
+            fetch.set()
+        return result[0] if result else None
+    
+    def _fetch_access_token(self):
+        """Request a new OAuth token; returns (token, expires_in) or None"""
         try:
             url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
             
@@ -38,19 +82,15 @@ class MpesaService:
             encoded_credentials = base64.b64encode(credentials.encode()).decode()
             
             headers = {"Authorization": f"Basic {encoded_credentials}"}
-            response = requests.get(url, headers=headers, timeout=10)
+            import requests  # deferred: keeps ~35ms off app boot
+            response = requests.get(url, headers=headers, timeout=TOKEN_TIMEOUT)
             
             if response.status_code == 200:
                 token_data = response.json()
                 access_token = token_data.get("access_token")
                 expires_in = token_data.get("expires_in", 3600)  # Default 1 hour
-                
-                # Cache token
-                self._cached_token = access_token
-                from datetime import timedelta
-                self._token_expires = datetime.now() + timedelta(seconds=expires_in - 60)  # 1 min buffer
-                
-                return access_token
+                if access_token:
+                    return access_token, expires_in
             return None
                 
         except Exception:
@@ -110,13 +150,14 @@ class MpesaService:
                 "PartyA": formatted_phone,
                 "PartyB": self.business_shortcode,
                 "PhoneNumber": formatted_phone,
-                "CallBackURL": Config.get_value('MPESA_CALLBACK_URL', 'https://safedrive-backend-d579.onrender.com/api/v1/payments/callback'),
+                "CallBackURL": Config.get_cached_value('MPESA_CALLBACK_URL', 'https://safedrive-backend-d579.onrender.com/api/v1/payments/callback'),
                 "AccountReference": account_reference,
                 "TransactionDesc": transaction_desc
             }
             
             print(f"M-Pesa STK Push payload: {payload}")  # Debug log
             
+            import requests
             response = requests.post(url, json=payload, headers=headers, timeout=30)
             
             if response.status_code == 200:
@@ -165,7 +206,8 @@ class MpesaService:
                 "CheckoutRequestID": checkout_request_id
             }
             
-            response = requests.post(url, json=payload, headers=headers)
+            import requests
+            response = requests.post(url, json=payload, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 return {"success": True, "data": response.json()}
@@ -173,4 +215,81 @@ class MpesaService:
                 return {"success": False, "error": response.json()}
                 
         except Exception as e:
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+    
+    _b2c_settings = None
+    
+    def b2c_settings(self):
+        """Initiator credentials and result URLs for B2C, read once per service"""
+        if self._b2c_settings is None:
+            self._b2c_settings = {
+                'initiator_name': Config.get_cached_value('MPESA_INITIATOR_NAME', os.environ.get('MPESA_INITIATOR_NAME', 'testapi')),
+                'security_credential': Config.get_cached_value('MPESA_SECURITY_CREDENTIAL', os.environ.get('MPESA_SECURITY_CREDENTIAL', '')),
+                'result_url': Config.get_cached_value('MPESA_RESULT_URL', os.environ.get('MPESA_RESULT_URL', 'https://safedrive-backend-d579.onrender.com/api/v1/payments/result')),
+                'timeout_url': Config.get_cached_value('MPESA_TIMEOUT_URL', os.environ.get('MPESA_TIMEOUT_URL', 'https://safedrive-backend-d579.onrender.com/api/v1/payments/timeout'))
+            }
+        return self._b2c_settings
+    
+    def b2c_payment(self, phone_number, amount, originator_conversation_id, remarks='Driver payout', session=None):
+        """
+        Send money to a customer (B2C). Result arrives later at MPESA_RESULT_URL.
+        
+        The originator_conversation_id identifies the request to Daraja, so
+        resubmitting the same id after a lost response is not paid twice.
+        Returns {"success", "conversation_id", ...} or {"success": False,
+        "error", "retryable"}; retryable is set for network errors, 429
+        and 5xx responses. Call b2c_settings() first when calling from
+        threads without an app context.
+        """
+        try:
+            access_token = self.get_access_token()
+            if not access_token:
+                return {"success": False, "error": "Failed to get M-Pesa access token", "retryable": True}
+            
+            url = f"{self.base_url}/mpesa/b2c/v3/paymentrequest"
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
+            settings = self.b2c_settings()
+            payload = {
+                "OriginatorConversationID": originator_conversation_id,
+                "InitiatorName": settings['initiator_name'],
+                "SecurityCredential": settings['security_credential'],
+                "CommandID": "BusinessPayment",
+                "Amount": int(amount),
+                "PartyA": self.business_shortcode,
+                "PartyB": phone_number,
+                "Remarks": remarks,
+                "QueueTimeOutURL": settings['timeout_url'],
+                "ResultURL": settings['result_url'],
+                "Occasion": originator_conversation_id
+            }
+            
+            import requests
+            http = session or requests
+            try:
+                response = http.post(url, json=payload, headers=headers, timeout=30)
+            except requests.RequestException as e:
+                return {"success": False, "error": str(e), "retryable": True}
+            
+            try:
+                result = response.json()
+            except ValueError:
+                result = {"errorMessage": response.text}
+            
+            if response.status_code == 200 and result.get("ResponseCode") == "0":
+                return {
+                    "success": True,
+                    "conversation_id": result.get("ConversationID"),
+                    "originator_conversation_id": result.get("OriginatorConversationID", originator_conversation_id),
+                    "response_description": result.get("ResponseDescription")
+                }
+            return {
+                "success": False,
+                "error": result.get("errorMessage") or result.get("ResponseDescription") or result,
+                "retryable": response.status_code == 429 or response.status_code >= 500
+            }
+                
+        except Exception as e:
+            return {"success": False, "error": str(e), "retryable": False}
@@ -0,0 +1,227 @@
+"""
+Batched M-Pesa B2C driver payouts
+
+POST /drivers/payout only queues a Payout after checking the driver's
+balance. process_payouts.py settles the queue in batches:
+
+    1. claim up to batch_size pending payouts with one conditional UPDATE
+       (pending -> submitting, tagged with a batch id), so concurrent
+       runners never submit the same payout
+    2. submit them to B2C from a thread pool, retrying network errors,
+       429 and 5xx with jittered exponential backoff
+    3. write every outcome back in one executemany UPDATE: accepted ->
+       processing, rejected -> failed, still erroring -> pending (failed
+       once max_attempts batches have tried it)
+
+M-Pesa then POSTs each result to /payments/result (handle_result), which
+moves the payout to paid or failed; repeated callbacks change nothing.
+Queuing a payout posts its ledger debit and failing it posts the
+reversal (services/ledger.py).
+The payout id is sent as OriginatorConversationID, so resubmitting a
+payout whose response was lost is recognised as a duplicate by Daraja.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, or_, select, update
+from concurrent.futures import ThreadPoolExecutor
+from models import db, Payout
+from services import ledger
+from services.mpesa import MpesaService
+import random
+import threading
+import time
+import uuid
+
+def available_balance(driver_id):
+    """Driver's ledger balance: fares less commission and payouts not failed"""
+    return ledger.balance(driver_id)
+
+def recover_stale(older_than_seconds=600):
+    """Requeue payouts left in submitting by a runner that died mid-batch"""
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than_seconds)
+    result = db.session.execute(
+        update(Payout)
+        .where(Payout.status == 'submitting', Payout.updated_at < cutoff)
+        .values(status='pending', batch_id=None, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+def claim_batch(batch_size, queued_before=None):
+    """
+    Mark up to batch_size pending payouts as submitting; returns their rows
+
+    queued_before skips payouts queued or requeued after that time, so a
+    run does not immediately retry what it has just requeued.
+    """
+    batch_id = f'batch_{uuid.uuid4().hex[:12]}'
+    pending = [Payout.status == 'pending']
+    if queued_before is not None:
+        pending.append(Payout.updated_at < queued_before)
+    oldest = (
+        select(Payout.id)
+        .where(*pending)
+        .order_by(Payout.created_at)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Payout)
+        .where(Payout.id.in_(oldest), Payout.status == 'pending')
+        .values(status='submitting', batch_id=batch_id,
+                attempts=Payout.attempts + 1, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    rows = db.session.execute(
+        select(Payout.id, Payout.phone, Payout.amount, Payout.attempts)
+        .where(Payout.batch_id == batch_id, Payout.status == 'submitting')
+    ).all()
+    db.session.commit()
+    return rows
+
+def submit_batch(rows, workers=16, retries=3, backoff=0.5, service=None):
+    """
+    Submit claimed payouts to B2C concurrently
+
+    Runs outside the database session: threads only make HTTP calls, each
+    over its own keep-alive connection.
+
+    Returns:
+        list: (row, result) pairs, result as returned by b2c_payment()
+    """
+    import requests
+
+    service = service or MpesaService()
+    # Read settings and the token here, where the app context is
+    service.b2c_settings()
+    service.get_access_token()
+    local = threading.local()
+
+    def send(row):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        for attempt in range(retries + 1):
+            result = service.b2c_payment(row.phone, row.amount, row.id, session=session)
+            if result['success'] or not result.get('retryable') or attempt == retries:
+                return row, result
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(send, rows))
+
+def apply_submissions(results, max_attempts=5):
+    """Write submission outcomes back with one executemany; returns counts"""
+    counts = {'accepted': 0, 'failed': 0, 'requeued': 0}
+    params = []
+    for row, result in results:
+        if result['success']:
+            status, outcome, error = 'processing', 'accepted', None
+        elif result.get('retryable') and row.attempts < max_attempts:
+            status, outcome, error = 'pending', 'requeued', str(result.get('error'))
+        else:
+            status, outcome, error = 'failed', 'failed', str(result.get('error'))
+        counts[outcome] += 1
+        params.append({
+            'b_id': row.id,
+            'b_status': status,
+            'b_conversation_id': result.get('conversation_id'),
+            'b_originator_conversation_id': result.get('originator_conversation_id'),
+            'b_error': error
+        })
+    if not params:
+        return counts
+
+    table = Payout.__table__
+    # Only rows still in submitting: a fast result callback may already
+    # have marked the payout paid or failed
+    db.session.execute(
+        table.update()
+        .where(table.c.id == bindparam('b_id'), table.c.status == 'submitting')
+        .values(status=bindparam('b_status'),
+                conversation_id=bindparam('b_conversation_id'),
+                originator_conversation_id=bindparam('b_originator_conversation_id'),
+                last_error=bindparam('b_error'),
+                batch_id=None,
+                updated_at=datetime.utcnow()),
+        params
+    )
+    failed = [param['b_id'] for param in params if param['b_status'] == 'failed']
+    if failed:
+        ledger.post_payout_reversals(Payout.id.in_(failed))
+    db.session.commit()
+    return counts
+
+def process_pending(batch_size=200, workers=16, retries=3, max_attempts=5, stale_seconds=600):
+    """Submit every pending payout, batch by batch; returns totals"""
+    totals = {'batches': 0, 'submitted': 0, 'accepted': 0, 'failed': 0, 'requeued': 0,
+              'recovered': recover_stale(stale_seconds)}
+    service = MpesaService()
+    started = datetime.utcnow()
+    while True:
+        rows = claim_batch(batch_size, queued_before=started)
+        if not rows:
+            break
+        counts = apply_submissions(submit_batch(rows, workers, retries, service=service), max_attempts)
+        totals['batches'] += 1
+        totals['submitted'] += len(rows)
+        for key, value in counts.items():
+            totals[key] += value
+        if counts['requeued'] == len(rows):
+            # Nothing got through; leave the rest for the next run
+            break
+    return totals
+
+def handle_result(result):
+    """
+    Apply a B2C result callback ({"Result": {...}} body's Result)
+
+    Returns:
+        bool: False if the payout was unknown or already settled
+    """
+    originator_id = result.get('OriginatorConversationID')
+    conversation_id = result.get('ConversationID')
+    matches = [Payout.id == originator_id] if originator_id else []
+    if conversation_id:
+        matches.append(Payout.conversation_id == conversation_id)
+    if not matches:
+        return False
+
+    code = str(result.get('ResultCode'))
+    paid = code == '0'
+    updated = db.session.execute(
+        update(Payout)
+        .where(or_(*matches), Payout.status.in_(('submitting', 'processing')))
+        .values(status='paid' if paid else 'failed',
+                result_code=code,
+                transaction_id=result.get('TransactionID'),
+                conversation_id=func.coalesce(Payout.conversation_id, conversation_id),
+                last_error=None if paid else result.get('ResultDesc'),
+                batch_id=None,
+                updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if updated and not paid:
+        ledger.post_payout_reversals(or_(*matches))
+    db.session.commit()
+    return bool(updated)
+
+def handle_timeout(result):
+    """Requeue a payout whose B2C request timed out in the M-Pesa queue"""
+    originator_id = result.get('OriginatorConversationID')
+    conversation_id = result.get('ConversationID')
+    matches = [Payout.id == originator_id] if originator_id else []
+    if conversation_id:
+        matches.append(Payout.conversation_id == conversation_id)
+    if not matches:
+        return False
+
+    updated = db.session.execute(
+        update(Payout)
+        .where(or_(*matches), Payout.status == 'processing')
+        .values(status='pending', last_error='Queue timeout', updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    return bool(updated)
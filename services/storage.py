@@ -0,0 +1,273 @@
+"""
+Content-addressed document storage
+
+Uploaded documents are stored once per distinct SHA-256, in sharded
+directories (ab/cd/abcd...) so no directory grows past a few hundred
+entries. Driver.document_* columns hold the hash, and DocumentBlob
+counts how many columns point at each blob:
+
+    sha256 = store_upload(file.stream, content_type)   # +1 reference
+    release(old_sha256)                                 # -1 reference
+
+Both only change the session; the caller commits them together with the
+driver row. Re-uploading identical bytes only bumps the count. Blobs at
+zero references are deleted by gc_documents.py once they have been
+unreferenced for DOCUMENT_GC_GRACE_SECONDS.
+
+Bytes live in a StorageBackend chosen by DOCUMENT_STORE_BACKEND. Only
+'local' exists today; an object-storage backend implements the same
+methods and is added to BACKENDS.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, update
+from models import db, DocumentBlob
+from utils.uploads import HashingFile
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def is_blob_ref(value):
+    """True if a Driver.document_* value is a blob hash rather than a legacy path"""
+    return bool(value) and _SHA256_RE.match(value) is not None
+
+class StorageBackend:
+    """Where blob bytes live; keys are SHA-256 hex digests"""
+
+    # Local directory that uploads are streamed into before put()
+    staging_dir = None
+
+    def put(self, key, upload):
+        """
+        Store a utils.uploads.HashingFile under key
+
+        Returns:
+            bool: False if the key was already stored (upload discarded)
+        """
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def open(self, key):
+        """Binary file object for reading the blob"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def iter_keys(self):
+        """Yield (key, last_modified_timestamp) for every stored blob"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path of the blob, or None if it is not on local disk"""
+        return None
+
+    def clean_staging(self, older_than):
+        """Remove abandoned upload temp files; returns how many"""
+        return 0
+
+class LocalStorageBackend(StorageBackend):
+    """Blobs under root/ab/cd/<sha256>, uploads staged in root/tmp"""
+
+    def __init__(self, root):
+        self.root = root
+        self.staging_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def local_path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, key, upload):
+        path = self.local_path(key)
+        try:
+            # Refresh mtime so the orphan sweep leaves a reused file alone
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            upload.commit(path)
+            return True
+        upload.discard()
+        return False
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_keys(self):
+        for shard in sorted(os.listdir(self.root)):
+            shard_path = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for entry in os.scandir(shard_path):
+                if not entry.is_dir():
+                    continue
+                for blob in os.scandir(entry.path):
+                    if is_blob_ref(blob.name):
+                        yield blob.name, blob.stat().st_mtime
+
+    def clean_staging(self, older_than):
+        removed = 0
+        for entry in os.scandir(self.staging_dir):
+            if entry.name.endswith('.part') and entry.stat().st_mtime < older_than:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+BACKENDS = {
+    'local': lambda: LocalStorageBackend(os.environ.get('DOCUMENT_STORE_ROOT', 'uploads/blobs')),
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Per-worker backend selected by DOCUMENT_STORE_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[os.environ.get('DOCUMENT_STORE_BACKEND', 'local')]()
+    return _backend
+
+def _insert_blob_row(sha256, size, content_type):
+    # INSERT ... ON CONFLICT DO NOTHING, so concurrent uploads of the same
+    # bytes don't fail on the primary key
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        if db.session.get(DocumentBlob, sha256) is None:
+            db.session.add(DocumentBlob(sha256=sha256, size=size, content_type=content_type, ref_count=0))
+            db.session.flush()
+        return
+    db.session.execute(
+        insert(DocumentBlob)
+        .values(sha256=sha256, size=size, content_type=content_type, ref_count=0)
+        .on_conflict_do_nothing(index_elements=['sha256'])
+    )
+
+def _adjust_refs(sha256, delta):
+    query = update(DocumentBlob).where(DocumentBlob.sha256 == sha256)
+    if delta < 0:
+        query = query.where(DocumentBlob.ref_count > 0)
+    db.session.execute(query.values(ref_count=DocumentBlob.ref_count + delta, updated_at=datetime.utcnow()))
+
+def store_upload(upload, content_type=None):
+    """
+    Store a streamed upload and take a reference to it
+
+    The blob row is claimed (and row-locked by the reference update)
+    before the bytes are placed, so a concurrent gc_documents.py either
+    finishes deleting the old copy first or sees the new reference.
+
+    Args:
+        upload: utils.uploads.HashingFile written into get_backend().staging_dir
+        content_type: MIME type recorded if the blob is new
+
+    Returns:
+        tuple: (sha256, stored) where stored is False for a duplicate
+    """
+    sha256 = upload.sha256
+    _insert_blob_row(sha256, upload.size, content_type)
+    _adjust_refs(sha256, 1)
+    stored = get_backend().put(sha256, upload)
+    return sha256, stored
+
+def release(sha256):
+    """Drop one reference to a blob"""
+    if is_blob_ref(sha256):
+        _adjust_refs(sha256, -1)
+
+def import_file(path, content_type=None):
+    """Copy an existing file into the store and take a reference; returns its hash"""
+    upload = HashingFile(get_backend().staging_dir)
+    try:
+        with open(path, 'rb') as source:
+            shutil.copyfileobj(source, upload)
+        if content_type is None:
+            content_type = mimetypes.guess_type(path)[0]
+        sha256, _ = store_upload(upload, content_type)
+        return sha256
+    finally:
+        upload.discard()
+
+def collect_garbage(grace_seconds=3600, dry_run=False, batch_size=500):
+    """
+    Delete blobs nobody references
+
+    - rows at zero references, unchanged for grace_seconds, and their bytes
+    - stored files with no row (an upload whose transaction rolled back)
+    - upload temp files abandoned in the staging directory
+
+    Returns:
+        dict: counts of what was (or with dry_run would be) removed
+    """
+    backend = get_backend()
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    cutoff_ts = time.time() - grace_seconds
+    stats = {'blobsDeleted': 0, 'bytesFreed': 0, 'orphanFiles': 0, 'staleUploads': 0}
+
+    unreferenced = (DocumentBlob.ref_count <= 0, DocumentBlob.updated_at < cutoff)
+    candidates = db.session.execute(
+        select(DocumentBlob.sha256, DocumentBlob.size).where(*unreferenced)
+    ).all()
+    db.session.rollback()
+    for sha256, size in candidates:
+        if not dry_run:
+            # Deleting the row locks it until the file is gone, so a
+            # concurrent store_upload() waits and then re-creates both
+            result = db.session.execute(
+                delete(DocumentBlob).where(DocumentBlob.sha256 == sha256, *unreferenced)
+            )
+            if not result.rowcount:
+                db.session.rollback()
+                continue
+            backend.delete(sha256)
+            db.session.commit()
+        stats['blobsDeleted'] += 1
+        stats['bytesFreed'] += size or 0
+
+    batch = []
+    def sweep(batch):
+        known = set(db.session.execute(
+            select(DocumentBlob.sha256).where(DocumentBlob.sha256.in_(batch))
+        ).scalars())
+        db.session.rollback()
+        for key in batch:
+            if key not in known:
+                if not dry_run:
+                    backend.delete(key)
+                stats['orphanFiles'] += 1
+
+    for key, modified in backend.iter_keys():
+        if modified < cutoff_ts:
+            batch.append(key)
+        if len(batch) >= batch_size:
+            sweep(batch)
+            batch = []
+    if batch:
+        sweep(batch)
+
+    if not dry_run:
+        stats['staleUploads'] = backend.clean_staging(cutoff_ts)
+    return stats
@@ -0,0 +1,219 @@
+"""
+Full-text search over trip pickup / dropoff addresses
+
+SQLite: an external-content FTS5 table (trips_fts) over trips, kept in
+step by INSERT / UPDATE / DELETE triggers and ranked with bm25(). It is
+keyed on trips' implicit rowid, which VACUUM may renumber because trips
+has a string primary key; run rebuild_trip_search() after every VACUUM
+or searches return the wrong trips.
+
+PostgreSQL: a GIN index on to_tsvector('simple', pickup || ' ' ||
+dropoff), ranked with ts_rank_cd(). With the pg_trgm extension, trigram
+GIN indexes on both columns also match misspellings ("Westlnds") and
+rank by similarity.
+
+Every word of the query must match, as a prefix ("westl jki" finds
+"Westlands" -> "JKIA Terminal 1A"). Scoring has to visit every match, so
+results are ranked by relevance only when a capped count finds at most
+RANK_LIMIT matches; broader searches ("westlands" over millions of trips)
+come back newest first, which the index serves without scoring. Other
+databases fall back to an unindexed LIKE scan, newest first.
+"""
+
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from models import db, Trip
+import re
+import threading
+
+MAX_TERMS = 8
+RANK_LIMIT = 5000
+TRIGRAM_MIN_LENGTH = 4
+
+_SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS trips_fts USING fts5(
+        pickup_address, dropoff_address,
+        content='trips', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS trips_fts_insert AFTER INSERT ON trips BEGIN
+        INSERT INTO trips_fts(rowid, pickup_address, dropoff_address)
+        VALUES (new.rowid, new.pickup_address, new.dropoff_address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trips_fts_delete AFTER DELETE ON trips BEGIN
+        INSERT INTO trips_fts(trips_fts, rowid, pickup_address, dropoff_address)
+        VALUES ('delete', old.rowid, old.pickup_address, old.dropoff_address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trips_fts_update AFTER UPDATE OF pickup_address, dropoff_address ON trips BEGIN
+        INSERT INTO trips_fts(trips_fts, rowid, pickup_address, dropoff_address)
+        VALUES ('delete', old.rowid, old.pickup_address, old.dropoff_address);
+        INSERT INTO trips_fts(rowid, pickup_address, dropoff_address)
+        VALUES (new.rowid, new.pickup_address, new.dropoff_address);
+    END""",
+)
+
+# Must stay identical to _pg_document() for the planner to use the index
+_POSTGRES_DDL = (
+    """CREATE INDEX IF NOT EXISTS ix_trips_address_fts ON trips USING gin (
+        to_tsvector('simple', coalesce(pickup_address, '') || ' ' || coalesce(dropoff_address, '')))""",
+)
+
+_POSTGRES_TRIGRAM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_trips_pickup_trgm ON trips USING gin (pickup_address gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_trips_dropoff_trgm ON trips USING gin (dropoff_address gin_trgm_ops)",
+)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+def ensure_trip_search():
+    """
+    Create the search index if missing (call after create_all())
+
+    Returns:
+        bool: True if the index was created (and filled from trips)
+    """
+    global _backend
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trips_fts'")
+        ).first()
+        if exists:
+            return False
+        try:
+            for statement in _SQLITE_DDL:
+                db.session.execute(text(statement))
+            db.session.execute(text("INSERT INTO trips_fts(trips_fts) VALUES ('rebuild')"))
+            db.session.commit()
+        except Exception as e:
+            # SQLite built without FTS5
+            db.session.rollback()
+            print(f"⚠️  Trip search index unavailable: {e}")
+            return False
+    elif dialect == 'postgresql':
+        for statement in _POSTGRES_DDL:
+            db.session.execute(text(statement))
+        db.session.commit()
+        try:
+            for statement in _POSTGRES_TRIGRAM_DDL:
+                db.session.execute(text(statement))
+            db.session.commit()
+        except Exception as e:
+            # pg_trgm needs CREATE privilege on the database
+            db.session.rollback()
+            print(f"⚠️  Trigram trip search unavailable: {e}")
+    else:
+        return False
+    _backend = None
+    return True
+
+def rebuild_trip_search():
+    """
+    Re-read trips_fts from trips (SQLite; run after VACUUM)
+
+    Returns:
+        bool: True if the index was rebuilt
+    """
+    if _detect_backend() != 'fts5':
+        return False
+    db.session.execute(text("INSERT INTO trips_fts(trips_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    return True
+
+def _detect_backend():
+    """fts5, postgres, postgres_trgm or like (cached per worker)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                dialect = _dialect()
+                if dialect == 'sqlite':
+                    found = db.session.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trips_fts'")
+                    ).first()
+                    _backend = 'fts5' if found else 'like'
+                elif dialect == 'postgresql':
+                    found = db.session.execute(
+                        text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_trips_pickup_trgm'")
+                    ).first()
+                    _backend = 'postgres_trgm' if found else 'postgres'
+                else:
+                    _backend = 'like'
+    return _backend
+
+def search_terms(query):
+    """Lower-cased words of a search string (at most MAX_TERMS)"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+def _pg_document():
+    return func.to_tsvector(
+        literal_column("'simple'"),
+        func.coalesce(Trip.pickup_address, literal_column("''"))
+        .op('||')(literal_column("' '"))
+        .op('||')(func.coalesce(Trip.dropoff_address, literal_column("''")))
+    )
+
+def _match_count(matches, cap):
+    """Number of rows matching, counting no further than cap"""
+    capped = matches.limit(cap).subquery()
+    return db.session.execute(select(func.count()).select_from(capped)).scalar()
+
+def search_trips(query, status=None):
+    """
+    Trips whose addresses match query
+
+    Args:
+        query: free text; every word must match as a prefix
+        status: optional Trip.status filter
+
+    Returns:
+        tuple: (Trip query to paginate and pass to serialize_trips(),
+        'relevance' or 'recent'), or (None, None) if query has no
+        searchable words
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None, None
+
+    backend = _detect_backend()
+    trips = Trip.query
+    if status:
+        trips = trips.filter(Trip.status == status)
+
+    if backend == 'fts5':
+        fts = table('trips_fts', column('rowid'))
+        match = text('trips_fts MATCH :match').bindparams(match=' '.join(f'"{term}"*' for term in terms))
+        if _match_count(select(literal_column('1')).select_from(fts).where(match), RANK_LIMIT + 1) <= RANK_LIMIT:
+            order, order_by = 'relevance', (text('bm25(trips_fts)'), Trip.created_at.desc())
+        else:
+            # rowid follows insertion order and is the FTS index order
+            order, order_by = 'recent', (fts.c.rowid.desc(),)
+        return trips.join(fts, fts.c.rowid == literal_column('trips.rowid')).filter(match).order_by(*order_by), order
+
+    if backend in ('postgres', 'postgres_trgm'):
+        document = _pg_document()
+        tsquery = func.to_tsquery(literal_column("'simple'"), ' & '.join(f'{term}:*' for term in terms))
+        matches = document.op('@@')(tsquery)
+        rank = func.ts_rank_cd(document, tsquery)
+        phrase = ' '.join(terms)
+        if backend == 'postgres_trgm' and len(phrase) >= TRIGRAM_MIN_LENGTH:
+            # % is pg_trgm's similarity operator (index-assisted)
+            matches = or_(matches,
+                          Trip.pickup_address.op('%')(phrase),
+                          Trip.dropoff_address.op('%')(phrase))
+            rank = func.greatest(rank,
+                                 func.similarity(Trip.pickup_address, phrase),
+                                 func.similarity(Trip.dropoff_address, phrase))
+        trips = trips.filter(matches)
+        if _match_count(select(Trip.id).where(matches), RANK_LIMIT + 1) <= RANK_LIMIT:
+            return trips.order_by(rank.desc(), Trip.created_at.desc()), 'relevance'
+        return trips.order_by(Trip.created_at.desc()), 'recent'
+
+    for term in terms:
+        pattern = '%' + term.replace('_', '\\_') + '%'
+        trips = trips.filter(or_(Trip.pickup_address.ilike(pattern, escape='\\'),
+                                 Trip.dropoff_address.ilike(pattern, escape='\\')))
+    return trips.order_by(Trip.created_at.desc()), 'recent'
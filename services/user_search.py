@@ -0,0 +1,88 @@
+"""
+Typeahead search for users by name, email or phone prefix
+
+Each field is searched with a range on an indexed expression
+(lower(name) >= 'jan' AND lower(name) < 'jao'), read in index order and
+cut off at the page size, so the work is bounded by the number of
+results rather than the number of users. The field branches run as one
+UNION ALL. On PostgreSQL the indexed expressions are COLLATE "C" so that
+ranges compare bytewise, as SQLite's do. The indexes are declared on
+User and built by create_all() / ensure_indexes().
+
+The query's shape picks the fields:
+    contains '@'              email
+    digits, '+', spaces, '-'  phone, in every stored format (+2547..,
+                              2547.., 07.., 7..)
+    anything else             name (from its start), then email
+"""
+
+from sqlalchemy import literal, select, union_all
+from models import db, User
+import re
+
+MIN_LENGTH = 2
+PHONE_PATTERN = re.compile(r'^\+?[\d\s\-]+$')
+
+def _key(expression):
+    # Bytewise comparison on PostgreSQL, matching the *_c indexes
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return expression.collate('C')
+    return expression
+
+def _starts_with(key, prefix):
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (key >= prefix) & (key < upper)
+
+def phone_prefixes(query):
+    """Prefixes covering each way a Kenyan number may be stored"""
+    digits = re.sub(r'[\s\-]', '', query)
+    for country in ('+254', '254', '0'):
+        if digits.startswith(country):
+            national = digits[len(country):]
+            break
+    else:
+        national = digits.lstrip('+')
+    prefixes = ['+254' + national, '254' + national, '0' + national]
+    if national:
+        prefixes.append(national)
+    return prefixes
+
+def _branches(query):
+    """(rank, key expression, prefixes) for each field to search"""
+    text = query.strip()
+    if PHONE_PATTERN.match(text) and any(char.isdigit() for char in text):
+        return [(0, _key(User.phone), phone_prefixes(text))]
+    lowered = text.lower()
+    email = (1, _key(db.func.lower(User.email)), [lowered])
+    if '@' in text:
+        return [email]
+    return [(0, _key(db.func.lower(User.name)), [lowered]), email]
+
+def search_user_ids(query, limit=10, role=None):
+    """
+    Ids of users matching query, name matches first
+
+    Returns:
+        tuple: (ids, has_more), or (None, False) if query is shorter
+        than MIN_LENGTH
+    """
+    if len((query or '').strip()) < MIN_LENGTH:
+        return None, False
+
+    selects = []
+    for rank, key, prefixes in _branches(query):
+        for prefix in prefixes:
+            branch = select(User.id, literal(rank).label('rank'), key.label('key')).where(_starts_with(key, prefix))
+            if role:
+                branch = branch.where(User.role == role)
+            # One more than a page, from the start of the range
+            selects.append(select(branch.order_by(key).limit(limit + 1).subquery()))
+
+    rows = db.session.execute(union_all(*selects)).all()
+    ids = []
+    seen = set()
+    for user_id, _, _ in sorted(rows, key=lambda row: (row.rank, row.key or '', row.id)):
+        if user_id not in seen:
+            seen.add(user_id)
+            ids.append(user_id)
+    return ids[:limit], len(ids) > limit
@@ -0,0 +1,65 @@
+"""
+Opt-in Swagger UI and OpenAPI spec generation (flasgger)
+
+Production workers serve the pre-built static/apispec.json (see
+utils/openapi.py) and never import this module. It is used by
+build_spec.py at deploy time, and by create_app when ENABLE_SWAGGER_UI=true
+for interactive docs at /docs/.
+"""
+
+from flasgger import Swagger
+
+SWAGGER_CONFIG = {
+    "headers": [],
+    "specs": [
+        {
+            "endpoint": 'apispec',
+            "route": '/apispec.json',
+            "rule_filter": lambda rule: True,
+            "model_filter": lambda tag: True,
+        }
+    ],
+    "static_url_path": "/flasgger_static",
+    "swagger_ui": True,
+    "specs_route": "/docs/"
+}
+
+SWAGGER_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "SafeDrive API",
+        "description": "Complete REST API for SafeDrive ride-sharing platform",
+        "version": "1.0.0",
+        "contact": {
+            "name": "SafeDrive Team",
+            "email": "support@safedrive.com"
+        }
+    },
+    "host": "safedrive-backend-d579.onrender.com",
+    "basePath": "/api/v1",
+    "schemes": ["https", "http"],
+    "securityDefinitions": {
+        "Bearer": {
+            "type": "apiKey",
+            "name": "Authorization",
+            "in": "header",
+            "description": "JWT Authorization header using the Bearer scheme. Example: 'Authorization: Bearer {token}'"
+        }
+    },
+    "security": [
+        {
+            "Bearer": []
+        }
+    ]
+}
+
+def init_swagger(app, ui=True):
+    """Register flasgger; with ui=False only the spec generator is set up"""
+    config = dict(SWAGGER_CONFIG, swagger_ui=ui)
+    return Swagger(app, config=config, template=SWAGGER_TEMPLATE)
+
+def build_spec(app):
+    """Parse route docstrings once and return the OpenAPI spec dict"""
+    swagger = init_swagger(app, ui=False)
+    with app.test_request_context():
+        return swagger.get_apispecs('apispec')
@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+import time
+
+class BootTimer:
+    """Wall-clock breakdown of create_app phases"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def as_dict(self):
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.phases}
+        timings['total'] = round((time.perf_counter() - self.started) * 1000, 2)
+        return timings
+
+    def report(self):
+        timings = self.as_dict()
+        print("Boot timings (ms): " + ", ".join(f"{name}={ms}" for name, ms in timings.items()))
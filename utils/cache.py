@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry and hit/miss counters.
+
+    Instances live at module level, so each gunicorn worker holds its own
+    copy. Writes made through another worker only become visible here once
+    the entry expires, which is why the TTL is kept short.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return cached value or None if missing/expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store value, evicting the least recently used entry when full"""
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxSize': self.maxsize,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+# Serialized User.to_dict() records keyed by user id
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 2048)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 60))
+)
+
+def get_cached_user(user_id, load=None):
+    """
+    Get serialized user record, reading the database only on a miss
+
+    Args:
+        user_id: User ID to look up
+        load: Optional callable returning the User object on a miss
+              (e.g. an already-loaded relationship)
+
+    Returns:
+        dict: User.to_dict() output, or None if the user does not exist
+    """
+    if not user_id:
+        return None
+
+    data = user_cache.get(user_id)
+    if data is None:
+        if load is not None:
+            user = load()
+        else:
+            from models import User, db
+            user = db.session.get(User, user_id)
+        if not user:
+            return None
+        data = user.to_dict()
+        user_cache.set(user_id, data)
+    return data
+
+def invalidate_user(user_id):
+    """Drop cached user record after a write"""
+    user_cache.invalidate(user_id)
@@ -0,0 +1,123 @@
+from flask import request
+import gzip
+import os
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/javascript', 'text/')
+
+class CompressionStats:
+    """Per-worker counters for compressed responses, including CPU spent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encodings = {}
+        self.skipped = {'tooSmall': 0, 'notAccepted': 0}
+
+    def record(self, encoding, bytes_in, bytes_out, cpu_seconds):
+        with self._lock:
+            stats = self.encodings.setdefault(encoding, {
+                'responses': 0, 'bytesIn': 0, 'bytesOut': 0, 'cpuSeconds': 0.0
+            })
+            stats['responses'] += 1
+            stats['bytesIn'] += bytes_in
+            stats['bytesOut'] += bytes_out
+            stats['cpuSeconds'] += cpu_seconds
+
+    def skip(self, reason):
+        with self._lock:
+            self.skipped[reason] += 1
+
+    def snapshot(self):
+        with self._lock:
+            encodings = {}
+            for encoding, stats in self.encodings.items():
+                encodings[encoding] = dict(stats)
+                encodings[encoding]['ratio'] = (
+                    round(stats['bytesOut'] / stats['bytesIn'], 4) if stats['bytesIn'] else 0
+                )
+                encodings[encoding]['cpuMsPerResponse'] = round(
+                    stats['cpuSeconds'] * 1000 / stats['responses'], 3
+                )
+            return {'encodings': encodings, 'skipped': dict(self.skipped)}
+
+compression_stats = CompressionStats()
+
+class Compressor:
+    """
+    after_request hook compressing large text/JSON bodies
+
+    The codec is negotiated from Accept-Encoding, preferring br, then zstd
+    (each only if its package is installed), then gzip. Bodies smaller than
+    COMPRESS_MIN_SIZE bytes are sent as-is.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_level=4, zstd_level=3):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+        self.zstd_level = zstd_level
+        self.codecs = []
+        if brotli:
+            self.codecs.append(('br', lambda data: brotli.compress(data, quality=self.brotli_level)))
+        if zstandard:
+            self.codecs.append(('zstd', lambda data: zstandard.ZstdCompressor(level=self.zstd_level).compress(data)))
+        self.codecs.append(('gzip', lambda data: gzip.compress(data, compresslevel=self.gzip_level, mtime=0)))
+
+    def choose(self, accept_encodings):
+        for encoding, compress in self.codecs:
+            if accept_encodings[encoding]:
+                return encoding, compress
+        return None, None
+
+    def __call__(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        if response.calculate_content_length() < self.min_size:
+            compression_stats.skip('tooSmall')
+            return response
+
+        encoding, compress = self.choose(request.accept_encodings)
+        if not encoding:
+            compression_stats.skip('notAccepted')
+            return response
+
+        data = response.get_data()
+        start = time.thread_time()
+        compressed = compress(data)
+        compression_stats.record(encoding, len(data), len(compressed), time.thread_time() - start)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # Each encoding is a distinct representation, so strong ETags must differ
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+def init_compression(app):
+    """Register response compression using COMPRESS_* environment settings"""
+    if os.environ.get('COMPRESS_ENABLED', 'true').lower() != 'true':
+        return
+    app.after_request(Compressor(
+        min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+        gzip_level=int(os.environ.get('COMPRESS_LEVEL', 6)),
+        brotli_level=int(os.environ.get('COMPRESS_BR_LEVEL', 4)),
+        zstd_level=int(os.environ.get('COMPRESS_ZSTD_LEVEL', 3))
+    ))
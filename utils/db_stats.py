@@ -0,0 +1,210 @@
+from collections import deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, StaticPool
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('DB_STATS_ENABLED', 'true').lower() == 'true'
+
+class DBStats:
+    """Per-worker connection pool and statement timing counters"""
+
+    def __init__(self, slow_ms=200, slow_log_size=50):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_wait = 0.0
+            self.checkout_wait_max = 0.0
+            self.checkout_timeouts = 0
+            self.connects = 0
+            self.in_use_peak = 0
+            self.overflow_peak = 0
+            self.statements = 0
+            self.statement_time = 0.0
+            self.statement_time_max = 0.0
+            self.slow_count = 0
+            self.slow_queries.clear()
+
+    def record_checkout(self, wait, in_use, overflow):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+            self.in_use_peak = max(self.in_use_peak, in_use)
+            self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_timeout(self):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_statement(self, statement, parameters, executemany, seconds):
+        with self._lock:
+            self.statements += 1
+            self.statement_time += seconds
+            self.statement_time_max = max(self.statement_time_max, seconds)
+        if seconds * 1000 < self.slow_ms:
+            return
+
+        entry = {
+            'ms': round(seconds * 1000, 2),
+            'route': current_route(),
+            'statement': ' '.join(statement.split())[:500],
+            'params': parameters_shape(parameters, executemany),
+            'at': time.time()
+        }
+        with self._lock:
+            self.slow_count += 1
+            self.slow_queries.append(entry)
+        print(f"Slow query ({entry['ms']}ms) [{entry['route'] or '-'}] {entry['statement'][:200]} params={entry['params']}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pool': {
+                    'checkouts': self.checkouts,
+                    'avgWaitMs': round(self.checkout_wait * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                    'maxWaitMs': round(self.checkout_wait_max * 1000, 3),
+                    'timeouts': self.checkout_timeouts,
+                    'connects': self.connects,
+                    'inUsePeak': self.in_use_peak,
+                    'overflowPeak': self.overflow_peak
+                },
+                'statements': {
+                    'count': self.statements,
+                    'avgMs': round(self.statement_time * 1000 / self.statements, 3) if self.statements else 0,
+                    'maxMs': round(self.statement_time_max * 1000, 3),
+                    'slowThresholdMs': self.slow_ms,
+                    'slowCount': self.slow_count
+                },
+                'slowQueries': list(self.slow_queries)
+            }
+
+db_stats = DBStats(
+    slow_ms=float(os.environ.get('SLOW_QUERY_MS', 200)),
+    slow_log_size=int(os.environ.get('SLOW_QUERY_LOG_SIZE', 50))
+)
+
+def current_route():
+    """'METHOD endpoint' of the request issuing a statement, if any"""
+    if not has_request_context():
+        return None
+    return f'{request.method} {request.endpoint or request.path}'
+
+def parameters_shape(parameters, executemany=False):
+    """
+    Describe bound parameters by type only, so slow query logs never
+    contain user data: ('str', 'int'), {'id': 'str'}, or '25 x (...)'
+    """
+    if executemany and parameters:
+        return f'{len(parameters)} x {parameters_shape(parameters[0])}'
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return tuple(type(value).__name__ for value in parameters)
+    return type(parameters).__name__
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            db_stats.record_timeout()
+            raise
+        db_stats.record_checkout(time.perf_counter() - start, self.checkedout(), max(0, self.overflow()))
+        return connection
+
+def pool_state(engine):
+    """Current pool occupancy; only QueuePool subclasses report it"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {'class': type(pool).__name__}
+    return {
+        'class': type(pool).__name__,
+        'size': pool.size(),
+        'maxOverflow': pool._max_overflow,
+        'timeoutSeconds': pool.timeout(),
+        'checkedOut': pool.checkedout(),
+        'checkedIn': pool.checkedin(),
+        'overflow': max(0, pool.overflow())
+    }
+
+def request_query_count():
+    """Statements executed so far by the current request"""
+    return g.get('db_query_count', 0)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.db_query_count = g.get('db_query_count', 0) + 1
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    db_stats.record_statement(statement, parameters, executemany, seconds)
+    # Requests being profiled (utils/profiling.py) collect their statements
+    if has_request_context():
+        captured = g.get('profile_sql')
+        if captured is not None:
+            captured.append({
+                'ms': round(seconds * 1000, 3),
+                'statement': statement,
+                'params': parameters_shape(parameters, executemany)
+            })
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute
+    if context.statement is not None and context.connection is not None:
+        starts = context.connection.info.get('query_start')
+        if starts:
+            starts.pop()
+
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+def is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+
+def configure_engine_options(options, url):
+    """
+    Use TimedQueuePool unless DB_STATS_ENABLED=false; call before db.init_app()
+
+    An in-memory SQLite database exists only on the connection that opened
+    it, so it gets one shared connection (StaticPool) and no queue sizing.
+    """
+    if is_memory_sqlite(url):
+        options['poolclass'] = StaticPool
+        for key in QUEUE_POOL_OPTIONS:
+            options.pop(key, None)
+    elif ENABLED:
+        options['poolclass'] = TimedQueuePool
+
+def init_db_stats(app, db):
+    """Attach statement and connection listeners to the app's engine"""
+    if not ENABLED:
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    event.listen(engine, 'connect', lambda dbapi_connection, record: db_stats.record_connect())
@@ -0,0 +1,38 @@
+from flask import current_app, request
+import hashlib
+
+def make_etag(*parts):
+    """Strong ETag value from a row's identity and version (e.g. id, updated_at)"""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+def matching_etag(etag):
+    """
+    Return the If-None-Match tag matching etag, or None
+
+    Compressed responses carry an encoding suffix (see utils/compression.py),
+    so "<etag>-gzip" also counts as a match.
+    """
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    if if_none_match.star_tag:
+        return etag
+    for tag in if_none_match.as_set(include_weak=True):
+        if tag == etag or tag.startswith(etag + '-'):
+            return tag
+    return None
+
+def not_modified(etag):
+    """304 response if the client already holds etag, else None"""
+    tag = matching_etag(etag)
+    if tag is None:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(tag)
+    return response
+
+def with_etag(response, etag):
+    """Attach a strong ETag to a response built by jsonify()"""
+    response.set_etag(etag)
+    return response
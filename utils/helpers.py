@@ -29,6 +29,25 @@ def validate_kenyan_phone(phone):
     pattern = r'^\+254[17]\d{8}$'
     return re.match(pattern, formatted) is not None
 
+def format_mpesa_phone(phone):
+    """
+    Format phone number for M-Pesa (254XXXXXXXXX)
+
+    Returns:
+        str: 12-digit number, or None if the input is not a valid number
+    """
+    formatted = phone.strip()
+    if formatted.startswith('+254'):
+        formatted = formatted[1:]
+    elif formatted.startswith('0'):
+        formatted = '254' + formatted[1:]
+    elif not formatted.startswith('254'):
+        formatted = '254' + formatted
+
+    if not formatted.isdigit() or len(formatted) != 12:
+        return None
+    return formatted
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points using Haversine formula"""
     R = 6371  # Earth's radius in kilometers
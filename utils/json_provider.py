@@ -0,0 +1,60 @@
+from datetime import date
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+def _default(o):
+    """Types orjson doesn't handle natively"""
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class FallbackJSONProvider(DefaultJSONProvider):
+    """Stdlib json provider emitting the same shapes as OrjsonProvider"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        if isinstance(o, date):
+            # Flask's default would emit an HTTP date; match orjson's ISO 8601
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+class OrjsonProvider(JSONProvider):
+    """
+    orjson-backed JSON provider for jsonify() and request.json
+
+    datetime/date are serialized natively as ISO 8601 (same output as
+    .isoformat() for naive values) and Decimal as float, so models can hand
+    raw column values to jsonify().
+    """
+
+    mimetype = 'application/json'
+
+    def _option(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self._option()).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self._option() | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+def init_json_provider(app):
+    """Install orjson provider, falling back to stdlib json if unavailable"""
+    app.json = OrjsonProvider(app) if orjson else FallbackJSONProvider(app)
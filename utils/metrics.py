@@ -0,0 +1,264 @@
+"""
+Per-route request metrics in Prometheus text format
+
+Each worker keeps fixed-bucket histograms of latency, DB queries and
+response bytes, plus status code counters, per (blueprint, endpoint,
+method). Observing a request is a bisect and a few integer increments
+under one lock.
+
+With several gunicorn workers, a background thread in each worker writes
+its counters to METRICS_DIR/worker_<pid>.json every METRICS_FLUSH_SECONDS
+and GET /metrics sums every file, so a scrape reflects all workers no matter which one serves it.
+GET /metrics is only registered when METRICS_TOKEN is set, and requires
+it as a bearer token, since it is served on the public app port.
+Files of exited workers are folded into archived.json by the gunicorn
+child_exit hook, keeping counters monotonic across worker restarts.
+"""
+
+from bisect import bisect_left
+from flask import current_app, g, jsonify, request
+from utils.db_stats import request_query_count
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - METRICS_DIR is for gunicorn on Linux
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+HISTOGRAMS = (
+    ('latency', 'safedrive_http_request_duration_seconds', 'Request latency in seconds', LATENCY_BUCKETS),
+    ('queries', 'safedrive_http_request_db_queries', 'Database statements executed per request', QUERY_BUCKETS),
+    ('bytes', 'safedrive_http_response_bytes', 'Response body size in bytes, after compression', BYTES_BUCKETS),
+)
+
+BUCKETS = {name: buckets for name, _, _, buckets in HISTOGRAMS}
+
+ARCHIVE_FILE = 'archived.json'
+
+def _empty_route():
+    route = {'count': 0, 'status': {}}
+    for name, _, _, buckets in HISTOGRAMS:
+        route[name] = [0] * (len(buckets) + 1)
+        route[name + 'Sum'] = 0
+    return route
+
+def merge(target, source):
+    """Add the route counters in source into target"""
+    for key, route in source.items():
+        into = target.setdefault(key, _empty_route())
+        into['count'] += route['count']
+        for status, count in route['status'].items():
+            into['status'][status] = into['status'].get(status, 0) + count
+        for name, _, _, _ in HISTOGRAMS:
+            into[name] = [a + b for a, b in zip(into[name], route[name])]
+            into[name + 'Sum'] += route[name + 'Sum']
+    return target
+
+class RequestMetrics:
+    """Per-worker route histograms"""
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._dirty = False
+        self._flusher_pid = None
+
+    def observe(self, key, status, seconds, queries, nbytes):
+        if self.directory and self._flusher_pid != os.getpid():
+            self._start_flusher()
+        with self._lock:
+            self._dirty = True
+            route = self._routes.get(key)
+            if route is None:
+                route = self._routes[key] = _empty_route()
+            route['count'] += 1
+            route['status'][status] = route['status'].get(status, 0) + 1
+            for name, value in (('latency', seconds), ('queries', queries), ('bytes', nbytes)):
+                route[name][bisect_left(BUCKETS[name], value)] += 1
+                route[name + 'Sum'] += value
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._routes))
+
+    def worker_file(self):
+        return os.path.join(self.directory, f'worker_{os.getpid()}.json')
+
+    def _start_flusher(self):
+        # Started lazily in each forked worker, not in the preloading master
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this worker's counters to METRICS_DIR if they changed"""
+        if not self.directory or not self._dirty:
+            return
+        with self._lock:
+            self._dirty = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_json(self.worker_file(), self.snapshot())
+        except OSError as e:
+            print(f"Metrics flush error: {e}")
+
+    def collect(self):
+        """Counters for all workers (or just this one without METRICS_DIR)"""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        combined = {}
+        with _locked(self.directory):
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path) as f:
+                        merge(combined, json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return combined
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+class _locked:
+    """Exclusive flock on METRICS_DIR/.lock, serialising archive updates and reads"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.lock')
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+def mark_process_dead(directory, pid):
+    """Fold an exited worker's counters into the archive (gunicorn child_exit)"""
+    path = os.path.join(directory, f'worker_{pid}.json')
+    archive = os.path.join(directory, ARCHIVE_FILE)
+    with _locked(directory):
+        try:
+            with open(path) as f:
+                routes = json.load(f)
+        except (OSError, ValueError):
+            return
+        try:
+            with open(archive) as f:
+                archived = json.load(f)
+        except (OSError, ValueError):
+            archived = {}
+        _write_json(archive, merge(archived, routes))
+        os.remove(path)
+
+def reset_directory(directory):
+    """Start a fresh METRICS_DIR when the gunicorn master boots"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render(routes):
+    """Prometheus text exposition (version 0.0.4)"""
+    lines = []
+    parsed = []
+    for key, route in sorted(routes.items()):
+        blueprint, endpoint, method = key.split('|')
+        labels = f'blueprint="{_label(blueprint)}",endpoint="{_label(endpoint)}",method="{_label(method)}"'
+        parsed.append((labels, route))
+
+    lines.append('# HELP safedrive_http_requests_total Requests by route and status code')
+    lines.append('# TYPE safedrive_http_requests_total counter')
+    for labels, route in parsed:
+        for status, count in sorted(route['status'].items()):
+            lines.append(f'safedrive_http_requests_total{{{labels},status="{status}"}} {count}')
+
+    for name, metric, help_text, buckets in HISTOGRAMS:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for labels, route in parsed:
+            cumulative = 0
+            for bound, count in zip(buckets, route[name]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {route["count"]}')
+            lines.append(f'{metric}_sum{{{labels}}} {round(route[name + "Sum"], 6)}')
+            lines.append(f'{metric}_count{{{labels}}} {route["count"]}')
+    return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics(
+    directory=os.environ.get('METRICS_DIR') or None,
+    flush_interval=float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+)
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+def _record(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    blueprint = request.blueprint or 'app'
+    # Unmatched URLs share one label set to keep cardinality bounded
+    endpoint = request.endpoint or '<unmatched>'
+    request_metrics.observe(
+        f'{blueprint}|{endpoint}|{request.method}',
+        str(response.status_code),
+        time.perf_counter() - start,
+        request_query_count(),
+        response.calculate_content_length() or 0
+    )
+    return response
+
+def metrics_endpoint():
+    """Prometheus scrape target; requires METRICS_TOKEN as a bearer token"""
+    expected = f"Bearer {os.environ.get('METRICS_TOKEN', '')}"
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'UNAUTHORIZED',
+                'message': 'Metrics token required'
+            }
+        }), 401
+    return current_app.response_class(
+        render(request_metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+def init_metrics(app):
+    """
+    Register request timing hooks, and GET /metrics if METRICS_TOKEN is set
+
+    Call before init_compression() so the recorded latency and size
+    include compression.
+    """
+    if os.environ.get('METRICS_ENABLED', 'true').lower() != 'true':
+        return
+    app.before_request(_start_timer)
+    app.after_request(_record)
+    if os.environ.get('METRICS_TOKEN'):
+        app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
@@ -0,0 +1,48 @@
+from flask import current_app, jsonify
+from utils.etag import not_modified, with_etag
+import hashlib
+import os
+
+SPEC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'apispec.json')
+
+# (body, etag) loaded once per worker
+_spec = None
+
+def load_spec():
+    """Read the pre-built spec from disk on first use"""
+    global _spec
+    if _spec is None:
+        with open(SPEC_PATH, 'rb') as f:
+            body = f.read()
+        _spec = (body, hashlib.sha1(body).hexdigest()[:24])
+    return _spec
+
+def spec_response():
+    """
+    Serve the OpenAPI spec generated by build_spec.py
+    ---
+    tags:
+      - System
+    responses:
+      200:
+        description: OpenAPI (Swagger 2.0) specification
+      404:
+        description: Spec has not been built
+    """
+    try:
+        body, etag = load_spec()
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'SPEC_NOT_BUILT',
+                'message': 'API spec not built. Run: python build_spec.py'
+            }
+        }), 404
+    
+    cached = not_modified(etag)
+    if cached is None:
+        cached = with_etag(current_app.response_class(body, mimetype='application/json'), etag)
+    cached.cache_control.public = True
+    cached.cache_control.max_age = int(os.environ.get('APISPEC_MAX_AGE', 86400))
+    return cached
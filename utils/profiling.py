@@ -0,0 +1,189 @@
+"""
+On-demand request profiling for admins
+
+Adding an `X-Profile: 1` header or `?__profile=1` to any request made with
+an admin token runs it under cProfile and records every SQL statement it
+issues (captured by the utils/db_stats.py cursor listener). The result is
+written to PROFILE_DIR as <id>.pstats (load with `python -m pstats`,
+snakeviz or gprof2dot) plus <id>.json metadata, and the id is returned in
+the X-Profile-Id response header. Retrieve them through
+/api/v1/admin/profiles.
+
+Requests without the flag only pay for one header and one query-string
+lookup. Only one cProfile profiler can be active in a process on Python
+3.12+ (runtime.txt), so each worker profiles one request at a time; a
+flagged request that arrives meanwhile is served unprofiled with an
+`X-Profile-Skipped: busy` header. On 3.12+ the profiler also records every
+thread of the worker, so a profile can include frames from requests that
+ran alongside it on other gthread threads (or greenlets under gevent).
+"""
+
+from datetime import datetime
+from flask import g, request
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+MAX_SQL_STATEMENTS = 500
+
+PROFILE_ID = re.compile(r'^[0-9a-f]{16}$')
+
+# Held from before_request until teardown by the request being profiled
+_profile_lock = threading.Lock()
+
+def _requested():
+    return request.headers.get('X-Profile') == '1' or request.args.get('__profile') == '1'
+
+def _is_admin():
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    from utils.cache import get_cached_user
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+        user = get_cached_user(user_id) if user_id else None
+    except Exception:
+        return False
+    return bool(user and user['role'] == 'admin')
+
+def _start_profile():
+    if not _requested() or not _is_admin():
+        return
+    if not _profile_lock.acquire(blocking=False):
+        g.profile_skipped = 'busy'
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler or debugger (sys.monitoring tool) is active
+        _profile_lock.release()
+        g.profile_skipped = 'busy'
+        return
+    g.profile_locked = True
+    g.profile_sql = []
+    g.profile_started = time.perf_counter()
+    g.profiler = profiler
+
+def _finish_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        skipped = g.pop('profile_skipped', None)
+        if skipped:
+            response.headers['X-Profile-Skipped'] = skipped
+        return response
+    profiler.disable()
+    duration = time.perf_counter() - g.pop('profile_started')
+    statements = g.pop('profile_sql', [])
+
+    profile_id = uuid.uuid4().hex[:16]
+    try:
+        save_profile(profile_id, profiler, statements, duration, response)
+        response.headers['X-Profile-Id'] = profile_id
+    except OSError as e:
+        print(f"Profile save error: {e}")
+    return response
+
+def _discard_profile(exc):
+    # after_request never ran (e.g. it raised); don't leave the profiler on
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+    if g.pop('profile_locked', False):
+        _profile_lock.release()
+
+def top_functions(profiler, limit=30):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+def save_profile(profile_id, profiler, statements, duration, response):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f'{profile_id}.pstats'))
+    metadata = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'durationMs': round(duration * 1000, 2),
+        'sqlCount': len(statements),
+        'sqlMs': round(sum(s['ms'] for s in statements), 2),
+        'createdAt': datetime.utcnow().isoformat(),
+        'sql': statements[:MAX_SQL_STATEMENTS],
+        'topFunctions': top_functions(profiler)
+    }
+    with open(os.path.join(PROFILE_DIR, f'{profile_id}.json'), 'w') as f:
+        json.dump(metadata, f)
+    _prune()
+
+def _prune():
+    """Keep the newest PROFILE_KEEP profiles"""
+    entries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    for entry in entries[PROFILE_KEEP:]:
+        profile_id = entry.name[:-len('.json')]
+        for suffix in ('.json', '.pstats'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except OSError:
+                pass
+
+def list_profiles():
+    """Metadata of stored profiles, newest first, without SQL and function listings"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        metadata.pop('sql', None)
+        metadata.pop('topFunctions', None)
+        profiles.append(metadata)
+    profiles.sort(key=lambda p: p['createdAt'], reverse=True)
+    return profiles
+
+def load_profile(profile_id):
+    """Full metadata for a profile id, or None"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f'{profile_id}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def pstats_path(profile_id):
+    """Absolute path of a profile's pstats file, or None"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.abspath(os.path.join(PROFILE_DIR, f'{profile_id}.pstats'))
+    return path if os.path.isfile(path) else None
+
+def init_profiling(app):
+    """
+    Register the profiling hooks
+
+    Call before init_metrics() and init_compression() so the profile
+    covers their after_request work too.
+    """
+    if os.environ.get('PROFILING_ENABLED', 'true').lower() != 'true':
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
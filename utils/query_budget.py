@@ -0,0 +1,94 @@
+"""
+Per-route database query budgets
+
+Declare how many statements a view may run with @query_budget(n); the
+statement count comes from the utils/db_stats.py cursor listener. After
+each request the count is compared with the budget:
+
+    QUERY_BUDGET_MODE=log     print the violation and count it (default)
+    QUERY_BUDGET_MODE=strict  raise QueryBudgetExceeded, and report every
+                              request's count in an X-Query-Count header
+    QUERY_BUDGET_MODE=off     skip the check
+
+Budgets are per request and include the queries made by authentication,
+so an N+1 loop over a list shows up as a count that grows with the data.
+With DB_STATS_ENABLED=false nothing is counted and no budget is checked.
+"""
+
+from flask import current_app, request
+from utils.db_stats import ENABLED as DB_STATS_ENABLED, request_query_count
+import os
+import threading
+
+MODE = os.environ.get('QUERY_BUDGET_MODE', 'log').lower()
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more statements than its @query_budget allows"""
+
+    def __init__(self, endpoint, count, budget):
+        super().__init__(f'{endpoint} ran {count} queries (budget {budget})')
+        self.endpoint = endpoint
+        self.count = count
+        self.budget = budget
+
+def query_budget(max_queries):
+    """
+    Declare the maximum number of statements a view may run
+
+    Place below @blueprint.route; other decorators such as @jwt_required
+    may sit either side since functools.wraps carries the budget along.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+class BudgetViolations:
+    """Per-worker violation counts by endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, count, budget):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {'budget': budget, 'violations': 0, 'maxQueries': 0})
+            entry['budget'] = budget
+            entry['violations'] += 1
+            entry['maxQueries'] = max(entry['maxQueries'], count)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(entry) for endpoint, entry in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+budget_violations = BudgetViolations()
+
+def budget_for(endpoint):
+    """Declared budget of an endpoint, or None"""
+    view = current_app.view_functions.get(endpoint) if endpoint else None
+    return getattr(view, 'query_budget', None)
+
+def _check_budget(response):
+    count = request_query_count()
+    if MODE == 'strict':
+        response.headers['X-Query-Count'] = str(count)
+
+    budget = budget_for(request.endpoint)
+    if budget is None or count <= budget:
+        return response
+
+    budget_violations.record(request.endpoint, count, budget)
+    if MODE == 'strict':
+        raise QueryBudgetExceeded(request.endpoint, count, budget)
+    print(f"Query budget exceeded: {request.method} {request.endpoint} ran {count} queries (budget {budget})")
+    return response
+
+def init_query_budget(app):
+    """Register the after-request budget check"""
+    if MODE == 'off' or not DB_STATS_ENABLED:
+        return
+    app.after_request(_check_budget)
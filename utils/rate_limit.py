@@ -0,0 +1,117 @@
+from collections import OrderedDict
+import math
+import os
+import threading
+import time
+
+class MemoryBucketStore:
+    """
+    Per-worker token buckets
+
+    Each key holds a compact (tokens, last_refill) tuple. Keys are kept in
+    LRU order and the least recently touched bucket is evicted once
+    max_keys is reached; an evicted bucket has been idle the longest and
+    would have refilled anyway.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        """Take one token; returns (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.pop(key, None)
+            tokens, last = state if state else (capacity, now)
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after == 0, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+class RedisBucketStore:
+    """Token buckets shared by all workers through Redis"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, rate):
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[capacity, rate, time.time()])
+        if allowed:
+            return True, 0
+        return False, (1 - float(tokens)) / rate
+
+    def reset(self, key):
+        self.client.delete(self.prefix + key)
+
+def create_store():
+    """Use Redis when RATE_LIMIT_REDIS_URL is set and redis is installed, else memory"""
+    url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if url:
+        try:
+            return RedisBucketStore(url)
+        except ImportError:
+            print("Rate limit: redis package not installed, using in-memory buckets")
+    return MemoryBucketStore(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000)))
+
+class RateLimiter:
+    """Allow `attempts` hits per `window` seconds per key, with bursts up to `attempts`"""
+
+    def __init__(self, name, attempts, window, store):
+        self.name = name
+        self.capacity = attempts
+        self.rate = attempts / window
+        self.store = store
+
+    def hit(self, key):
+        """
+        Record an attempt
+
+        Returns:
+            int: 0 if allowed, otherwise seconds until the next attempt is allowed
+        """
+        try:
+            allowed, retry_after = self.store.consume(f'{self.name}:{key}', self.capacity, self.rate)
+        except Exception as e:
+            # Fail open if the shared backend is unavailable
+            print(f"Rate limit store error: {e}")
+            return 0
+        return 0 if allowed else max(1, math.ceil(retry_after))
+
+    def reset(self, key):
+        try:
+            self.store.reset(f'{self.name}:{key}')
+        except Exception:
+            pass
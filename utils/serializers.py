@@ -0,0 +1,129 @@
+"""
+Column-projection serializers for list endpoints
+
+List endpoints used to hydrate full ORM objects (plus eager-loaded
+relationships that to_dict() never reads) only to flatten them again.
+These helpers select just the columns each to_dict() needs as plain row
+tuples and build the response dicts in a single comprehension. Decimal and
+datetime values are left as-is for the app's JSON provider to encode
+(see utils/json_provider.py). Output matches the corresponding model's
+to_dict() exactly.
+"""
+
+from models import Trip, User, Payment, Notification
+
+TRIP_COLUMNS = (
+    Trip.id, Trip.passenger_id, Trip.driver_id,
+    Trip.pickup_lat, Trip.pickup_lng, Trip.pickup_address,
+    Trip.dropoff_lat, Trip.dropoff_lng, Trip.dropoff_address,
+    Trip.status, Trip.fare, Trip.distance, Trip.duration,
+    Trip.payment_status, Trip.rating, Trip.feedback,
+    Trip.created_at, Trip.accepted_at, Trip.started_at, Trip.completed_at, Trip.updated_at
+)
+
+USER_COLUMNS = (User.id, User.email, User.name, User.phone, User.role, User.created_at, User.updated_at)
+
+PAYMENT_COLUMNS = (
+    Payment.id, Payment.trip_id, Payment.amount, Payment.phone,
+    Payment.checkout_request_id, Payment.mpesa_receipt_number,
+    Payment.status, Payment.created_at
+)
+
+NOTIFICATION_COLUMNS = (
+    Notification.id, Notification.user_id, Notification.title, Notification.message,
+    Notification.type, Notification.trip_id, Notification.payment_id,
+    Notification.is_read, Notification.is_sent, Notification.created_at, Notification.read_at
+)
+
+def serialize_trips(query):
+    """Serialize a Trip query; same shape as Trip.to_dict()"""
+    return [
+        {
+            'id': id_,
+            'passengerId': passenger_id,
+            'driverId': driver_id,
+            'pickup': {
+                'lat': pickup_lat,
+                'lng': pickup_lng,
+                'address': pickup_address
+            },
+            'dropoff': {
+                'lat': dropoff_lat,
+                'lng': dropoff_lng,
+                'address': dropoff_address
+            },
+            'status': status,
+            'fare': fare,
+            'distance': distance,
+            'duration': duration,
+            'paymentStatus': payment_status,
+            'rating': rating,
+            'feedback': feedback,
+            'createdAt': created_at,
+            'acceptedAt': accepted_at,
+            'startedAt': started_at,
+            'completedAt': completed_at,
+            'updatedAt': updated_at
+        }
+        for (id_, passenger_id, driver_id,
+             pickup_lat, pickup_lng, pickup_address,
+             dropoff_lat, dropoff_lng, dropoff_address,
+             status, fare, distance, duration,
+             payment_status, rating, feedback,
+             created_at, accepted_at, started_at, completed_at, updated_at)
+        in query.with_entities(*TRIP_COLUMNS)
+    ]
+
+def serialize_users(query):
+    """Serialize a User query; same shape as User.to_dict()"""
+    return [
+        {
+            'id': id_,
+            'email': email,
+            'name': name,
+            'phone': phone,
+            'role': role,
+            'createdAt': created_at,
+            'updatedAt': updated_at
+        }
+        for id_, email, name, phone, role, created_at, updated_at in query.with_entities(*USER_COLUMNS)
+    ]
+
+def serialize_payments(query):
+    """Serialize a Payment query; same shape as Payment.to_dict()"""
+    return [
+        {
+            'id': id_,
+            'tripId': trip_id,
+            'amount': amount,
+            'phone': phone,
+            'checkoutRequestId': checkout_request_id,
+            'mpesaReceiptNumber': mpesa_receipt_number,
+            'status': status,
+            'createdAt': created_at
+        }
+        for (id_, trip_id, amount, phone, checkout_request_id,
+             mpesa_receipt_number, status, created_at)
+        in query.with_entities(*PAYMENT_COLUMNS)
+    ]
+
+def serialize_notifications(query):
+    """Serialize a Notification query; same shape as Notification.to_dict()"""
+    return [
+        {
+            'id': id_,
+            'userId': user_id,
+            'title': title,
+            'message': message,
+            'type': type_,
+            'tripId': trip_id,
+            'paymentId': payment_id,
+            'isRead': is_read,
+            'isSent': is_sent,
+            'createdAt': created_at,
+            'readAt': read_at
+        }
+        for (id_, user_id, title, message, type_, trip_id, payment_id,
+             is_read, is_sent, created_at, read_at)
+        in query.with_entities(*NOTIFICATION_COLUMNS)
+    ]
@@ -0,0 +1,129 @@
+"""
+Streaming file uploads
+
+Werkzeug normally spools every uploaded file into a SpooledTemporaryFile
+(memory up to 500 KB, then a temp file) and the view copies it again
+with FileStorage.save(). A view that calls request.stream_files_to()
+before touching request.files instead gets each file part written
+straight to a temporary file in the destination directory, with the
+SHA-256 computed and the size limit enforced as chunks arrive:
+
+    request.stream_files_to(staging_dir, max_bytes=MAX_DOCUMENT_SIZE)
+    file = request.files['file']                # body parsed here
+    saved = file.stream.commit(filepath)        # {'sha256': ..., 'size': ...}
+
+commit() renames the file into place with os.replace(), so readers never
+see a partial document and the body is read exactly once. Temporary
+files that are not committed are removed when the request ends.
+
+Request bodies are capped at MAX_CONTENT_LENGTH (sized for JSON). Upload
+views raise the cap for themselves with @upload_limit(max_bytes), which
+allows max_bytes of file plus MULTIPART_OVERHEAD.
+"""
+
+from flask import Request, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge
+import hashlib
+import os
+import tempfile
+
+# Multipart boundaries, part headers and small form fields on top of the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+class HashingFile:
+    """Temporary file that hashes and size-checks everything written to it"""
+
+    def __init__(self, directory, max_bytes=None):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hasher = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f'File exceeds {self.max_bytes} bytes')
+        self._hasher.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hasher.hexdigest()
+
+    def commit(self, destination):
+        """Flush to disk and atomically move the file to destination"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.path, destination)
+        self.committed = True
+        return {'sha256': self.sha256, 'size': self.size}
+
+    def discard(self):
+        self._file.close()
+        if not self.committed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        # read/seek/tell/etc. for FileStorage
+        return getattr(self._file, name)
+
+def upload_limit(max_bytes):
+    """
+    Accept file uploads of up to max_bytes on a view
+
+    Place below @blueprint.route, like @query_budget.
+    """
+    def decorator(view):
+        view.max_upload_bytes = max_bytes
+        return view
+    return decorator
+
+class UploadRequest(Request):
+    """Request that can stream its file parts to disk; see module docstring"""
+
+    _upload_target = None
+    _upload_files = ()
+
+    @property
+    def max_content_length(self):
+        """MAX_CONTENT_LENGTH, or the view's @upload_limit plus multipart overhead"""
+        view = current_app.view_functions.get(self.endpoint) if current_app and self.endpoint else None
+        max_upload = getattr(view, 'max_upload_bytes', None)
+        if max_upload is not None:
+            return max_upload + MULTIPART_OVERHEAD
+        return super().max_content_length
+
+    def stream_files_to(self, directory, max_bytes=None):
+        """Write file parts into directory; call before reading files or form"""
+        self._upload_target = (directory, max_bytes)
+        self._upload_files = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self._upload_target is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = HashingFile(*self._upload_target)
+        self._upload_files.append(stream)
+        return stream
+
+def _check_content_length():
+    # Views parse bodies inside broad try/excepts that would turn Werkzeug's
+    # lazy 413 into a 500, so reject on Content-Length before dispatch
+    limit = request.max_content_length
+    if limit and request.content_length and request.content_length > limit:
+        raise RequestEntityTooLarge()
+
+def _discard_uploads(exc):
+    for stream in request._upload_files:
+        stream.discard()
+
+def init_uploads(app):
+    """Use UploadRequest, enforce body limits up front and clean up uncommitted files"""
+    app.request_class = UploadRequest
+    app.before_request(_check_content_length)
+    app.teardown_request(_discard_uploads)